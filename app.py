@@ -2,12 +2,15 @@
 import os
 import re
 import json
-import time
-from typing import Dict, Any, List, Optional
+from typing import Optional
 
 import requests
 import streamlit as st
 
+from client import (
+    CACHE_TTL, api_stream, approve_stack, create_project, match_peers, match_project,
+)
+
 # -----------------------------
 # Config
 # -----------------------------
@@ -15,22 +18,6 @@ st.set_page_config(page_title="Campus Networking Chatbot", page_icon="🎓", lay
 API_DEFAULT = os.getenv("BACKEND_URL", "http://localhost:8000")  # set BACKEND_URL env or edit here
 
 
-# -----------------------------
-# HTTP helpers (strict: no fallbacks)
-# -----------------------------
-def api_get(base: str, path: str, params: Dict[str, Any] | None = None) -> Any:
-    url = f"{base}{path}"
-    r = requests.get(url, params=params, timeout=15)
-    r.raise_for_status()
-    return r.json()
-
-def api_post(base: str, path: str, payload: Dict[str, Any] | None = None) -> Any:
-    url = f"{base}{path}"
-    r = requests.post(url, json=payload or {}, timeout=20)
-    r.raise_for_status()
-    return r.json()
-
-
 # -----------------------------
 # Small utilities
 # -----------------------------
@@ -106,6 +93,7 @@ if "ctx" not in st.session_state:
     st.session_state.ctx = {
         "last_project_id": None,
         "last_draft_stack": None,
+        "project_titles": {},  # id -> title of projects posted this session
     }
 
 
@@ -149,13 +137,9 @@ if prompt:
                 if intent == "post_project":
                     title = extract_kv(prompt, "title") or "Untitled Project"
                     desc = extract_kv(prompt, "description") or prompt
-                    payload = {
-                        "owner_id": int(professor_id),
-                        "title": title,
-                        "description": desc,
-                    }
-                    proj = api_post(backend_url, "/projects", payload)
+                    proj = create_project(backend_url, int(professor_id), title, desc)
                     st.session_state.ctx["last_project_id"] = proj["id"]
+                    st.session_state.ctx["project_titles"][proj["id"]] = proj["title"]
                     reply(f"✅ Project created (id **{proj['id']}**): **{proj['title']}**\n\n{proj['description']}\n\nType `draft stack` to get a proposed tech stack.")
 
                 elif intent == "draft_stack":
@@ -163,9 +147,24 @@ if prompt:
                     if not pid:
                         reply("I don't see a project yet. Use `/post title: ... description: ...` first.")
                     else:
-                        out = api_post(backend_url, f"/projects/{pid}/draft_stack", {})
+                        # Stream tokens as they arrive, then swap in the validated draft
+                        with st.chat_message("assistant"):
+                            box = st.empty()
+                            partial, out = "", None
+                            for event, data in api_stream(backend_url, f"/projects/{pid}/draft_stack/stream", {}):
+                                if event == "token":
+                                    partial += data
+                                    box.markdown("🧠 Drafting…\n\n```json\n" + partial + "\n```")
+                                elif event == "draft":
+                                    out = data
+                                elif event == "error":
+                                    raise RuntimeError(data)
+                            if out is None:
+                                raise RuntimeError("Stream ended without a draft.")
+                            text = "🧠 Proposed tech stack:\n\n```json\n" + json.dumps(out, indent=2) + "\n```\nType **approve** to accept."
+                            box.markdown(text)
+                        st.session_state.messages.append({"role": "assistant", "content": text})
                         st.session_state.ctx["last_draft_stack"] = out
-                        reply("🧠 Proposed tech stack:\n\n```json\n" + json.dumps(out, indent=2) + "\n```\nType **approve** to accept.")
 
                 elif intent == "approve_stack":
                     pid = st.session_state.ctx.get("last_project_id")
@@ -173,7 +172,7 @@ if prompt:
                     if not pid or not draft:
                         reply("No draft stack to approve yet. Use `draft stack` first.")
                     else:
-                        api_post(backend_url, "/projects/approve_stack", {"project_id": int(pid), "stack": draft["stack"]})
+                        approve_stack(backend_url, int(pid), draft["stack"])
                         reply("✅ Stack approved and saved to the project.")
 
                 elif intent == "match_project":
@@ -184,13 +183,14 @@ if prompt:
                     else:
                         pid = st.session_state.ctx.get("last_project_id") or int(default_project_id)
 
-                    reply(f"🔎 Matching students for project **{pid}**…")
-                    time.sleep(0.2)
-                    ranked = api_get(backend_url, f"/match/project/{pid}")
+                    # the title is known for projects posted this session; others show by id
+                    title = st.session_state.ctx["project_titles"].get(pid)
+                    label = f"project **{pid}**" + (f": **{title}**" if title else "")
+                    ranked = match_project(backend_url, pid)
                     if not isinstance(ranked, list) or len(ranked) == 0:
-                        reply("No matching students found.")
+                        reply(f"No matching students found for {label}.")
                     else:
-                        lines = []
+                        lines = [f"🔎 Top students for {label}"]
                         for i, s in enumerate(ranked[:5], 1):
                             lines.append(
                                 f"**#{i}** — {s.get('name')} — {s.get('email')}  \n"
@@ -207,13 +207,13 @@ if prompt:
             # -----------------------------
             else:
                 if intent == "find_peers":
-                    interests = extract_kv(prompt, "interests") or prompt
+                    interests = extract_kv(prompt, "interests")
                     skills = extract_kv(prompt, "skills") or ""
-                    peers = api_post(
-                        backend_url,
-                        "/match/peers",
-                        {"user_id": int(student_id), "interests": interests, "skills": skills},
-                    )
+                    if interests is None:
+                        # free text is the query; a bare "/peers" sends none, so the backend
+                        # answers from its precomputed peer graph instead of embedding the command
+                        interests = re.sub(r"^/peers\b", "", prompt.strip(), flags=re.IGNORECASE).strip()
+                    peers = match_peers(backend_url, int(student_id), interests, skills)
                     if not isinstance(peers, list) or len(peers) == 0:
                         reply("No peers found for those filters.")
                     else:
@@ -241,6 +241,7 @@ if prompt:
 # Footer
 # -----------------------------
 st.caption(
-    "Connects only to your FastAPI backend (/profiles, /projects, /projects/{id}/draft_stack, "
-    "/projects/approve_stack, /match/project/{id}, /match/peers). No local sample data."
+    "Connects only to your FastAPI backend (/projects, "
+    "/projects/{id}/draft_stack/stream, /projects/approve_stack, /match/project/{id}, /match/peers). "
+    f"Reads are cached for up to {CACHE_TTL}s. No local sample data."
 )
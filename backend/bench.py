@@ -0,0 +1,342 @@
+# backend/bench.py
+"""
+Synthetic-scale benchmark for the matching pipeline.
+Run from the project root against a scratch database (all tables are dropped):
+    DATABASE_URL=sqlite:////tmp/bench.db ASYNC_DATABASE_URL=sqlite+aiosqlite:////tmp/bench.db \\
+        python -m backend.bench --students 10000 --requests 300 --out bench.json
+Generates students/projects from a Zipf-weighted skill vocabulary, swaps the
+embedding/chat providers for local stubs with --embed-latency/--chat-latency,
+drives the FastAPI app in-process and reports latency percentiles, throughput,
+peak RSS and a per-stage breakdown as JSON (diff two runs across commits).
+"""
+import os
+
+# never bench against the paid API; must be set before backend imports read it
+os.environ["EMBED_PROVIDER"] = "local"
+os.environ["CHAT_PROVIDER"] = "local"
+# measure the pipeline, not the result cache (MATCH_CACHE=memory to bench cached reads)
+os.environ.setdefault("MATCH_CACHE", "off")
+
+import argparse
+import asyncio
+import functools
+import json
+import platform
+import resource
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List
+
+import httpx
+import numpy as np
+from sqlalchemy import insert
+
+from backend.db import Base, SessionLocal, engine
+from backend.ingest import ingest
+from backend.main import app
+from backend.models import Project, User
+from backend.routers import match as match_router
+from backend.services import embeddings, llm
+from backend.services.embed_cache import EmbeddingCache
+from backend.services.providers import ChatProvider, EmbeddingProvider
+from backend.services.tags import sync_project_tags
+
+BASE_SKILLS = [
+    "Python", "PyTorch", "TensorFlow", "OpenCV", "ROS", "SLAM", "C++", "CUDA", "React", "TypeScript",
+    "Node", "SQL", "PostgreSQL", "FastAPI", "Docker", "Kubernetes", "LangChain", "RAG", "NLP", "Rust",
+    "Java", "Spark", "AWS", "computer vision", "reinforcement learning", "embedded systems", "robotics",
+]
+FILLER = ("student working on building research projects with a focus on data systems and "
+          "applied machine learning in the lab team for the course").split()
+
+
+# ---------- stubs ----------
+class StubEmbeddings(EmbeddingProvider):
+    """Local hashing embedder behind a fixed per-call delay (stands in for API round trips)."""
+
+    def __init__(self, inner: EmbeddingProvider, latency: float):
+        self.inner, self.latency, self.model = inner, latency, inner.model
+        self.calls = self.inputs = 0
+
+    def embed(self, texts):
+        self.calls += 1; self.inputs += len(texts)
+        time.sleep(self.latency)
+        return self.inner.embed(texts)
+
+    async def aembed(self, texts):
+        self.calls += 1; self.inputs += len(texts)
+        await asyncio.sleep(self.latency)
+        return self.inner.embed(texts)
+
+
+class StubChat(ChatProvider):
+    def __init__(self, inner: ChatProvider, latency: float):
+        self.inner, self.latency, self.model = inner, latency, inner.model
+        self.calls = 0
+
+    def complete(self, request):
+        self.calls += 1
+        time.sleep(self.latency)
+        return self.inner.complete(request)
+
+    async def acomplete(self, request):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return await self.inner.acomplete(request)
+
+    async def astream(self, request):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        async for delta in self.inner.astream(request):
+            yield delta
+
+
+# ---------- synthetic data ----------
+def make_vocab(size: int) -> List[str]:
+    return (BASE_SKILLS + [f"skill{i}" for i in range(max(0, size - len(BASE_SKILLS)))])[:size]
+
+class Generator:
+    """Zipf-weighted draws from the vocabulary, so a few skills are common and most are rare."""
+
+    def __init__(self, vocab: List[str], words: int, seed: int):
+        self.vocab, self.words = vocab, words
+        self.rng = np.random.default_rng(seed)
+        w = 1.0 / np.arange(1, len(vocab) + 1)
+        self.p = w / w.sum()
+
+    def pick(self, k: int) -> List[str]:
+        k = min(k, len(self.vocab))
+        return [self.vocab[i] for i in self.rng.choice(len(self.vocab), size=k, replace=False, p=self.p)]
+
+    def text(self) -> str:
+        n_terms = max(1, self.words // 5)
+        words = list(self.rng.choice(FILLER, size=self.words - n_terms)) + self.pick(n_terms)
+        self.rng.shuffle(words)
+        return " ".join(words)
+
+    def student(self, i: int) -> Dict[str, Any]:
+        return {
+            "name": f"Student {i}",
+            "role": "student",
+            "email": f"student{i}@bench.edu",
+            "summary": self.text(),
+            "skills": ", ".join(self.pick(int(self.rng.integers(2, 7)))),
+            "interests": ", ".join(self.pick(int(self.rng.integers(1, 4)))),
+        }
+
+    def project(self, i: int, owner_id: int) -> Dict[str, Any]:
+        return {
+            "owner_id": owner_id,
+            "title": f"Project {i}: " + " ".join(self.pick(2)),
+            "description": self.text(),
+            "tags": ", ".join(self.pick(3)),
+            "stack": ", ".join(self.pick(4)),
+        }
+
+
+def populate(args) -> Dict[str, Any]:
+    gen = Generator(make_vocab(args.vocab), args.words, args.seed)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        t0 = time.perf_counter()
+        report = ingest(db, (gen.student(i) for i in range(args.students)), args.batch)
+        t1 = time.perf_counter()
+        prof = User(name="Bench Prof", role="professor", email="prof@bench.edu")
+        db.add(prof); db.commit()
+        rows = [gen.project(i, prof.id) for i in range(args.projects)]
+        pids = db.scalars(insert(Project).returning(Project.id, sort_by_parameter_order=True), rows).all()
+        sync_project_tags(db, [SimpleNamespace(id=i, **r) for i, r in zip(pids, rows)])
+        db.commit()
+    finally:
+        db.close()
+    return {
+        "students": report["inserted"],
+        "embedded": report["embedded"],
+        "errors": len(report["errors"]),
+        "projects": len(pids),
+        "project_ids": pids,
+        "ingest_s": round(t1 - t0, 3),
+    }
+
+
+# ---------- stage timing ----------
+class Stages:
+    """Per-call wall time of pipeline stages, collected by wrapping module-level names."""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self.enabled = False
+
+    def wrap(self, stage: str, fn: Callable) -> Callable:
+        if asyncio.iscoroutinefunction(fn):
+            async def timed(*a, **kw):
+                t = time.perf_counter()
+                try:
+                    return await fn(*a, **kw)
+                finally:
+                    if self.enabled:
+                        self.samples[stage].append(time.perf_counter() - t)
+        else:
+            def timed(*a, **kw):
+                t = time.perf_counter()
+                try:
+                    return fn(*a, **kw)
+                finally:
+                    if self.enabled:
+                        self.samples[stage].append(time.perf_counter() - t)
+        return functools.wraps(fn)(timed)
+
+    def instrument(self):
+        import fastapi.routing
+        m = match_router
+        for name in ("abackfill_student_embeddings", "sync_student_index", "sync_student_text", "load_ranked"):
+            setattr(m, name, self.wrap("db_fetch", getattr(m, name)))
+        for name in ("project_query_text", "pack_project"):
+            setattr(m, name, self.wrap("packing", getattr(m, name)))
+        m.aembed_texts = self.wrap("embedding", m.aembed_texts)
+        for name in ("vector_hits", "rrf_fuse"):
+            setattr(m, name, self.wrap("ranking", getattr(m, name)))
+        m.student_bm25.search = self.wrap("ranking", m.student_bm25.search)
+        m.student_out = self.wrap("serialization", m.student_out)
+        fastapi.routing.serialize_response = self.wrap("serialization", fastapi.routing.serialize_response)
+
+    def report(self, requests: int) -> Dict[str, Any]:
+        return {
+            stage: {
+                "calls": len(xs),
+                "ms_per_request": round(1000 * sum(xs) / max(1, requests), 3),
+                **percentiles(xs),
+            }
+            for stage, xs in sorted(self.samples.items())
+        }
+
+
+def percentiles(xs: List[float]) -> Dict[str, float]:
+    if not xs:
+        return {"p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+    p50, p95, p99 = np.percentile(np.asarray(xs) * 1000, [50, 95, 99])
+    return {"p50_ms": round(p50, 3), "p95_ms": round(p95, 3), "p99_ms": round(p99, 3),
+            "max_ms": round(1000 * max(xs), 3)}
+
+def peak_rss_mb() -> float:
+    kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(kb / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def git_rev() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+# ---------- driver ----------
+def request_for(args, pid: int):
+    if args.endpoint == "draft":
+        return "POST", f"/projects/{pid}/draft_stack", {}
+    params = {"topk": args.topk, "mode": args.mode}
+    if args.require_skills:
+        params["require_skills"] = args.require_skills
+    return "GET", f"/match/project/{pid}", params
+
+async def drive(args, pids: List[int], stages: Stages) -> Dict[str, Any]:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one(i: int) -> float:
+            method, url, params = request_for(args, pids[i % len(pids)])
+            t = time.perf_counter()
+            r = await client.request(method, url, params=params)
+            r.raise_for_status()
+            r.json()
+            return time.perf_counter() - t
+
+        # first requests pay for index build and backfill; keep them out of the numbers
+        for i in range(args.warmup):
+            await one(i)
+        stages.enabled = True
+
+        sem = asyncio.Semaphore(args.concurrency)
+        async def bounded(i: int) -> float:
+            async with sem:
+                return await one(i)
+
+        t0 = time.perf_counter()
+        lat = await asyncio.gather(*(bounded(args.warmup + i) for i in range(args.requests)))
+        wall = time.perf_counter() - t0
+    return {
+        "n": len(lat),
+        "wall_s": round(wall, 3),
+        "throughput_rps": round(len(lat) / wall, 2) if wall else None,
+        **percentiles(lat),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Synthetic-scale benchmark for /match (and draft_stack)")
+    ap.add_argument("--students", type=int, default=10000)
+    ap.add_argument("--projects", type=int, default=50)
+    ap.add_argument("--vocab", type=int, default=500, help="distinct skills (Zipf-weighted)")
+    ap.add_argument("--words", type=int, default=40, help="words per summary/description")
+    ap.add_argument("--batch", type=int, default=2000, help="ingest batch size")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--endpoint", choices=["match", "draft"], default="match")
+    ap.add_argument("--mode", choices=["hybrid", "vector", "lexical"], default="hybrid")
+    ap.add_argument("--topk", type=int, default=5)
+    ap.add_argument("--require-skills", default=None)
+    ap.add_argument("--requests", type=int, default=200)
+    ap.add_argument("--warmup", type=int, default=5)
+    ap.add_argument("--concurrency", type=int, default=1)
+    ap.add_argument("--embed-latency", type=float, default=50.0, help="stub delay per embedding call, ms")
+    ap.add_argument("--chat-latency", type=float, default=500.0, help="stub delay per chat call, ms")
+    ap.add_argument("--embed-cache", action="store_true",
+                    help="keep the embedding cache on (by default every query pays --embed-latency)")
+    ap.add_argument("--out", help="write the JSON report here (default: stdout)")
+    args = ap.parse_args()
+
+    if "DATABASE_URL" not in os.environ:
+        raise SystemExit("Set DATABASE_URL to a scratch database; the benchmark drops and recreates all tables.")
+
+    embeddings.provider = StubEmbeddings(embeddings.provider, args.embed_latency / 1000)
+    llm.chat = StubChat(llm.chat, args.chat_latency / 1000)
+
+    print(f"… generating {args.students} students / {args.projects} projects", file=sys.stderr)
+    setup = populate(args)
+    pids = setup.pop("project_ids")
+    setup["rss_after_setup_mb"] = peak_rss_mb()
+    if not args.embed_cache:
+        # the bench cycles through a few projects: a warm cache would turn every measured query embed into a hit
+        embeddings.cache = EmbeddingCache(max_bytes=0, directory="")
+
+    stages = Stages()
+    stages.instrument()
+    print(f"… {args.warmup} warmup + {args.requests} requests to {args.endpoint}", file=sys.stderr)
+    result = asyncio.run(drive(args, pids, stages))
+
+    report = {
+        "git": git_rev(),
+        "python": platform.python_version(),
+        "config": {k: v for k, v in vars(args).items() if k != "out"},
+        "setup": setup,
+        "latency": result,
+        "stages": stages.report(result["n"]),
+        "stub_calls": {"embed": embeddings.provider.calls, "embed_inputs": embeddings.provider.inputs,
+                       "chat": llm.chat.calls},
+        "embed_cache": embeddings.cache.stats(),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    out = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(out + "\n")
+        print(f"✅ p50 {result['p50_ms']} ms, p99 {result['p99_ms']} ms, "
+              f"{result['throughput_rps']} req/s → {args.out}", file=sys.stderr)
+    else:
+        print(out)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+# backend/corpus.py
+"""
+Write the compact student-vector snapshot that API workers memory-map at startup.
+Run from the project root (same INDEX_DIM / INDEX_DTYPE / EMBED_MODEL as the API):
+    CORPUS_PATH=/var/lib/sangam/corpus python -m backend.corpus
+Workers with CORPUS_PATH set map the snapshot copy-on-write (one resident copy
+shared through the page cache) and only load profile_embeddings rows newer than it.
+With INDEX_MODE=sharded this also fills the SHARD_SEGMENT shared-memory segment,
+which outlives the script: workers started afterwards attach to it.
+"""
+from backend.db import SessionLocal
+from backend.services.profile_store import CORPUS_PATH, backfill_student_embeddings, save_student_snapshot
+
+def main():
+    if not CORPUS_PATH:
+        raise SystemExit("Set CORPUS_PATH to the snapshot directory.")
+    db = SessionLocal()
+    try:
+        backfill_student_embeddings(db)
+        info = save_student_snapshot(db)
+    finally:
+        db.close()
+    print(f"✅ Wrote {info['rows']} vectors ({info['bytes'] / 1e6:.1f} MB) to {info['path']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+# backend/embed_worker.py
+"""
+Embed worker: drain the write-behind embedding queue (embed_jobs).
+Run from the project root:
+    python -m backend.embed_worker              # keep draining, polling every second
+    python -m backend.embed_worker --once       # drain what's queued now and exit
+Profile/project writes only enqueue a job; repeated writes to one entity share
+it, and each drain re-embeds up to EMBED_QUEUE_BATCH entities in one call.
+After a drain that found nothing, at most every EMBED_BACKFILL_INTERVAL seconds,
+the worker also queues students that have no vector yet (--once always does).
+The API runs the same loop in-process unless EMBED_WORKER_INTERVAL=0.
+"""
+import argparse
+import sys
+import time
+
+from backend.db import SessionLocal
+from backend.services.embed_queue import (
+    EMBED_BACKFILL_INTERVAL, EMBED_WORKER_INTERVAL, drain_all, enqueue_backfill, queue_stats,
+)
+from backend.services.result_cache import MATCH_CACHE
+
+_last_backfill = float("-inf")
+
+def _backfill(db) -> int:
+    global _last_backfill
+    _last_backfill = time.monotonic()
+    return enqueue_backfill(db)
+
+def run_once(backfill: bool = False) -> dict:
+    """One drain; `backfill` queues unembedded students first instead of waiting for an idle tick."""
+    db = SessionLocal()
+    try:
+        queued = _backfill(db) if backfill else 0
+        r = drain_all(db)
+        # two scans of users: only when there was nothing to do, and not every tick
+        idle = not r["claimed"] and EMBED_BACKFILL_INTERVAL > 0
+        if idle and time.monotonic() - _last_backfill >= EMBED_BACKFILL_INTERVAL:
+            queued = _backfill(db)  # drained on the next tick
+        return {**r, "backfill_queued": queued, **queue_stats(db)}
+    finally:
+        db.close()
+
+def main():
+    ap = argparse.ArgumentParser(description="Drain the embedding job queue")
+    ap.add_argument("--every", type=float, default=EMBED_WORKER_INTERVAL or 1, help="seconds between polls")
+    ap.add_argument("--once", action="store_true", help="drain once and exit")
+    args = ap.parse_args()
+    if MATCH_CACHE == "memory":
+        print("⚠️  MATCH_CACHE=memory: this process's cache version bumps don't reach the API workers; "
+              "set MATCH_CACHE=redis for them and for this worker", file=sys.stderr)
+
+    while True:
+        r = run_once(backfill=args.once)
+        if r["claimed"] or args.once:
+            print(f"✅ {r['claimed']} jobs, {r['embedded']} embedded, {r['failed']} failed; "
+                  f"{r['depth']} pending, lag {r['lag_seconds']}s")
+        if args.once:
+            break
+        time.sleep(args.every)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+# backend/ingest.py
+"""
+Bulk-load profiles from NDJSON (one UserIn object per line) or CSV (header row).
+Run from the project root:
+    python -m backend.ingest students.ndjson
+    python -m backend.ingest students.csv --batch 2000 --no-embed
+Rows are validated with UserIn, inserted in executemany batches, and each
+batch is embedded in one embed_texts call (--no-embed queues them for the
+embed worker instead). Bad rows are reported, not fatal: a batch the database
+rejects is retried row by row so only the offending rows are dropped.
+"""
+import argparse
+import csv
+import json
+import sys
+from itertools import islice
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+
+from backend.matching import pack_profile
+from backend.models import User
+from backend.schemas import UserIn
+from backend.services.embed_queue import EMBED_QUEUE, enqueue
+from backend.services.profile_store import insert_profile_embeddings
+from backend.services.result_cache import match_cache
+from backend.services.tags import sync_user_tags
+
+INGEST_BATCH = 1000
+
+
+def parse_rows(lines: Iterable[str], fmt: str, header: Optional[List[str]] = None) -> Iterator[Any]:
+    """Yield one raw row per non-empty line (CSV: per record; header fields default to the first row)."""
+    if fmt == "csv":
+        # no blank-line filter: blank lines can sit inside quoted fields, and DictReader skips empty rows itself
+        yield from csv.DictReader(lines, fieldnames=header)
+        return
+    for line in lines:
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                yield e
+
+def _insert_users(db: Session, valid: List[tuple], errors: List[Dict[str, Any]]) -> tuple:
+    """Insert (row number, UserIn) pairs; returns the new ids and the users that went in."""
+    try:
+        ids = db.scalars(
+            insert(User).returning(User.id, sort_by_parameter_order=True),
+            [u.model_dump() for _, u in valid],
+        ).all()
+        return ids, [u for _, u in valid]
+    except DBAPIError:
+        # one row the database rejects aborts the whole executemany: find it row by row
+        db.rollback()
+    ids, users = [], []
+    for n, u in valid:
+        try:
+            with db.begin_nested():
+                ids.append(db.scalar(insert(User).returning(User.id), u.model_dump()))
+            users.append(u)
+        except DBAPIError as e:
+            errors.append({"row": n, "error": f"insert failed: {e.orig}"})
+    return ids, users
+
+def ingest_batch(db: Session, rows: List[Any], first_row: int, embed: bool = True) -> Dict[str, Any]:
+    valid, errors = [], []
+    for n, row in enumerate(rows, first_row):
+        try:
+            if isinstance(row, Exception):
+                raise row
+            valid.append((n, UserIn.model_validate(row)))
+        except (ValidationError, ValueError) as e:
+            errors.append({"row": n, "error": str(e)})
+    if not valid:
+        return {"inserted": 0, "embedded": 0, "errors": errors}
+
+    ids, valid = _insert_users(db, valid, errors)
+    sync_user_tags(db, [SimpleNamespace(id=i, **u.model_dump()) for i, u in zip(ids, valid)])
+    if EMBED_QUEUE and not embed:
+        enqueue(db, "profile", ids)
+    db.commit()
+
+    embedded = 0
+    if embed:
+        try:
+            embedded = insert_profile_embeddings(db, ids, [pack_profile(u) for u in valid])
+            db.commit()
+        except Exception as e:
+            # users are saved; the embed worker's backfill sweep picks them up
+            db.rollback()
+            errors.append({"row": first_row, "error": f"embedding failed for batch: {e}"})
+    return {"inserted": len(ids), "embedded": embedded, "errors": errors}
+
+def ingest(db: Session, rows: Iterable[Any], batch_size: int = INGEST_BATCH, embed: bool = True,
+           progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    report = {"inserted": 0, "embedded": 0, "errors": []}
+    it, row_no = iter(rows), 1
+    while batch := list(islice(it, batch_size)):
+        out = ingest_batch(db, batch, row_no, embed)
+        row_no += len(batch)
+        report["inserted"] += out["inserted"]
+        report["embedded"] += out["embedded"]
+        report["errors"].extend(out["errors"])
+        if progress:
+            progress({"rows": row_no - 1, **{k: report[k] for k in ("inserted", "embedded")},
+                      "errors": len(report["errors"])})
+    return report
+
+def main():
+    from backend.db import SessionLocal
+
+    ap = argparse.ArgumentParser(description="Bulk-load profiles from NDJSON or CSV")
+    ap.add_argument("path", help="input file, or - for stdin")
+    ap.add_argument("--format", choices=["ndjson", "csv"], help="default: from file extension")
+    ap.add_argument("--batch", type=int, default=INGEST_BATCH)
+    ap.add_argument("--no-embed", action="store_true", help="leave embedding to the embed worker")
+    args = ap.parse_args()
+
+    fmt = args.format or ("csv" if args.path.endswith(".csv") else "ndjson")
+    f = sys.stdin if args.path == "-" else open(args.path, newline="", encoding="utf-8")
+    db = SessionLocal()
+    try:
+        report = ingest(
+            db, parse_rows(f, fmt), args.batch, embed=not args.no_embed,
+            progress=lambda p: print(f"… {p['rows']} rows, {p['inserted']} inserted, "
+                                     f"{p['embedded']} embedded, {p['errors']} errors", file=sys.stderr),
+        )
+    finally:
+        db.close()
+        f.close()
+    if report["inserted"]:
+        match_cache.bump()  # reaches API workers when MATCH_CACHE=redis
+
+    for err in report["errors"]:
+        print(f"row {err['row']}: {err['error']}", file=sys.stderr)
+    print(f"✅ Inserted {report['inserted']} profiles ({report['embedded']} embedded, {len(report['errors'])} errors).")
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,97 @@
+import asyncio
+import logging
 import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from .db import Base, engine
+from fastapi.responses import PlainTextResponse
+from .db import Base, SessionLocal, async_engine, engine
+from .embed_worker import run_once as drain_embed_queue
 from .routers import profiles, projects, match
+from .services.embed_cache import cache
+from .services.embed_queue import EMBED_QUEUE, EMBED_WORKER_INTERVAL
+from .services.embeddings import EMBED_MODEL, embed_calls
+from .services.llm import chat_calls
+from .services.profile_store import warm_student_index
+from .services.result_cache import MATCH_CACHE
+from .services.telemetry import TELEMETRY, TelemetryMiddleware, registry
+from .services.watchlist import WATCHLIST_SCAN_INTERVAL, scan_watchlists
 
-Base.metadata.create_all(bind=engine)
+# Schema creation is opt-in (dev/demo); deployments run `python -m backend.seed` or migrations
+DB_CREATE_ALL = os.getenv("DB_CREATE_ALL", "0") == "1"
+# Load the student index / embedding cache before the worker accepts traffic
+WARM_START = os.getenv("WARM_START", "1") == "1"
 
-app = FastAPI(title="Campus Networking Backend")
+log = logging.getLogger(__name__)
+
+def warm_start():
+    db = SessionLocal()
+    try:
+        students = warm_student_index(db)
+    finally:
+        db.close()
+    cached = cache.warm(EMBED_MODEL)
+    log.info("warm start: %d student vectors, %d cached embeddings", students, cached)
+
+def check_cache_invalidation():
+    """Queued vectors land after the write; cached rankings only drop when the embedder's bump reaches them."""
+    if not EMBED_QUEUE or MATCH_CACHE != "memory":
+        return
+    if EMBED_WORKER_INTERVAL <= 0:
+        raise RuntimeError("EMBED_QUEUE=1 with a standalone embed worker needs MATCH_CACHE=redis (or off): "
+                           "its version bumps never reach this process's memory cache")
+    log.warning("EMBED_QUEUE=1 with MATCH_CACHE=memory: each API worker only sees bumps from its own "
+                "embed loop; use MATCH_CACHE=redis with several workers or a standalone embed worker")
+
+def scan_once():
+    db = SessionLocal()
+    try:
+        return scan_watchlists(db)
+    finally:
+        db.close()
+
+async def watchlist_scheduler():
+    # enable in one worker only (or run `python -m backend.scanner` from cron instead)
+    while True:
+        try:
+            log.info("watchlist scan: %s", await run_in_threadpool(scan_once))
+        except Exception:
+            log.exception("watchlist scan failed")
+        await asyncio.sleep(WATCHLIST_SCAN_INTERVAL)
+
+async def embed_worker():
+    # safe in every worker: jobs are leased, so concurrent drains take disjoint batches
+    while True:
+        try:
+            r = await run_in_threadpool(drain_embed_queue)
+            if r["claimed"]:
+                log.info("embed queue: %s", r)
+        except Exception:
+            log.exception("embed queue drain failed")
+        await asyncio.sleep(EMBED_WORKER_INTERVAL)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    check_cache_invalidation()
+    if DB_CREATE_ALL:
+        await run_in_threadpool(Base.metadata.create_all, bind=engine)
+    if WARM_START:
+        try:
+            await run_in_threadpool(warm_start)
+        except Exception:
+            # profile-only deployments still come up; the index then loads on first match
+            log.exception("warm start failed")
+    scanner = asyncio.create_task(watchlist_scheduler()) if WATCHLIST_SCAN_INTERVAL > 0 else None
+    embedder = asyncio.create_task(embed_worker()) if EMBED_QUEUE and EMBED_WORKER_INTERVAL > 0 else None
+    yield
+    for task in (scanner, embedder):
+        if task:
+            task.cancel()
+    await async_engine.dispose()
+    engine.dispose()
+
+app = FastAPI(title="Campus Networking Backend", lifespan=lifespan)
 
 # CORS for local dev + Streamlit
 origins = [
@@ -23,6 +108,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Outermost, so its total covers CORS and serialization too
+if TELEMETRY:
+    app.add_middleware(TelemetryMiddleware)
+
 app.include_router(profiles.router)
 app.include_router(projects.router)
 app.include_router(match.router)
@@ -30,3 +119,12 @@ app.include_router(match.router)
 @app.get("/")
 def root():
     return {"ok": True}
+
+if TELEMETRY:
+    @app.get("/metrics", include_in_schema=False)
+    def metrics():
+        return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+    @app.get("/outbound_stats", include_in_schema=False)
+    def outbound_stats():
+        return {"embed": embed_calls.stats(), "chat": chat_calls.stats()}
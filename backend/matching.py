@@ -1,7 +1,9 @@
 from typing import List
-import numpy as np
+from .services.embeddings import embed_texts
+from .services.index import VectorIndex
 
-# existing: embed(), cosine_rank(), pack_profile()
+def pack_profile(s) -> str:
+    return f"Name: {s.name}\nSummary: {s.summary}\nSkills: {s.skills}\nInterests: {s.interests}"
 
 def pack_project(title: str, description: str, tags: str | None, stack: str | None) -> str:
     t = [
@@ -13,7 +15,10 @@ def pack_project(title: str, description: str, tags: str | None, stack: str | No
     return "\n".join(t)
 
 def topk_by_cosine(query_text: str, corpus_texts: List[str], k: int = 5):
-    qv = embed([query_text])[0]
-    M = embed(corpus_texts)
-    order = cosine_rank(qv, M)[:k]
-    return order
+    if not corpus_texts:
+        return []
+    qv = embed_texts([query_text])[0]
+    index = VectorIndex()
+    index.add(range(len(corpus_texts)), embed_texts(corpus_texts))
+    order, _ = index.search(qv, k)
+    return order.tolist()
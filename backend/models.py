@@ -1,7 +1,8 @@
 # backend/models.py
+from datetime import datetime, timezone
 from typing import Optional
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import String, Integer, ForeignKey, Text
+from sqlalchemy import String, Integer, Float, ForeignKey, Text, LargeBinary, DateTime, Index, UniqueConstraint
 from .db import Base
 
 class User(Base):
@@ -9,7 +10,7 @@ class User(Base):
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     name: Mapped[str] = mapped_column(String(120), nullable=False)
-    role: Mapped[str] = mapped_column(String(20), nullable=False)  # "student" | "professor"
+    role: Mapped[str] = mapped_column(String(20), nullable=False, index=True)  # "student" | "professor"
     email: Mapped[str] = mapped_column(String(200), nullable=False)
     summary: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
     skills: Mapped[Optional[str]] = mapped_column(Text, nullable=True)      # comma-separated
@@ -21,10 +22,36 @@ class User(Base):
         back_populates="owner",
         cascade="all, delete-orphan"
     )
+    embedding: Mapped[Optional["ProfileEmbedding"]] = relationship(
+        back_populates="user",
+        cascade="all, delete-orphan",
+        uselist=False,
+    )
 
     def __repr__(self) -> str:
         return f"<User id={self.id} name={self.name!r} role={self.role!r}>"
 
+class ProfileEmbedding(Base):
+    """
+    Stored vector for a user's packed profile text.
+    Re-embedded only when text_hash (sha256 of pack_profile) or model changes.
+    """
+    __tablename__ = "profile_embeddings"
+
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    model: Mapped[str] = mapped_column(String(100), nullable=False)
+    text_hash: Mapped[str] = mapped_column(String(64), nullable=False)
+    dim: Mapped[int] = mapped_column(Integer, nullable=False)
+    vector: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)  # float32, L2-normalized
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc)
+    )
+
+    user: Mapped["User"] = relationship(back_populates="embedding")
+
+    def __repr__(self) -> str:
+        return f"<ProfileEmbedding user_id={self.user_id} model={self.model!r} dim={self.dim}>"
+
 class Project(Base):
     __tablename__ = "projects"
 
@@ -40,6 +67,34 @@ class Project(Base):
     def __repr__(self) -> str:
         return f"<Project id={self.id} title={self.title!r} owner_id={self.owner_id}>"
 
+class Tag(Base):
+    """Normalized (lower-cased, trimmed) skill / interest / tag / stack term."""
+    __tablename__ = "tags"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    name: Mapped[str] = mapped_column(String(100), nullable=False, unique=True)
+
+    def __repr__(self) -> str:
+        return f"<Tag id={self.id} name={self.name!r}>"
+
+class UserTag(Base):
+    """User <-> tag link; kind is "skill" | "interest". Rewritten from User.skills/interests on write."""
+    __tablename__ = "user_tags"
+    __table_args__ = (Index("ix_user_tags_tag_kind", "tag_id", "kind"),)
+
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    tag_id: Mapped[int] = mapped_column(ForeignKey("tags.id", ondelete="CASCADE"), primary_key=True)
+    kind: Mapped[str] = mapped_column(String(20), primary_key=True)
+
+class ProjectTag(Base):
+    """Project <-> tag link; kind is "tag" | "stack". Rewritten from Project.tags/stack on write."""
+    __tablename__ = "project_tags"
+    __table_args__ = (Index("ix_project_tags_tag_kind", "tag_id", "kind"),)
+
+    project_id: Mapped[int] = mapped_column(ForeignKey("projects.id", ondelete="CASCADE"), primary_key=True)
+    tag_id: Mapped[int] = mapped_column(ForeignKey("tags.id", ondelete="CASCADE"), primary_key=True)
+    kind: Mapped[str] = mapped_column(String(20), primary_key=True)
+
 class StudentWatchlist(Base):
     """
     Optional: used by your 'Opportunity Scanner' agent.
@@ -53,5 +108,89 @@ class StudentWatchlist(Base):
     topics: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
     cadence: Mapped[Optional[str]] = mapped_column(String(20), nullable=True)
 
+    # scanner state: topics vector (re-embedded when topics_hash/model change) and progress
+    model: Mapped[Optional[str]] = mapped_column(String(100), nullable=True)
+    topics_hash: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
+    vector: Mapped[Optional[bytes]] = mapped_column(LargeBinary, nullable=True)
+    last_project_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)  # projects <= this were scanned
+    start_project_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)  # projects <= this predate it
+    last_run_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+
     def __repr__(self) -> str:
         return f"<Watchlist id={self.id} user_id={self.user_id} cadence={self.cadence!r}>"
+
+class ProjectEmbedding(Base):
+    """Stored vector for a project's pack_project text; re-embedded when text_hash or model changes."""
+    __tablename__ = "project_embeddings"
+
+    project_id: Mapped[int] = mapped_column(ForeignKey("projects.id", ondelete="CASCADE"), primary_key=True)
+    model: Mapped[str] = mapped_column(String(100), nullable=False)
+    text_hash: Mapped[str] = mapped_column(String(64), nullable=False)
+    dim: Mapped[int] = mapped_column(Integer, nullable=False)
+    vector: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)  # float32, L2-normalized
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc)
+    )
+
+class Notification(Base):
+    """A new project that matched one of a student's watchlists."""
+    __tablename__ = "notifications"
+    __table_args__ = (
+        UniqueConstraint("watchlist_id", "project_id"),
+        Index("ix_notifications_user_id_id", "user_id", "id"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    watchlist_id: Mapped[int] = mapped_column(ForeignKey("student_watchlists.id", ondelete="CASCADE"), nullable=False)
+    project_id: Mapped[int] = mapped_column(ForeignKey("projects.id", ondelete="CASCADE"), nullable=False)
+    score: Mapped[float] = mapped_column(Float, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc)
+    )
+    read_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+
+    def __repr__(self) -> str:
+        return f"<Notification id={self.id} user_id={self.user_id} project_id={self.project_id}>"
+
+class EmbedJob(Base):
+    """
+    Pending "re-embed this entity" work (kind: "profile" | "project").
+    One row per entity, so repeated writes coalesce; updated_at moves on every
+    enqueue and the worker only deletes the row if it didn't move meanwhile.
+    """
+    __tablename__ = "embed_jobs"
+    __table_args__ = (Index("ix_embed_jobs_enqueued_at", "enqueued_at"),)
+
+    kind: Mapped[str] = mapped_column(String(20), primary_key=True)
+    entity_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    enqueued_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)  # oldest pending write
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)   # latest write
+    claimed_until: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)  # lease / retry backoff
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    last_error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+
+    def __repr__(self) -> str:
+        return f"<EmbedJob {self.kind}:{self.entity_id} attempts={self.attempts}>"
+
+class FieldEmbedding(Base):
+    """
+    One vector per non-empty field of a profile or project (kind: "profile" | "project"),
+    so ranking can weight fields at query time without re-embedding.
+    """
+    __tablename__ = "field_embeddings"
+    __table_args__ = (Index("ix_field_embeddings_kind_updated_at", "kind", "updated_at"),)
+
+    kind: Mapped[str] = mapped_column(String(20), primary_key=True)
+    entity_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    field: Mapped[str] = mapped_column(String(20), primary_key=True)  # see services/fields.py
+    model: Mapped[str] = mapped_column(String(100), nullable=False)
+    text_hash: Mapped[str] = mapped_column(String(64), nullable=False)
+    dim: Mapped[int] = mapped_column(Integer, nullable=False)
+    vector: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)  # float32, L2-normalized
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), nullable=False
+    )
+
+    def __repr__(self) -> str:
+        return f"<FieldEmbedding {self.kind}:{self.entity_id}.{self.field} model={self.model}>"
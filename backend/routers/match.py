@@ -1,42 +1,243 @@
-from fastapi import APIRouter, Depends, HTTPException
+import asyncio
+import os
+import numpy as np
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy import select
-from sqlalchemy.orm import Session
-from ..db import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..db import get_async_db
+from ..matching import pack_project
 from ..models import Project, User
-from ..services.embeddings import embed_texts, cosine_rank
+from ..schemas import MAX_TOPK, MatchMode, ProjectBatchQuery, StudentQuery
+from ..services.bm25 import rrf_fuse
+from ..services.embed_cache import cache
+from ..services.embed_queue import EMBED_QUEUE, queue_stats
+from ..services.embeddings import aembed_texts
+from ..services.fields import aproject_queries, parse_weights, sync_field_index
+from ..services.peers import peer_graph
+from ..services.result_cache import match_cache
+from ..services.profile_store import (
+    INDEX_RERANK, abackfill_student_embeddings, rerank, student_bm25, student_tags, sync_student_index,
+    sync_student_text,
+)
+from ..services.tags import split_tags
+from ..services.telemetry import count, span
+
+# Blend for /match/peers: (1 - w) * own profile vector + w * free-text query vector
+PEER_QUERY_WEIGHT = float(os.getenv("PEER_QUERY_WEIGHT", "0.5"))
+# Hybrid ranking: candidates taken from each ranker before fusion, and how long to
+# wait for the query embedding before answering lexically (0 = no limit)
+HYBRID_DEPTH = int(os.getenv("HYBRID_DEPTH", "50"))
+HYBRID_EMBED_TIMEOUT = float(os.getenv("HYBRID_EMBED_TIMEOUT", "3.0"))
 
 router = APIRouter(prefix="/match", tags=["match"])
 
-def pack_profile(s: User) -> str:
-    return f"Name: {s.name}\nSummary: {s.summary}\nSkills: {s.skills}\nInterests: {s.interests}"
+def student_out(s: User) -> dict:
+    return {
+        "id": s.id,
+        "name": s.name,
+        "email": s.email,
+        "summary": s.summary,
+        "skills": s.skills,
+        "interests": s.interests,
+    }
+
+def project_query_text(p: Project) -> str:
+    return f"{p.title}\n{p.description}\nStack: {p.stack}\nTags: {p.tags}"
+
+async def load_ranked(db: AsyncSession, id_lists: list[np.ndarray]) -> list[list[User]]:
+    """Resolve several ranked id lists with one query, keeping each list's order."""
+    wanted = {i for ids in id_lists for i in ids.tolist()}
+    by_id = {u.id: u for u in await db.scalars(select(User).where(User.id.in_(wanted)))} if wanted else {}
+    return [[by_id[i] for i in ids.tolist() if i in by_id] for ids in id_lists]
+
+async def vector_hits(db: AsyncSession, index, Q: np.ndarray, k: int, within) -> list[np.ndarray]:
+    """
+    Top-k ids per query row; compact/truncated indexes over-fetch and re-score in float32.
+    Scans run in the threadpool: a ShardedIndex blocks on its shard processes, and the
+    event loop must keep serving other requests meanwhile.
+    """
+    if INDEX_RERANK and (index.compact or index.truncate_dim):
+        candidates = [ids for ids, _ in await run_in_threadpool(index.search_many, Q, k * INDEX_RERANK, within)]
+        return await db.run_sync(lambda s: rerank(s, Q, candidates, k))
+    return [ids for ids, _ in await run_in_threadpool(index.search_many, Q, k, within)]
+
+def restates_profile(body: StudentQuery, me: User) -> bool:
+    """Interests/skills equal to the stored ones (as tag sets): the own vector already says it all."""
+    return all(
+        set(split_tags(given)) == set(split_tags(stored))
+        for given, stored in ((body.interests, me.interests), (body.skills, me.skills))
+    )
+
+def field_weights(weights) -> dict | None:
+    try:
+        return parse_weights(weights)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+def weights_key(weights: dict | None) -> str:
+    return ",".join(f"{f}:{w:g}" for f, w in sorted(weights.items())) if weights else ""
+
+async def rank_projects(db: AsyncSession, projects: list[Project], topk: int,
+                        require_skills: str | None = None, mode: str = "hybrid",
+                        weights: dict | None = None) -> tuple[list[list[User]], bool]:
+    """
+    Embed all project queries in one call and score them against students in one product.
+    hybrid fuses vector and BM25 rankings (RRF) and degrades to BM25 alone when the
+    embedding call fails or exceeds HYBRID_EMBED_TIMEOUT; lexical never calls the API.
+    BM25 covers every student, so profiles without a vector yet still rank lexically.
+    With per-field `weights` the vector side scores sum_f w_f * (field matrix @ query)
+    over stored field vectors instead, so re-weighting costs no embedding calls.
+    Returns the ranked students per project and whether hybrid fell back to BM25.
+    """
+    query_texts = [project_query_text(p) for p in projects]
+    lexical_texts = [pack_project(p.title, p.description, p.tags, p.stack) for p in projects]
+    Q, degraded = None, False
+    if mode != "lexical":
+        try:
+            # Stored vectors: the embed worker keeps them fresh; without it vector mode embeds missing
+            # profiles here (hybrid skips that: it has a latency budget, and BM25 already covers them)
+            if not EMBED_QUEUE and mode == "vector":
+                with span("backfill"):
+                    await abackfill_student_embeddings(db)
+            if weights is None:
+                pending = aembed_texts(query_texts, hedge=True)
+            else:
+                pending = aproject_queries(db, projects, weights, query_texts)
+            if mode == "hybrid" and HYBRID_EMBED_TIMEOUT > 0:
+                pending = asyncio.wait_for(pending, HYBRID_EMBED_TIMEOUT)
+            Q = await pending
+        except Exception:
+            if mode == "vector":
+                raise
+            await db.rollback()
+            degraded = True
+            count("match_degraded")
+
+    with span("index_sync"):
+        await db.run_sync(sync_student_text)
+        index = await db.run_sync(sync_student_index) if Q is not None else None
+        fields = await db.run_sync(sync_field_index) if weights is not None and Q is not None else None
+    # "must know X": cut candidates via the tag index before any vector scoring
+    within = student_tags.match_all(split_tags(require_skills)) if require_skills else None
+    if within is not None and within.size == 0:
+        return [[] for _ in projects], degraded
+    if index is not None and len(index) == 0:
+        if mode == "vector":
+            return [[] for _ in projects], degraded
+        Q = None  # nothing embedded yet: BM25 alone
+
+    async def hits(k: int) -> list[np.ndarray]:
+        if fields is not None and len(fields):  # before the first field backfill, the packed index stands in
+            return [ids for ids, _ in await run_in_threadpool(fields.search_many, Q, k, weights, within)]
+        return await vector_hits(db, index, Q, k, within)
+
+    with span("rank"):
+        if Q is None:
+            id_lists = [student_bm25.search(t, topk, within)[0] for t in lexical_texts]
+        elif mode == "vector":
+            id_lists = await hits(topk)
+        else:
+            depth = max(HYBRID_DEPTH, topk)
+            id_lists = [
+                rrf_fuse([ids, student_bm25.search(t, depth, within)[0]], topk)
+                for ids, t in zip(await hits(depth), lexical_texts)
+            ]
+    with span("db"):
+        return await load_ranked(db, id_lists), degraded
 
 @router.get("/project/{pid}")
-def match_students_for_project(pid: int, topk: int = 5, db: Session = Depends(get_db)):
-    proj = db.get(Project, pid)
+async def match_students_for_project(
+    pid: int, topk: int = Query(5, ge=1, le=MAX_TOPK), require_skills: str | None = None, mode: MatchMode = "hybrid",
+    weights: str | None = Query(None, description="Per-field weights, e.g. skills:2,interests:0.5 (others stay 1)"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    skills = ",".join(sorted(split_tags(require_skills))) if require_skills else ""
+    weights = field_weights(weights)
+    key = await match_cache.key("project", pid, topk, mode, skills, weights_key(weights))
+    with span("result_cache"):
+        hit = await match_cache.get(key)
+    if hit is not None:
+        return hit
+
+    with span("db"):
+        proj = await db.get(Project, pid)
     if not proj:
         raise HTTPException(404, "Project not found")
 
-    students = db.scalars(select(User).where(User.role == "student")).all()
-    if not students:
+    ranked, degraded = await rank_projects(db, [proj], topk, require_skills, mode, weights)
+    # Return plain dicts to match your Streamlit consumption
+    with span("serialize"):
+        out = [student_out(s) for s in ranked[0]]
+    if not degraded:  # a BM25-only fallback shouldn't outlive the outage that caused it
+        await match_cache.set(key, out)
+    return out
+
+@router.post("/projects")
+async def match_students_for_projects(body: ProjectBatchQuery, db: AsyncSession = Depends(get_async_db)):
+    pids = list(dict.fromkeys(body.project_ids))
+    weights = field_weights(body.weights)
+    with span("db"):
+        by_id = {p.id: p for p in await db.scalars(select(Project).where(Project.id.in_(pids)))}
+    missing = [pid for pid in pids if pid not in by_id]
+    if missing:
+        raise HTTPException(404, f"Projects not found: {missing}")
+
+    projects = [by_id[pid] for pid in pids]
+    ranked, _ = await rank_projects(db, projects, body.topk, body.require_skills, body.mode, weights)
+    with span("serialize"):
+        return [
+            {"project_id": p.id, "students": [student_out(s) for s in students]}
+            for p, students in zip(projects, ranked)
+        ]
+
+@router.post("/peers")
+async def match_peers(body: StudentQuery, topk: int = Query(5, ge=1, le=MAX_TOPK), db: AsyncSession = Depends(get_async_db)):
+    with span("db"):
+        me = await db.get(User, body.user_id)
+    if not me:
+        raise HTTPException(404, "User not found")
+
+    if not EMBED_QUEUE:
+        with span("backfill"):
+            await abackfill_student_embeddings(db)
+    with span("index_sync"):
+        index = await db.run_sync(sync_student_index)
+    own = index.get(me.id)
+    query_text = "\n".join(
+        f"{label}: {value}"
+        for label, value in (("Interests", body.interests), ("Skills", body.skills))
+        if value and value.strip()
+    )
+
+    if own is None and not query_text:
         return []
+    if own is not None and (not query_text or restates_profile(body, me)):
+        # common case: precomputed neighbour list, no scan
+        with span("rank"):
+            ids = await run_in_threadpool(peer_graph.neighbours, index, me.id, topk)
+    else:
+        # get() returns stored (possibly truncated) vectors: blend in the index's space
+        qv = index.prepare_query((await aembed_texts([query_text], hedge=True))[0])
+        if own is not None:
+            qv = (1 - PEER_QUERY_WEIGHT) * own + PEER_QUERY_WEIGHT * qv
+            qv /= np.linalg.norm(qv) + 1e-12
+        with span("rank"):
+            ids, _ = await run_in_threadpool(index.search, qv, topk, exclude=[me.id])
 
-    query_text = f"{proj.title}\n{proj.description}\nStack: {proj.stack}\nTags: {proj.tags}"
-    qv = embed_texts([query_text])[0]
+    with span("db"):
+        ranked = (await load_ranked(db, [ids]))[0]
+    with span("serialize"):
+        return [student_out(s) for s in ranked]
 
-    corpus = [pack_profile(s) for s in students]
-    M = embed_texts(corpus)
+@router.get("/cache_stats")
+def embedding_cache_stats():
+    return cache.stats()
 
-    order = cosine_rank(qv, M)[:topk]
-    ranked = [students[i] for i in order]
-    # Return plain dicts to match your Streamlit consumption
-    return [
-        {
-            "id": s.id,
-            "name": s.name,
-            "email": s.email,
-            "summary": s.summary,
-            "skills": s.skills,
-            "interests": s.interests,
-        }
-        for s in ranked
-    ]
+@router.get("/result_cache_stats")
+def result_cache_stats():
+    return match_cache.stats()
+
+@router.get("/embed_queue_stats")
+async def embed_queue_stats(db: AsyncSession = Depends(get_async_db)):
+    return await db.run_sync(queue_stats)
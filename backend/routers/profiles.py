@@ -1,21 +1,138 @@
-from fastapi import APIRouter, Depends
+import csv
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import select
 from ..db import get_db
+from ..ingest import INGEST_BATCH, ingest_batch, parse_rows
 from ..models import User
 from ..schemas import UserIn, UserOut
+from ..services.embed_queue import profiles_written
+from ..services.result_cache import match_cache
+from ..services.tags import sync_user_tags, users_with_tags
 
 router = APIRouter(prefix="/profiles", tags=["profiles"])
 
+PROFILE_FIELDS = tuple(UserOut.model_fields)
+
 @router.post("", response_model=UserOut)
 def create_profile(body: UserIn, db: Session = Depends(get_db)):
     u = User(**body.model_dump())
-    db.add(u); db.commit(); db.refresh(u)
+    db.add(u); db.flush()
+    sync_user_tags(db, [u])
+    profiles_written(db, [u])
+    db.commit(); db.refresh(u)
+    match_cache.bump()
+    return u
+
+async def _lines(request: Request):
+    buf = b""
+    async for chunk in request.stream():
+        buf += chunk
+        *lines, buf = buf.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8")
+    if buf:
+        yield buf.decode("utf-8")
+
+async def _records(request: Request, fmt: str):
+    """NDJSON lines, or whole CSV records: a quoted field may span lines, so lines join until quotes balance."""
+    record = None
+    async for line in _lines(request):
+        if fmt != "csv":
+            yield line
+            continue
+        record = line if record is None else f"{record}\n{line}"
+        if record.count('"') % 2 == 0:  # "" escapes count twice, so parity still tracks quoting
+            yield record
+            record = None
+    if record is not None:
+        yield record  # unterminated quote: let csv report the row
+
+@router.post("/bulk")
+async def bulk_ingest(
+    request: Request,
+    batch: int = Query(INGEST_BATCH, ge=1, le=10000),
+    embed: bool = True,
+    db: Session = Depends(get_db),
+):
+    """
+    Stream NDJSON (default) or CSV (Content-Type: text/csv, header row first) in the body.
+    Batches are inserted and embedded as the body arrives (embed=false leaves them to the
+    embed worker); returns counts plus per-row errors.
+    """
+    fmt = "csv" if "csv" in request.headers.get("content-type", "") else "ndjson"
+    report = {"inserted": 0, "embedded": 0, "errors": []}
+    header, pending, row_no = None, [], 1
+
+    async def flush():
+        nonlocal pending, row_no
+        rows = list(parse_rows(pending, fmt, header))
+        out = await run_in_threadpool(ingest_batch, db, rows, row_no, embed)
+        row_no += len(rows)
+        pending = []
+        report["inserted"] += out["inserted"]
+        report["embedded"] += out["embedded"]
+        report["errors"].extend(out["errors"])
+        if out["inserted"]:
+            await match_cache.abump()
+
+    async for record in _records(request, fmt):
+        if not record.strip():
+            continue
+        if fmt == "csv" and header is None:
+            header = next(csv.reader([record]))
+            continue
+        pending.append(record)
+        if len(pending) >= batch:
+            await flush()
+    if pending:
+        await flush()
+    return report
+
+@router.put("/{uid}", response_model=UserOut)
+def update_profile(uid: int, body: UserIn, db: Session = Depends(get_db)):
+    u = db.get(User, uid)
+    if not u:
+        raise HTTPException(404, "User not found")
+    for k, v in body.model_dump().items():
+        setattr(u, k, v)
+    sync_user_tags(db, [u])
+    # the worker's re-embed is a no-op when the packed text and model are unchanged
+    profiles_written(db, [u])
+    db.commit(); db.refresh(u)
+    match_cache.bump()
     return u
 
-@router.get("", response_model=list[UserOut])
-def list_profiles(role: str | None = None, db: Session = Depends(get_db)):
-    q = select(User)
+@router.get("", responses={200: {"description": "Users as UserOut objects with only `id` plus the requested `fields`"}})
+def list_profiles(
+    role: str | None = None,
+    after: int | None = Query(None, description="Cursor: return users with id > after"),
+    limit: int = Query(100, ge=1, le=1000),
+    fields: str | None = Query(None, description="Comma-separated columns to return (id always included)"),
+    skills: str | None = Query(None, description="Comma-separated skills the user must have (all)"),
+    db: Session = Depends(get_db),
+):
+    """
+    Keyset-paginated on id; the next page's cursor is in the X-Next-Cursor header.
+    Selects only the requested columns and serializes the row mappings directly
+    (no ORM objects, no per-row response_model validation).
+    """
+    names = [f.strip() for f in fields.split(",") if f.strip()] if fields else list(PROFILE_FIELDS)
+    unknown = [f for f in names if f not in PROFILE_FIELDS]
+    if unknown:
+        raise HTTPException(400, f"Unknown fields: {unknown}")
+    names = ["id"] + [f for f in names if f != "id"]
+
+    q = select(*(getattr(User, f) for f in names)).order_by(User.id).limit(limit)
     if role:
         q = q.where(User.role == role)
-    return db.scalars(q).all()
+    if after is not None:
+        q = q.where(User.id > after)
+    if skills:
+        q = q.where(User.id.in_(users_with_tags(skills.split(","))))
+    rows = [dict(r) for r in db.execute(q).mappings()]
+
+    headers = {"X-Next-Cursor": str(rows[-1]["id"])} if len(rows) == limit else {}
+    return JSONResponse(rows, headers=headers)
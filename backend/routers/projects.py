@@ -1,31 +1,67 @@
+import json
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from ..db import get_db
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..db import get_async_db
 from ..models import Project
 from ..schemas import ProjectIn, ProjectOut, ProjectApproveIn
-from ..services.llm import draft_stack_for_project
+from ..services.embed_queue import projects_written
+from ..services.llm import adraft_stack_for_project, astream_draft_stack
+from ..services.result_cache import match_cache
+from ..services.tags import sync_project_tags
+from ..services.telemetry import span
 
 router = APIRouter(prefix="/projects", tags=["projects"])
 
 @router.post("", response_model=ProjectOut)
-def create_project(body: ProjectIn, db: Session = Depends(get_db)):
+async def create_project(body: ProjectIn, db: AsyncSession = Depends(get_async_db)):
     p = Project(**body.model_dump())
-    db.add(p); db.commit(); db.refresh(p)
+    db.add(p); await db.flush()
+    await db.run_sync(lambda s: (sync_project_tags(s, [p]), projects_written(s, [p.id])))
+    await db.commit(); await db.refresh(p)
     return p
 
 @router.post("/{pid}/draft_stack")
-def draft_stack(pid: int, db: Session = Depends(get_db)):
-    p = db.get(Project, pid)
+async def draft_stack(pid: int, db: AsyncSession = Depends(get_async_db)):
+    with span("db"):
+        p = await db.get(Project, pid)
     if not p:
         raise HTTPException(404, "Project not found")
-    out = draft_stack_for_project(p.description)
+    out = await adraft_stack_for_project(p.description)
     return out
 
+def sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@router.post("/{pid}/draft_stack/stream")
+async def draft_stack_stream(pid: int, db: AsyncSession = Depends(get_async_db)):
+    """SSE: `token` events while the model writes, then one validated `draft` event (or `error`)."""
+    with span("db"):
+        p = await db.get(Project, pid)
+    if not p:
+        raise HTTPException(404, "Project not found")
+    description = p.description  # read before the session closes under the stream
+
+    async def events():
+        try:
+            async for event, data in astream_draft_stack(description):
+                yield sse(event, data)
+        except Exception as e:
+            yield sse("error", str(e))
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @router.post("/approve_stack", response_model=ProjectOut)
-def approve_stack(body: ProjectApproveIn, db: Session = Depends(get_db)):
-    p = db.get(Project, body.project_id)
+async def approve_stack(body: ProjectApproveIn, db: AsyncSession = Depends(get_async_db)):
+    p = await db.get(Project, body.project_id)
     if not p:
         raise HTTPException(404, "Project not found")
     p.stack = ",".join(body.stack)
-    db.add(p); db.commit(); db.refresh(p)
+    await db.run_sync(lambda s: (sync_project_tags(s, [p]), projects_written(s, [p.id])))
+    db.add(p); await db.commit(); await db.refresh(p)
+    await match_cache.abump()
     return p
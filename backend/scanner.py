@@ -0,0 +1,38 @@
+# backend/scanner.py
+"""
+Watchlist scanner: notify students of new projects matching their watchlist topics.
+Run from the project root:
+    python -m backend.scanner               # one pass (cron-friendly)
+    python -m backend.scanner --every 300   # keep scanning every 5 minutes
+Each pass only embeds projects created since the due watchlists' high-water
+marks (and topic strings that changed), so its cost follows new data, not history.
+The API can run the same pass in-process with WATCHLIST_SCAN_INTERVAL=<seconds>.
+"""
+import argparse
+import time
+
+from backend.db import SessionLocal
+from backend.services.watchlist import scan_watchlists
+
+def run_once() -> dict:
+    db = SessionLocal()
+    try:
+        return scan_watchlists(db)
+    finally:
+        db.close()
+
+def main():
+    ap = argparse.ArgumentParser(description="Match new projects against student watchlists")
+    ap.add_argument("--every", type=float, default=0, help="seconds between passes (0 = run once)")
+    args = ap.parse_args()
+
+    while True:
+        r = run_once()
+        print(f"✅ {r['due']} watchlists due, {r['projects_embedded']} projects / "
+              f"{r['topics_embedded']} topics embedded, {r['notifications']} notifications")
+        if args.every <= 0:
+            break
+        time.sleep(args.every)
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,12 @@
-from pydantic import BaseModel
-from typing import Optional, List
+from pydantic import BaseModel, Field
+from typing import Dict, Literal, Optional, List
 
 # Users
 class UserIn(BaseModel):
-    name: str
-    role: str
-    email: str
+    # lengths mirror the users columns: an over-long value is a 422 / row error, not a DataError mid-batch
+    name: str = Field(max_length=120)
+    role: str = Field(max_length=20)
+    email: str = Field(max_length=200)
     summary: Optional[str] = ""
     skills: Optional[str] = ""
     interests: Optional[str] = ""
@@ -18,13 +19,13 @@ class UserOut(UserIn):
 # Projects
 class ProjectIn(BaseModel):
     owner_id: int
-    title: str
+    title: str = Field(max_length=200)
     description: str
     tags: Optional[str] = ""
 
 class ProjectOut(ProjectIn):
     id: int
-    stack: str = ""
+    stack: Optional[str] = ""
     class Config: from_attributes = True
 
 class ProjectApproveIn(BaseModel):
@@ -37,6 +38,16 @@ class StudentQuery(BaseModel):
     interests: Optional[str] = ""
     skills: Optional[str] = ""
 
+MatchMode = Literal["hybrid", "vector", "lexical"]
+MAX_TOPK = 100
+
+class ProjectBatchQuery(BaseModel):
+    project_ids: List[int] = Field(min_length=1)
+    topk: int = Field(5, ge=1, le=MAX_TOPK)
+    require_skills: Optional[str] = None  # comma-separated; students must have all
+    mode: MatchMode = "hybrid"
+    weights: Optional[Dict[str, float]] = None  # per-field, e.g. {"skills": 2}; see services/fields.py
+
 # LLM
 class StackDraft(BaseModel):
     stack: List[str]
@@ -8,6 +8,7 @@ Requires:
 """
 from backend.db import Base, engine, SessionLocal
 from backend.models import User, Project, StudentWatchlist
+from backend.services.tags import sync_project_tags, sync_user_tags
 
 def main():
     # Re-create schema (DANGEROUS in prod)
@@ -53,6 +54,8 @@ def main():
         )
 
         db.add_all([prof, s1, s2, s3])
+        db.flush()
+        sync_user_tags(db, [prof, s1, s2, s3])
         db.commit()
         db.refresh(prof); db.refresh(s1); db.refresh(s2); db.refresh(s3)
 
@@ -64,6 +67,8 @@ def main():
             tags="vision, robotics, embedded"
         )
         db.add(proj)
+        db.flush()
+        sync_project_tags(db, [proj])
         db.commit()
 
         # Optional student watchlist rows
@@ -0,0 +1,112 @@
+import re
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+from .index import topk
+
+TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9+#]*(?:\.[a-z0-9]+)*")  # keeps c++, c#, node.js, gpt-4o -> gpt, 4o
+RRF_K = 60
+
+
+def tokenize(text: str | None) -> List[str]:
+    return TOKEN_RE.findall((text or "").lower())
+
+
+class BM25Index:
+    """
+    Incrementally maintained Okapi BM25 over short documents.
+    Postings are dicts (cheap to patch) materialized lazily into
+    (doc ids, tf, doc len) arrays, so a query is a handful of vector ops per term.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1, self.b = k1, b
+        self._docs: Dict[int, Tuple[Counter, int]] = {}
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._arrays: Dict[str, Tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+        self._total_len = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def ids(self) -> List[int]:
+        with self._lock:
+            return list(self._docs)
+
+    def _drop(self, id_: int):
+        old = self._docs.pop(id_, None)
+        if old is None:
+            return
+        terms, length = old
+        self._total_len -= length
+        for t in terms:
+            self._postings[t].pop(id_, None)
+            if not self._postings[t]:
+                del self._postings[t]
+            self._arrays.pop(t, None)
+
+    def add(self, id_: int, text: str):
+        toks = tokenize(text)
+        terms = Counter(toks)
+        with self._lock:
+            self._drop(id_)
+            self._docs[id_] = (terms, len(toks))
+            self._total_len += len(toks)
+            for t, tf in terms.items():
+                self._postings.setdefault(t, {})[id_] = tf
+                self._arrays.pop(t, None)
+
+    def remove(self, ids: Iterable[int]):
+        with self._lock:
+            for id_ in ids:
+                self._drop(int(id_))
+
+    def _array(self, term: str):
+        arr = self._arrays.get(term)
+        if arr is None:
+            post = self._postings.get(term, {})
+            ids = np.fromiter(post.keys(), dtype=np.int64, count=len(post))
+            tf = np.fromiter(post.values(), dtype=np.float32, count=len(post))
+            dl = np.fromiter((self._docs[i][1] for i in post), dtype=np.float32, count=len(post))
+            arr = self._arrays[term] = (ids, tf, dl)
+        return arr
+
+    def search(self, query: str, k: int, within: Sequence[int] | np.ndarray | None = None) -> Tuple[np.ndarray, np.ndarray]:
+        terms = [t for t in dict.fromkeys(tokenize(query))]
+        with self._lock:
+            n = len(self._docs)
+            if n == 0:
+                return np.empty(0, dtype=np.int64), np.empty(0, dtype="float32")
+            avgdl = self._total_len / n or 1.0
+            parts_ids, parts_scores = [], []
+            for t in terms:
+                if t not in self._postings:
+                    continue
+                ids, tf, dl = self._array(t)
+                idf = np.log(1.0 + (n - ids.size + 0.5) / (ids.size + 0.5))
+                parts_ids.append(ids)
+                parts_scores.append(idf * tf * (self.k1 + 1) / (tf + self.k1 * (1 - self.b + self.b * dl / avgdl)))
+        if not parts_ids:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype="float32")
+        all_ids = np.concatenate(parts_ids)
+        uniq, inv = np.unique(all_ids, return_inverse=True)
+        scores = np.bincount(inv, weights=np.concatenate(parts_scores)).astype("float32")
+        if within is not None:
+            keep = np.isin(uniq, np.asarray(within, dtype=np.int64))
+            uniq, scores = uniq[keep], scores[keep]
+        pos = topk(scores, k)
+        return uniq[pos], scores[pos]
+
+
+def rrf_fuse(rankings: Sequence[np.ndarray], k: int, rrf_k: int = RRF_K) -> np.ndarray:
+    """Reciprocal rank fusion of several best-first id lists -> top-k ids."""
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, id_ in enumerate(ranking.tolist()):
+            fused[id_] = fused.get(id_, 0.0) + 1.0 / (rrf_k + rank + 1)
+    best = sorted(fused.items(), key=lambda kv: -kv[1])[:k]
+    return np.array([id_ for id_, _ in best], dtype=np.int64)
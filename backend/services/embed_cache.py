@@ -0,0 +1,177 @@
+import fcntl
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+EMBED_CACHE_MB = float(os.getenv("EMBED_CACHE_MB", "32"))  # memory tier per worker (~2700 1536-dim vectors)
+EMBED_CACHE_DIR = os.getenv("EMBED_CACHE_DIR", "")        # empty -> memory tier only
+
+
+def cache_key(model: str, text: str) -> str:
+    return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+
+class DiskTier:
+    """
+    Append-only vector store for one model:
+      <model>.vec   raw float32 rows, memory-mapped for reads
+      <model>.keys  one sha256 per line; line number == row
+      <model>.json  {"dim": d}
+    Vectors are written before keys under an flock, so any key a reader sees
+    already has its row on disk; other processes' appends are picked up on miss.
+    """
+
+    def __init__(self, directory: str, model: str):
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, re.sub(r"[^A-Za-z0-9_.-]", "_", model))
+        self.vec_path, self.keys_path, self.meta_path = base + ".vec", base + ".keys", base + ".json"
+        self.dim: Optional[int] = None
+        self.rows: Dict[str, int] = {}
+        self._keys_offset = 0
+        self._mm: Optional[np.memmap] = None
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path) as f:
+                self.dim = json.load(f)["dim"]
+        self._refresh()
+
+    def _refresh(self):
+        if not os.path.exists(self.keys_path) or os.path.getsize(self.keys_path) <= self._keys_offset:
+            return
+        if self.dim is None:
+            with open(self.meta_path) as f:
+                self.dim = json.load(f)["dim"]
+        with open(self.keys_path, "rb") as f:
+            f.seek(self._keys_offset)
+            chunk = f.read()
+        # ignore a partially written trailing line
+        chunk = chunk[: chunk.rfind(b"\n") + 1]
+        for line in chunk.splitlines():
+            self.rows[line.decode()] = len(self.rows)
+        self._keys_offset += len(chunk)
+
+    def _matrix(self) -> np.memmap:
+        n = len(self.rows)
+        if self._mm is None or self._mm.shape[0] < n:
+            self._mm = np.memmap(self.vec_path, dtype="float32", mode="r", shape=(n, self.dim))
+        return self._mm
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        row = self.rows.get(key)
+        if row is None:
+            self._refresh()
+            row = self.rows.get(key)
+            if row is None:
+                return None
+        return np.array(self._matrix()[row])
+
+    def put_many(self, keys: List[str], X: np.ndarray):
+        if not keys:
+            return
+        X = np.ascontiguousarray(X, dtype="float32")
+        with open(self.keys_path, "ab") as kf:
+            fcntl.flock(kf, fcntl.LOCK_EX)
+            try:
+                if self.dim is None:
+                    self.dim = int(X.shape[1])
+                    with open(self.meta_path, "w") as f:
+                        json.dump({"dim": self.dim}, f)
+                self._refresh()  # rows appended by other processes
+                fresh = [i for i, k in enumerate(keys) if k not in self.rows]
+                if not fresh:
+                    return
+                with open(self.vec_path, "ab") as vf:
+                    vf.write(X[fresh].tobytes())
+                    vf.flush(); os.fsync(vf.fileno())
+                kf.write(b"".join(keys[i].encode() + b"\n" for i in fresh))
+                kf.flush()
+                for i in fresh:
+                    self.rows[keys[i]] = len(self.rows)
+                self._keys_offset = kf.tell()
+            finally:
+                fcntl.flock(kf, fcntl.LOCK_UN)
+
+
+class EmbeddingCache:
+    """
+    Two-tier cache of L2-normalized vectors keyed by sha256(model, text): an LRU
+    bounded in bytes (vector size depends on the model) + optional disk.
+    """
+
+    def __init__(self, max_bytes: int = int(EMBED_CACHE_MB * 2**20), directory: str = EMBED_CACHE_DIR):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self._lru: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._bytes = 0
+        self._disk: Dict[str, DiskTier] = {}
+        self._lock = threading.Lock()
+        self.hits = self.disk_hits = self.misses = self.evictions = 0
+
+    def _tier(self, model: str) -> Optional[DiskTier]:
+        if not self.directory:
+            return None
+        if model not in self._disk:
+            self._disk[model] = DiskTier(self.directory, model)
+        return self._disk[model]
+
+    def _remember(self, key: str, v: np.ndarray):
+        old = self._lru.pop(key, None)
+        if old is not None:
+            self._bytes -= old.nbytes
+        self._lru[key] = v
+        self._bytes += v.nbytes
+        while self._bytes > self.max_bytes:
+            self._bytes -= self._lru.popitem(last=False)[1].nbytes
+            self.evictions += 1
+
+    def get_many(self, model: str, texts: List[str]) -> List[Optional[np.ndarray]]:
+        out: List[Optional[np.ndarray]] = []
+        with self._lock:
+            tier = self._tier(model)
+            for t in texts:
+                k = cache_key(model, t)
+                v = self._lru.get(k)
+                if v is not None:
+                    self._lru.move_to_end(k)
+                    self.hits += 1
+                elif tier is not None and (v := tier.get(k)) is not None:
+                    self._remember(k, v)
+                    self.disk_hits += 1
+                else:
+                    self.misses += 1
+                out.append(v)
+        return out
+
+    def put_many(self, model: str, texts: List[str], X: np.ndarray, memory: bool = True):
+        """memory=False: disk tier only (vectors the caller stores elsewhere anyway)."""
+        keys = [cache_key(model, t) for t in texts]
+        with self._lock:
+            for k, v in zip(keys, X if memory else ()):
+                self._remember(k, np.array(v, dtype="float32"))
+            tier = self._tier(model)
+            if tier is not None:
+                tier.put_many(keys, X)
+
+    def warm(self, model: str) -> int:
+        """Read the disk tier's key file up front; returns how many vectors it holds."""
+        with self._lock:
+            tier = self._tier(model)
+            return len(tier.rows) if tier is not None else 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self._lru),
+            "bytes": self._bytes,
+        }
+
+
+cache = EmbeddingCache()
@@ -0,0 +1,195 @@
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Sequence
+
+from sqlalchemy import bindparam, delete, func, or_, select, update
+from sqlalchemy.orm import Session, selectinload
+
+from ..models import EmbedJob, Project, User
+from .embeddings import EMBED_BATCH_SIZE
+from .fields import FIELD_VECTORS, students_missing_fields, upsert_field_embeddings
+from .outbound import CircuitOpen, transient
+from .profile_store import students_needing_backfill, upsert_profile_embeddings
+from .result_cache import match_cache
+from .telemetry import count
+from .watchlist import upsert_project_embeddings
+
+EMBED_QUEUE = os.getenv("EMBED_QUEUE", "1") == "1"  # "0": writes embed profiles inline, matches backfill inline
+EMBED_QUEUE_BATCH = int(os.getenv("EMBED_QUEUE_BATCH", str(EMBED_BATCH_SIZE)))  # jobs per drain = one embed request
+EMBED_QUEUE_LEASE = float(os.getenv("EMBED_QUEUE_LEASE", "300"))  # seconds before a crashed worker's claim is retried
+EMBED_QUEUE_RETRY = float(os.getenv("EMBED_QUEUE_RETRY", "5"))  # first retry delay after a failed embed; doubles per attempt
+EMBED_WORKER_INTERVAL = float(os.getenv("EMBED_WORKER_INTERVAL", "1"))  # seconds; >0 runs the worker in the API
+EMBED_BACKFILL_INTERVAL = float(os.getenv("EMBED_BACKFILL_INTERVAL", "300"))  # seconds between idle scans for unembedded students
+
+
+def _upsert(db: Session):
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"embed queue needs ON CONFLICT support, not {dialect}")
+    return insert(EmbedJob)
+
+def enqueue(db: Session, kind: str, ids: Sequence[int], touch: bool = True) -> int:
+    """
+    Mark entities dirty (caller commits). A pending job for the same entity absorbs
+    the write: enqueued_at keeps the oldest write (for lag), updated_at the newest.
+    touch=False only fills gaps, leaving existing jobs (and in-flight claims) alone.
+    Returns the jobs inserted or touched.
+    """
+    ids = sorted(set(ids))
+    if not ids:
+        return 0
+    now = datetime.now(timezone.utc)
+    stmt = _upsert(db).values([
+        {"kind": kind, "entity_id": i, "enqueued_at": now, "updated_at": now, "attempts": 0} for i in ids
+    ])
+    if touch:
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["kind", "entity_id"], set_={"updated_at": stmt.excluded.updated_at}
+        )
+    else:
+        stmt = stmt.on_conflict_do_nothing(index_elements=["kind", "entity_id"])
+    n = db.execute(stmt).rowcount
+    count("embed_jobs_enqueued", n)
+    return n
+
+def profiles_written(db: Session, users: Sequence[User]):
+    """Called by profile writes before commit: queue the re-embed, or do it inline with EMBED_QUEUE=0."""
+    if EMBED_QUEUE:
+        enqueue(db, "profile", [u.id for u in users])
+    else:
+        upsert_profile_embeddings(db, users)
+        if FIELD_VECTORS:
+            upsert_field_embeddings(db, "profile", users)
+
+def projects_written(db: Session, ids: Sequence[int]):
+    """Project vectors feed watchlists and weighted matches; without the queue the scanner / match path embed them."""
+    if EMBED_QUEUE:
+        enqueue(db, "project", ids)
+
+def enqueue_backfill(db: Session) -> int:
+    """Queue students with no vector under EMBED_MODEL (bulk loads with --no-embed, model changes)."""
+    ids = [u.id for u in students_needing_backfill(db)]
+    if FIELD_VECTORS:
+        ids += students_missing_fields(db)
+    n = enqueue(db, "profile", ids, touch=False)
+    db.commit()
+    return n
+
+
+def _embed_profiles(db: Session, ids: List[int]) -> int:
+    users = db.scalars(select(User).where(User.id.in_(ids)).options(selectinload(User.embedding))).all()
+    n = upsert_profile_embeddings(db, users)
+    return n + upsert_field_embeddings(db, "profile", users) if FIELD_VECTORS else n
+
+def _embed_projects(db: Session, ids: List[int]) -> int:
+    projects = db.scalars(select(Project).where(Project.id.in_(ids))).all()
+    n = upsert_project_embeddings(db, projects)
+    return n + upsert_field_embeddings(db, "project", projects) if FIELD_VECTORS else n
+
+EMBEDDERS = {"profile": _embed_profiles, "project": _embed_projects}
+
+def claim(db: Session, limit: int, now: datetime) -> list:
+    """Lease the oldest unclaimed jobs in a short transaction, so enqueues never wait on a worker's embed call."""
+    jobs = db.execute(
+        select(EmbedJob.kind, EmbedJob.entity_id, EmbedJob.updated_at, EmbedJob.attempts)
+        .where(or_(EmbedJob.claimed_until.is_(None), EmbedJob.claimed_until <= now))
+        .order_by(EmbedJob.enqueued_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)  # concurrent workers take disjoint batches
+    ).all()
+    groups = defaultdict(list)
+    for j in jobs:
+        groups[j.kind].append(j.entity_id)
+    for kind, ids in groups.items():
+        db.execute(
+            update(EmbedJob).where(EmbedJob.kind == kind, EmbedJob.entity_id.in_(ids))
+            .values(claimed_until=now + timedelta(seconds=EMBED_QUEUE_LEASE))
+        )
+    db.commit()
+    return jobs
+
+def _finish(db: Session, kind: str, jobs: list):
+    # rows whose updated_at moved during the embed were written again: release them for the next pass
+    t = EmbedJob.__table__
+    db.execute(
+        delete(t).where(t.c.kind == bindparam("k"), t.c.entity_id == bindparam("e"), t.c.updated_at == bindparam("u")),
+        [{"k": kind, "e": j.entity_id, "u": j.updated_at} for j in jobs],
+    )
+    db.execute(
+        update(EmbedJob).where(EmbedJob.kind == kind, EmbedJob.entity_id.in_([j.entity_id for j in jobs]))
+        .values(claimed_until=None)
+    )
+    db.commit()
+
+def _fail(db: Session, kind: str, jobs: list, error: Exception, now: datetime):
+    for j in jobs:
+        db.execute(
+            update(EmbedJob).where(EmbedJob.kind == kind, EmbedJob.entity_id == j.entity_id)
+            .values(attempts=EmbedJob.attempts + 1, last_error=str(error)[:1000],
+                    claimed_until=now + timedelta(seconds=EMBED_QUEUE_RETRY * 2 ** min(j.attempts, 10)))
+        )
+    db.commit()
+
+def _embed_group(db: Session, kind: str, group: list, now: datetime, report: Dict[str, int]) -> int:
+    try:
+        embedded = EMBEDDERS[kind](db, [j.entity_id for j in group])
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        if len(group) > 1 and not transient(e) and not isinstance(e, CircuitOpen):
+            # the upstream rejected the request itself, likely over one entity (an over-long
+            # text, say): bisect so it doesn't hold its healthy batch-mates in backoff
+            mid = len(group) // 2
+            return _embed_group(db, kind, group[:mid], now, report) + _embed_group(db, kind, group[mid:], now, report)
+        _fail(db, kind, group, e, now)
+        report["failed"] += len(group)
+        count("embed_jobs_failed", len(group))
+        return 0
+    _finish(db, kind, group)
+    report["embedded"] += embedded
+    count("embed_jobs_done", len(group))
+    return embedded
+
+def drain(db: Session, limit: int = EMBED_QUEUE_BATCH) -> Dict[str, int]:
+    """One batch: claim, re-embed each kind with one embed_texts call, delete finished jobs."""
+    now = datetime.now(timezone.utc)
+    jobs = claim(db, limit, now)
+    report = {"claimed": len(jobs), "embedded": 0, "failed": 0}
+    groups = defaultdict(list)
+    for j in jobs:
+        groups[j.kind].append(j)
+    for kind, group in groups.items():
+        if _embed_group(db, kind, group, now, report) and kind == "profile":
+            match_cache.bump()  # rankings computed before these vectors landed are stale
+    return report
+
+def drain_all(db: Session, limit: int = EMBED_QUEUE_BATCH) -> Dict[str, int]:
+    """Drain until a batch comes back short; failed jobs wait out their backoff."""
+    total = {"claimed": 0, "embedded": 0, "failed": 0}
+    while True:
+        r = drain(db, limit)
+        for k in total:
+            total[k] += r[k]
+        if r["claimed"] < limit:
+            return total
+
+def queue_stats(db: Session) -> Dict:
+    """Depth per kind, retrying jobs, and lag (age of the oldest pending write)."""
+    rows = db.execute(
+        select(EmbedJob.kind, func.count(), func.min(EmbedJob.enqueued_at),
+               func.count().filter(EmbedJob.attempts > 0))
+        .group_by(EmbedJob.kind)
+    ).all()
+    now = datetime.now(timezone.utc)
+    oldest = [r[2] if r[2].tzinfo else r[2].replace(tzinfo=timezone.utc) for r in rows]
+    return {
+        "depth": sum(r[1] for r in rows),
+        "by_kind": {r[0]: r[1] for r in rows},
+        "retrying": sum(r[3] for r in rows),
+        "lag_seconds": round((now - min(oldest)).total_seconds(), 3) if oldest else 0.0,
+    }
@@ -1,21 +1,101 @@
+import asyncio
 import os
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from typing import List
-from openai import OpenAI
+from .embed_cache import cache
+from .index import topk
+from .outbound import Outbound, estimate_tokens
+from .providers import make_embedding_provider
+from .telemetry import count, span
 
-EMBED_MODEL = os.getenv("EMBED_MODEL", "text-embedding-3-large")
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+provider = make_embedding_provider()
+EMBED_MODEL = provider.model  # also the cache / profile_embeddings version key
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "256"))        # inputs per request (API max 2048)
+EMBED_BATCH_TOKENS = int(os.getenv("EMBED_BATCH_TOKENS", "250000"))  # est. tokens per request (API max 300k)
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))  # parallel requests per embed_texts call
+# Shared by every caller: EMBED_RPM / EMBED_TPM budgets (0 = unlimited), EMBED_RETRIES, EMBED_MAX_INFLIGHT
+embed_calls = Outbound.from_env("EMBED", retries=3, max_inflight=16)
 
-def embed_texts(texts: List[str]) -> np.ndarray:
-    if len(texts) == 0:
-        return np.zeros((0, 1), dtype="float32")
-    resp = client.embeddings.create(model=EMBED_MODEL, input=texts)
-    vecs = [d.embedding for d in resp.data]
-    X = np.array(vecs, dtype="float32")
+def make_batches(texts: List[str], max_items: int = EMBED_BATCH_SIZE,
+                 max_tokens: int = EMBED_BATCH_TOKENS) -> List[range]:
+    """Split texts into contiguous index ranges bounded by count and estimated tokens."""
+    batches, start, tokens = [], 0, 0
+    for i, t in enumerate(texts):
+        n = estimate_tokens(t)
+        if i > start and (i - start >= max_items or tokens + n > max_tokens):
+            batches.append(range(start, i))
+            start, tokens = i, 0
+        tokens += n
+    if start < len(texts):
+        batches.append(range(start, len(texts)))
+    return batches
+
+def _embed_batch(texts: List[str]) -> List[List[float]] | np.ndarray:
+    return embed_calls.call(lambda: provider.embed(texts), sum(map(estimate_tokens, texts)))
+
+async def _aembed_batch(texts: List[str], sem: asyncio.Semaphore, hedge: bool = False) -> List[List[float]] | np.ndarray:
+    async with sem:
+        return await embed_calls.acall(lambda: provider.aembed(texts), sum(map(estimate_tokens, texts)), hedge)
+
+def _normalize(vecs) -> np.ndarray:
+    X = np.asarray(vecs, dtype="float32")
     # L2 normalize
     norms = np.linalg.norm(X, axis=1, keepdims=True) + 1e-12
     return X / norms
 
-def cosine_rank(query_vec: np.ndarray, matrix: np.ndarray) -> List[int]:
+def _embed_uncached(texts: List[str]) -> np.ndarray:
+    batches = make_batches(texts)
+    if len(batches) == 1:
+        return _normalize(_embed_batch(texts))
+    # each chunk retries on its own; results come back in submission order
+    with ThreadPoolExecutor(max_workers=min(EMBED_CONCURRENCY, len(batches))) as pool:
+        parts = pool.map(lambda r: _embed_batch(texts[r.start:r.stop]), batches)
+        return _normalize(np.concatenate([np.asarray(p, dtype="float32") for p in parts]))
+
+async def _aembed_uncached(texts: List[str], hedge: bool = False) -> np.ndarray:
+    sem = asyncio.Semaphore(EMBED_CONCURRENCY)
+    parts = await asyncio.gather(*(_aembed_batch(texts[r.start:r.stop], sem, hedge) for r in make_batches(texts)))
+    return _normalize(np.concatenate([np.asarray(p, dtype="float32") for p in parts]))
+
+def _merge(texts: List[str], found: List[np.ndarray | None], missing: List[str], fresh: np.ndarray,
+           remember: bool) -> np.ndarray:
+    if missing:
+        cache.put_many(EMBED_MODEL, missing, fresh, memory=remember)
+    by_text = dict(zip(missing, fresh))
+    return np.stack([v if v is not None else by_text[t] for t, v in zip(texts, found)]).astype("float32", copy=False)
+
+def _lookup(texts: List[str]):
+    found = cache.get_many(EMBED_MODEL, texts)
+    # only distinct cache misses go to the API
+    missing = list(dict.fromkeys(t for t, v in zip(texts, found) if v is None))
+    count("embed_cache_hits", len(texts) - len(missing))
+    count("embed_cache_misses", len(missing))
+    return found, missing
+
+def embed_texts(texts: List[str], remember: bool = True) -> np.ndarray:
+    """
+    remember=False for write paths whose vectors land in a table (profile/field/project
+    embeddings): they would only crowd query embeddings out of the memory tier.
+    """
+    if len(texts) == 0:
+        return np.zeros((0, 1), dtype="float32")
+    found, missing = _lookup(texts)
+    with span("embed"):
+        fresh = _embed_uncached(missing) if missing else np.zeros((0, 1), dtype="float32")
+    return _merge(texts, found, missing, fresh, remember)
+
+async def aembed_texts(texts: List[str], hedge: bool = False, remember: bool = True) -> np.ndarray:
+    """Async twin of embed_texts (same batching, cache and normalization); hedge=True for latency-critical queries."""
+    if len(texts) == 0:
+        return np.zeros((0, 1), dtype="float32")
+    found, missing = _lookup(texts)
+    with span("embed"):
+        fresh = await _aembed_uncached(missing, hedge) if missing else np.zeros((0, 1), dtype="float32")
+    return _merge(texts, found, missing, fresh, remember)
+
+def cosine_rank(query_vec: np.ndarray, matrix: np.ndarray, k: int | None = None) -> List[int]:
     sims = (matrix @ query_vec.reshape(-1, 1)).ravel()
-    return list(np.argsort(-sims))
+    if k is None:
+        return list(np.argsort(-sims))
+    return topk(sims, k).tolist()
@@ -0,0 +1,288 @@
+import math
+import os
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Mapping, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from ..models import FieldEmbedding, User
+from .embeddings import EMBED_MODEL, aembed_texts, embed_texts
+from .index import VectorIndex, topk_rows
+from .profile_store import text_hash, to_vector
+
+# "1": embed each profile/project field separately (3 more embeddings per write) so /match takes `weights`
+FIELD_VECTORS = os.getenv("FIELD_VECTORS", "0") == "1"
+
+
+def _labelled(label: str, value: str | None) -> str:
+    value = (value or "").strip()
+    return f"{label}: {value}" if value else ""
+
+# Embedded separately so /match can re-weight them per request; empty fields get no vector
+FIELDS = {
+    "profile": {
+        "summary": lambda u: _labelled("Summary", u.summary),
+        "skills": lambda u: _labelled("Skills", u.skills),
+        "interests": lambda u: _labelled("Interests", u.interests),
+    },
+    "project": {
+        "description": lambda p: "\n".join(
+            t for t in (_labelled("Title", p.title), _labelled("Description", p.description)) if t
+        ),
+        "stack": lambda p: _labelled("Stack", p.stack),
+        "tags": lambda p: _labelled("Tags", p.tags),
+    },
+}
+
+def field_texts(kind: str, obj) -> Dict[str, str]:
+    return {f: t for f, fn in FIELDS[kind].items() if (t := fn(obj))}
+
+def parse_weights(weights: str | Mapping[str, float] | None) -> Dict[str, float] | None:
+    """
+    "skills:2,interests:0.5" (or a dict) -> a weight for every profile and project
+    field; fields not mentioned keep weight 1. None means "rank on the packed vector".
+    """
+    if weights is None:
+        return None
+    if not FIELD_VECTORS:
+        raise ValueError("per-field weights need FIELD_VECTORS=1")
+    if isinstance(weights, str):
+        pairs = [p.split(":", 1) for p in weights.split(",") if p.strip()]
+        if any(len(p) != 2 for p in pairs):
+            raise ValueError("weights look like skills:2,interests:1")
+        weights = {k.strip(): v for k, v in pairs}
+    out = {f: 1.0 for kind in FIELDS.values() for f in kind}
+    unknown = [k for k in weights if k not in out]
+    if unknown:
+        raise ValueError(f"Unknown weight fields: {unknown}; expected {sorted(out)}")
+    try:
+        given = {k: float(v) for k, v in weights.items()}
+    except (TypeError, ValueError):
+        raise ValueError("weights must be numbers")
+    bad = [k for k, v in given.items() if not math.isfinite(v) or v < 0]
+    if bad:
+        raise ValueError(f"weights must be finite and >= 0: {bad}")
+    out.update(given)
+    if not any(out[f] for f in FIELDS["profile"]):
+        raise ValueError("at least one profile field weight must be non-zero")
+    return out
+
+def upsert_field_embeddings(db: Session, kind: str, entities: Sequence) -> int:
+    """Embed changed fields of the given entities in one call, drop vectors of emptied fields (caller commits)."""
+    wanted = {(e.id, f): t for e in entities for f, t in field_texts(kind, e).items()}
+    ids = [e.id for e in entities]
+    rows = {(r.entity_id, r.field): r for r in db.scalars(
+        select(FieldEmbedding).where(FieldEmbedding.kind == kind, FieldEmbedding.entity_id.in_(ids))
+    )} if ids else {}
+    for key, row in rows.items():
+        if key not in wanted:
+            db.delete(row)
+    stale = [
+        key for key, t in wanted.items()
+        if key not in rows or rows[key].model != EMBED_MODEL or rows[key].text_hash != text_hash(t)
+    ]
+    if not stale:
+        return 0
+    X = embed_texts([wanted[key] for key in stale], remember=False)
+    now = datetime.now(timezone.utc)
+    for (eid, f), v in zip(stale, X):
+        row = rows.get((eid, f)) or FieldEmbedding(kind=kind, entity_id=eid, field=f)
+        row.model, row.text_hash, row.dim = EMBED_MODEL, text_hash(wanted[(eid, f)]), int(v.shape[0])
+        row.vector = np.ascontiguousarray(v, dtype="float32").tobytes()
+        row.updated_at = now
+        db.add(row)
+    return len(stale)
+
+def students_missing_fields(db: Session) -> List[int]:
+    """Students with something to embed but no field vectors under EMBED_MODEL (rows predating FIELD_VECTORS)."""
+    has = select(FieldEmbedding.entity_id).where(FieldEmbedding.kind == "profile", FieldEmbedding.model == EMBED_MODEL)
+    return db.scalars(
+        select(User.id)
+        .where(User.role == "student", User.id.not_in(has))
+        .where(or_(*(func.trim(func.coalesce(c, "")) != "" for c in (User.summary, User.skills, User.interests))))
+    ).all()
+
+
+class FieldIndex:
+    """
+    One VectorIndex per profile field, kept row-aligned: every index sees the same
+    add/remove sequence and an empty field is a zero row. A weighted score is then
+    sum_f w_f * (Q @ M_f.T) over identical rows — one extra product per field,
+    and changing weights never touches the stored vectors.
+    """
+
+    def __init__(self, fields: Iterable[str]):
+        self.fields = tuple(fields)
+        self._lock = threading.RLock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.indexes = {f: VectorIndex() for f in self.fields}
+            self._present: Dict[int, set] = {}
+
+    def __len__(self) -> int:
+        return len(self._present)
+
+    @property
+    def rows(self) -> int:
+        """Non-empty field vectors held (what the field_embeddings table should count)."""
+        return sum(len(fs) for fs in self._present.values())
+
+    def set(self, vectors: Mapping[int, Mapping[str, np.ndarray]]):
+        """Insert or overwrite entities; fields missing from an entity's mapping become zero rows."""
+        self.remove([i for i, fs in vectors.items() if not fs])
+        vectors = {i: fs for i, fs in vectors.items() if fs}
+        if not vectors:
+            return
+        ids = list(vectors)
+        dim = next(iter(vectors[ids[0]].values())).shape[0]
+        with self._lock:
+            for f, index in self.indexes.items():
+                X = np.zeros((len(ids), dim), dtype="float32")
+                for j, i in enumerate(ids):
+                    v = vectors[i].get(f)
+                    if v is not None:
+                        X[j] = v
+                index.add(ids, X)
+            for i in ids:
+                self._present[i] = set(vectors[i])
+
+    def remove(self, ids: Iterable[int]):
+        ids = [int(i) for i in ids]
+        with self._lock:
+            for index in self.indexes.values():
+                index.remove(ids)
+            for i in ids:
+                self._present.pop(i, None)
+
+    def search_many(self, Q: np.ndarray, k: int, weights: Mapping[str, float],
+                    within: Iterable[int] | None = None) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """Top-k per query row by the weighted sum of per-field inner products."""
+        with self._lock:
+            first = self.indexes[self.fields[0]]
+            rows = first._rows_of(within) if within is not None else None
+            n = len(first) if rows is None else rows.size
+            if n == 0:
+                empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype="float32"))
+                return [empty for _ in range(Q.shape[0])]
+            S = np.zeros((Q.shape[0], n), dtype="float32")
+            for f, index in self.indexes.items():
+                if weights.get(f):
+                    S += weights[f] * index._score(index.prepare(Q), rows)
+            pos = topk_rows(S, k)
+            scores = np.take_along_axis(S, pos, axis=1)
+            ids = first._ids[pos if rows is None else rows[pos]]
+            return [(ids[i], scores[i]) for i in range(Q.shape[0])]
+
+
+student_fields = FieldIndex(FIELDS["profile"])
+_sync_lock = threading.Lock()
+_watermark: datetime | None = None
+_applied: Dict[int, datetime] = {}  # entity_id -> newest updated_at among the fields held for it
+
+def _field_rows():
+    F = FieldEmbedding
+    return (
+        select(F.entity_id, F.field, F.vector, F.updated_at)
+        .join(User, User.id == F.entity_id)
+        .where(F.kind == "profile", F.model == EMBED_MODEL, User.role == "student")
+    )
+
+def _grouped(rows) -> Tuple[Dict[int, Dict[str, np.ndarray]], Dict[int, datetime]]:
+    out: Dict[int, Dict[str, np.ndarray]] = {}
+    stamps: Dict[int, datetime] = {}
+    for r in rows:
+        out.setdefault(r.entity_id, {})[r.field] = to_vector(r)
+        stamps[r.entity_id] = max(stamps.get(r.entity_id, r.updated_at), r.updated_at)
+    return out, stamps
+
+def _newer(eid: int, t: datetime | None) -> bool:
+    held = _applied.get(eid)
+    return held is not None and t is not None and held > t
+
+def _apply(vectors: Dict[int, Dict[str, np.ndarray]], stamps: Dict[int, datetime]):
+    """Caller holds _sync_lock; entities an overlapping sync already moved past are left alone."""
+    fresh = {i: fs for i, fs in vectors.items() if not _newer(i, stamps[i])}
+    student_fields.set(fresh)
+    _applied.update({i: stamps[i] for i in fresh})
+
+def sync_field_index(db: Session) -> FieldIndex:
+    """
+    Same contract as sync_student_index: one aggregate query when nothing changed,
+    changed students re-read whole (all their fields) otherwise. Emptied fields and
+    deleted students shrink the row count, which triggers a full reload. As there,
+    queries run without _sync_lock held (run_sync yields to the loop on each one);
+    only the in-memory apply is locked.
+    """
+    global _watermark
+    rows = _field_rows().subquery()
+    count, latest = db.execute(select(func.count(), func.max(rows.c.updated_at))).one()
+    since = _watermark
+    if count == student_fields.rows and latest == since:
+        return student_fields
+
+    full = since is None
+    if not full:
+        changed = select(rows.c.entity_id).where(rows.c.updated_at >= since).distinct()
+        grouped = _grouped(db.execute(_field_rows().where(FieldEmbedding.entity_id.in_(changed))))
+        with _sync_lock:
+            _apply(*grouped)
+            full = student_fields.rows != count
+    if full:
+        vectors, stamps = _grouped(db.execute(_field_rows()))
+        with _sync_lock:
+            gone = [i for i in list(student_fields._present) if i not in vectors and not _newer(i, latest)]
+            student_fields.remove(gone)
+            for i in gone:
+                _applied.pop(i, None)
+            _apply(vectors, stamps)
+    with _sync_lock:
+        if latest is not None and (_watermark is None or latest > _watermark):
+            _watermark = latest
+    return student_fields
+
+async def aproject_queries(db: AsyncSession, projects: Sequence, weights: Mapping[str, float],
+                           packed_texts: Sequence[str]) -> np.ndarray:
+    """
+    One query vector per project: the weighted, re-normalized sum of its field vectors.
+    Stored vectors are used when fresh; the rest come from one embedding call.
+    """
+    texts = [field_texts("project", p) for p in projects]
+    ids = [p.id for p in projects]
+
+    def stored(s: Session):
+        return {
+            (r.entity_id, r.field): r for r in s.execute(
+                select(FieldEmbedding.entity_id, FieldEmbedding.field, FieldEmbedding.text_hash, FieldEmbedding.vector)
+                .where(FieldEmbedding.kind == "project", FieldEmbedding.model == EMBED_MODEL,
+                       FieldEmbedding.entity_id.in_(ids))
+            )
+        }
+    rows = await db.run_sync(stored)
+    vecs: Dict[Tuple[int, str], np.ndarray] = {}
+    missing = []
+    for pid, ts in zip(ids, texts):
+        for f, t in ts.items():
+            r = rows.get((pid, f))
+            if r is not None and r.text_hash == text_hash(t):
+                vecs[(pid, f)] = to_vector(r)
+            else:
+                missing.append(((pid, f), t))
+    if missing:
+        X = await aembed_texts([t for _, t in missing], hedge=True)
+        vecs.update({key: v for (key, _), v in zip(missing, X)})
+
+    sums = [sum((weights[f] * vecs[(pid, f)] for f in ts), np.float32(0)) for pid, ts in zip(ids, texts)]
+    empty = [j for j, q in enumerate(sums) if not np.any(q)]
+    if empty:
+        X = await aembed_texts([packed_texts[j] for j in empty], hedge=True)
+        for j, v in zip(empty, X):
+            sums[j] = v
+    Q = np.stack(sums).astype("float32")
+    norms = np.linalg.norm(Q, axis=1, keepdims=True)
+    return Q / np.maximum(norms, 1e-12)
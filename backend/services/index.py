@@ -0,0 +1,394 @@
+import json
+import os
+import shutil
+import threading
+from typing import Iterable, List, Tuple
+
+import numpy as np
+
+INDEX_MODE = os.getenv("INDEX_MODE", "exact")  # "exact" | "ivf" | "sharded"
+IVF_NLIST = int(os.getenv("IVF_NLIST", "0"))  # 0 -> ~sqrt(N)
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", "8"))
+IVF_MIN_SIZE = int(os.getenv("IVF_MIN_SIZE", "20000"))  # below this, exact scan is cheaper
+
+# Compact storage: Matryoshka truncation (0 = keep model dims) and element type
+INDEX_DIM = int(os.getenv("INDEX_DIM", "0"))
+INDEX_DTYPE = os.getenv("INDEX_DTYPE", "float32")  # "float32" | "float16" | "int8"
+SCORE_CHUNK = 16384  # rows decoded per block when scoring compact storage
+
+
+def topk(scores: np.ndarray, k: int) -> np.ndarray:
+    """Positions of the k largest scores, best first. O(N + k log k)."""
+    n = scores.shape[0]
+    if k <= 0 or n == 0:
+        return np.empty(0, dtype=np.int64)
+    if k >= n:
+        return np.argsort(-scores)
+    part = np.argpartition(-scores, k - 1)[:k]
+    return part[np.argsort(-scores[part])]
+
+
+def topk_rows(S: np.ndarray, k: int) -> np.ndarray:
+    """Row-wise topk over a (P, N) score matrix: (P, min(k, N)) column positions, best first."""
+    n = S.shape[1]
+    k = min(k, n)
+    if k <= 0:
+        return np.empty((S.shape[0], 0), dtype=np.int64)
+    part = np.argpartition(-S, k - 1, axis=1)[:, :k] if k < n else np.tile(np.arange(n), (S.shape[0], 1))
+    order = np.argsort(-np.take_along_axis(S, part, axis=1), axis=1)
+    return np.take_along_axis(part, order, axis=1)
+
+
+def truncate(X: np.ndarray, dim: int) -> np.ndarray:
+    """Keep the first `dim` components and re-normalize (text-embedding-3 vectors are Matryoshka-trained)."""
+    X = np.atleast_2d(np.asarray(X, dtype="float32"))
+    if dim and X.shape[1] > dim:
+        X = X[:, :dim]
+        X = X / (np.linalg.norm(X, axis=1, keepdims=True) + 1e-12)
+    return X
+
+
+class VectorIndex:
+    """
+    Exact inner-product index over L2-normalized vectors.
+    Rows live in one contiguous matrix (grown by doubling); ids map to rows.
+    Removal swaps the last row into the hole, so no operation rebuilds the matrix.
+
+    Storage may be compact: vectors truncated to `truncate_dim` and stored as
+    float16 or int8 (symmetric, one float32 scale per row). Inputs and outputs
+    are always float32; compact rows are decoded block-wise while scoring.
+    """
+
+    def __init__(self, dim: int | None = None, capacity: int = 1024,
+                 dtype: str = INDEX_DTYPE, truncate_dim: int = INDEX_DIM):
+        self.dim = dim
+        self.dtype = np.dtype(dtype)
+        self.truncate_dim = truncate_dim
+        self._capacity = capacity
+        self._M: np.ndarray | None = None
+        self._scale: np.ndarray | None = None  # int8 only
+        self._ids = np.empty(0, dtype=np.int64)
+        self._pos: dict[int, int] = {}
+        self._n = 0
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return self._n
+
+    def __contains__(self, id_: int) -> bool:
+        return id_ in self._pos
+
+    @property
+    def ids(self) -> np.ndarray:
+        return self._ids[: self._n]
+
+    @property
+    def compact(self) -> bool:
+        return self.dtype != np.float32
+
+    @property
+    def nbytes(self) -> int:
+        return 0 if self._M is None else self._M[: self._n].nbytes
+
+    def prepare(self, X: np.ndarray) -> np.ndarray:
+        """Map full-size float32 vectors (or queries) into this index's space."""
+        return truncate(X, self.truncate_dim)
+
+    def prepare_query(self, q: np.ndarray) -> np.ndarray:
+        """One freshly embedded vector in this index's space, so it can be mixed with get() results."""
+        return self.prepare(q)[0]
+
+    def _encode(self, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray | None]:
+        if self.dtype == np.int8:
+            scale = np.abs(X).max(axis=1) / 127.0 + 1e-12
+            return np.round(X / scale[:, None]).astype(np.int8), scale.astype("float32")
+        return X.astype(self.dtype), None
+
+    def vectors(self, rows: np.ndarray | slice | None = None) -> np.ndarray:
+        """Decoded float32 rows (all live rows by default)."""
+        if self._M is None:
+            return np.zeros((0, self.dim or 1), dtype="float32")
+        if rows is None:
+            rows = slice(0, self._n)
+        X = self._M[rows].astype("float32", copy=not self.compact)
+        if self._scale is not None:
+            X *= self._scale[rows][:, None]
+        return X
+
+    def _score(self, Q: np.ndarray, rows: np.ndarray | None = None) -> np.ndarray:
+        """(P, len(rows)) inner products; float32 storage uses the matrix in place."""
+        if not self.compact:
+            M = self._M[: self._n] if rows is None else self._M[rows]
+            return Q @ M.T
+        n = self._n if rows is None else rows.shape[0]
+        out = np.empty((Q.shape[0], n), dtype="float32")
+        for start in range(0, n, SCORE_CHUNK):
+            stop = min(n, start + SCORE_CHUNK)
+            block = self.vectors(slice(start, stop) if rows is None else rows[start:stop])
+            out[:, start:stop] = Q @ block.T
+        return out
+
+    def score_rows(self, Q: np.ndarray, rows: np.ndarray | None = None) -> np.ndarray:
+        """(P, len(rows)) scores of (already prepared) queries against the given rows (all, in row order, by default)."""
+        with self._lock:
+            return self._score(np.atleast_2d(Q), rows)
+
+    def _reserve(self, extra: int):
+        need = self._n + extra
+        if self._M is not None and need <= self._M.shape[0]:
+            return
+        cap = max(self._capacity, self._M.shape[0] if self._M is not None else 0)
+        while cap < need:
+            cap *= 2
+        M = np.zeros((cap, self.dim), dtype=self.dtype)
+        ids = np.zeros(cap, dtype=np.int64)
+        scale = np.zeros(cap, dtype="float32") if self.dtype == np.int8 else None
+        if self._M is not None:
+            M[: self._n] = self._M[: self._n]
+            ids[: self._n] = self._ids[: self._n]
+            if scale is not None:
+                scale[: self._n] = self._scale[: self._n]
+        self._M, self._ids, self._scale = M, ids, scale
+
+    def add(self, ids: Iterable[int], X: np.ndarray):
+        """Insert or overwrite vectors by id."""
+        X = self.prepare(X)
+        ids = [int(i) for i in ids]
+        if not ids:
+            return
+        with self._lock:
+            if self.dim is None:
+                self.dim = X.shape[1]
+            if X.shape[1] != self.dim:
+                raise ValueError(f"Vector dim {X.shape[1]} does not match index dim {self.dim}")
+            new = sum(1 for i in ids if i not in self._pos)
+            self._reserve(new)
+            enc, scale = self._encode(X)
+            for j, (i, v) in enumerate(zip(ids, X)):
+                row = self._pos.get(i)
+                if row is None:
+                    row = self._n
+                    self._pos[i] = row
+                    self._ids[row] = i
+                    self._n += 1
+                    self._on_insert(row, v)
+                else:
+                    self._on_update(row, v)
+                self._M[row] = enc[j]
+                if scale is not None:
+                    self._scale[row] = scale[j]
+
+    def remove(self, ids: Iterable[int]):
+        with self._lock:
+            for i in ids:
+                row = self._pos.pop(int(i), None)
+                if row is None:
+                    continue
+                last = self._n - 1
+                if row != last:
+                    moved = int(self._ids[last])
+                    self._M[row] = self._M[last]
+                    if self._scale is not None:
+                        self._scale[row] = self._scale[last]
+                    self._ids[row] = moved
+                    self._pos[moved] = row
+                    self._on_move(last, row)
+                self._n -= 1
+
+    def row(self, id_: int) -> int | None:
+        return self._pos.get(int(id_))
+
+    def get(self, id_: int) -> np.ndarray | None:
+        row = self._pos.get(int(id_))
+        return None if row is None else self.vectors(np.array([row]))[0]
+
+    # hooks for subclasses that keep per-row side data
+    def _on_insert(self, row: int, v: np.ndarray): pass
+    def _on_update(self, row: int, v: np.ndarray): pass
+    def _on_move(self, src: int, dst: int): pass
+    def _on_load(self): pass
+
+    def _candidates(self, q: np.ndarray) -> np.ndarray | None:
+        return None  # None = all rows
+
+    def _rows_of(self, ids: Iterable[int]) -> np.ndarray:
+        return np.fromiter((r for r in (self._pos.get(int(i)) for i in ids) if r is not None), dtype=np.int64)
+
+    def search(self, q: np.ndarray, k: int, exclude: Iterable[int] = (),
+               within: Iterable[int] | None = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k (ids, scores) by inner product, best first; `within` restricts to a candidate id set."""
+        q = self.prepare(q)[0]
+        with self._lock:
+            if self._n == 0:
+                return np.empty(0, dtype=np.int64), np.empty(0, dtype="float32")
+            # prefiltered candidates are scored exactly; they are usually a small slice
+            rows = self._rows_of(within) if within is not None else self._candidates(q)
+            scores = self._score(q[None, :], rows)[0]
+            for i in exclude:
+                row = self._pos.get(int(i))
+                if row is None:
+                    continue
+                if rows is None:
+                    scores[row] = -np.inf
+                else:
+                    scores[rows == row] = -np.inf
+            pos = topk(scores, k)
+            pos = pos[np.isfinite(scores[pos])]
+            hit_rows = pos if rows is None else rows[pos]
+            return self._ids[hit_rows].copy(), scores[pos]
+
+    def search_many(self, Q: np.ndarray, k: int,
+                    within: Iterable[int] | None = None) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """Top-k per query row with a single (P x d) @ (d x N) product."""
+        Q = self.prepare(Q)
+        with self._lock:
+            rows = self._rows_of(within) if within is not None else None
+            n = self._n if rows is None else rows.size
+            if n == 0:
+                empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype="float32"))
+                return [empty for _ in range(Q.shape[0])]
+            S = self._score(Q, rows)
+            pos = topk_rows(S, k)
+            scores = np.take_along_axis(S, pos, axis=1)
+            ids = self._ids[pos if rows is None else rows[pos]]
+            return [(ids[i], scores[i]) for i in range(Q.shape[0])]
+
+    def save(self, path: str, **meta):
+        """
+        Snapshot to a directory of .npy files (+ meta.json) that load() can memory-map.
+        Written beside `path` and swapped in by rename, so workers mapping the old
+        snapshot keep valid pages.
+        """
+        final, path = path, f"{path}.{os.getpid()}.tmp"
+        os.makedirs(path, exist_ok=True)
+        with self._lock:
+            # headroom so a loaded snapshot absorbs inserts without leaving the mapping
+            cap = max(self._capacity, self._n + self._n // 8)
+            M = np.zeros((cap, self.dim or 1), dtype=self.dtype)
+            if self._M is not None:
+                M[: self._n] = self._M[: self._n]
+            np.save(os.path.join(path, "matrix.npy"), M)
+            np.save(os.path.join(path, "ids.npy"), self._ids[: self._n])
+            if self._scale is not None:
+                scale = np.zeros(cap, dtype="float32")
+                scale[: self._n] = self._scale[: self._n]
+                np.save(os.path.join(path, "scale.npy"), scale)
+            info = {"n": self._n, "dim": self.dim, "dtype": self.dtype.name,
+                    "truncate_dim": self.truncate_dim, **meta}
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump(info, f)
+        if os.path.exists(final):
+            old = f"{final}.{os.getpid()}.old"
+            os.rename(final, old)
+            os.rename(path, final)
+            shutil.rmtree(old, ignore_errors=True)
+        else:
+            os.rename(path, final)
+
+    def load(self, path: str, mmap: bool = True) -> dict:
+        """
+        Replace contents from a snapshot; returns its meta. With mmap the matrix is
+        mapped copy-on-write: every worker shares the file's pages, and only rows a
+        worker later rewrites get private copies.
+        """
+        with open(os.path.join(path, "meta.json")) as f:
+            info = json.load(f)
+        mode = "c" if mmap else None
+        with self._lock:
+            self.dim, self.dtype, self.truncate_dim = info["dim"], np.dtype(info["dtype"]), info["truncate_dim"]
+            self._M = np.load(os.path.join(path, "matrix.npy"), mmap_mode=mode)
+            self._scale = np.load(os.path.join(path, "scale.npy"), mmap_mode=mode) if self.dtype == np.int8 else None
+            self._n = info["n"]
+            self._ids = np.zeros(self._M.shape[0], dtype=np.int64)
+            self._ids[: self._n] = np.load(os.path.join(path, "ids.npy"))
+            self._pos = {int(i): r for r, i in enumerate(self._ids[: self._n].tolist())}
+            self._on_load()
+        return info
+
+
+class IVFIndex(VectorIndex):
+    """
+    Approximate index: k-means coarse quantizer, search scans only the nprobe
+    closest clusters. Below min_size (or before training) it behaves exactly.
+    Re-trains once the corpus doubles since the last training.
+    """
+
+    def __init__(self, dim: int | None = None, nlist: int = IVF_NLIST, nprobe: int = IVF_NPROBE,
+                 min_size: int = IVF_MIN_SIZE, capacity: int = 1024, **storage):
+        super().__init__(dim, capacity, **storage)
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.min_size = min_size
+        self.centroids: np.ndarray | None = None
+        self._assign = np.empty(0, dtype=np.int32)
+        self._trained_at = 0
+
+    def _reserve(self, extra: int):
+        super()._reserve(extra)
+        if self._assign.shape[0] < self._M.shape[0]:
+            a = np.full(self._M.shape[0], -1, dtype=np.int32)
+            a[: self._n] = self._assign[: self._n]
+            self._assign = a
+
+    def _on_load(self):
+        self._assign = np.full(self._M.shape[0], -1, dtype=np.int32)
+        self.centroids, self._trained_at = None, 0  # re-trained on first large search
+
+    def _nearest(self, X: np.ndarray) -> np.ndarray:
+        return np.argmax(X @ self.centroids.T, axis=1).astype(np.int32)
+
+    def _on_insert(self, row: int, v: np.ndarray):
+        if self.centroids is not None:
+            self._assign[row] = self._nearest(v[None, :])[0]
+
+    _on_update = _on_insert
+
+    def _on_move(self, src: int, dst: int):
+        self._assign[dst] = self._assign[src]
+
+    def train(self, iters: int = 10, seed: int = 0):
+        with self._lock:
+            n = self._n
+            if n == 0:
+                return
+            nlist = min(n, self.nlist or max(1, int(np.sqrt(n))))
+            rng = np.random.default_rng(seed)
+            sample = self.vectors(np.sort(rng.choice(n, size=min(n, nlist * 64), replace=False)))
+            C = sample[rng.choice(sample.shape[0], size=nlist, replace=False)].copy()
+            for _ in range(iters):
+                a = np.argmax(sample @ C.T, axis=1)
+                sums = np.zeros_like(C)
+                np.add.at(sums, a, sample)
+                counts = np.bincount(a, minlength=nlist)
+                nz = counts > 0
+                C[nz] = sums[nz] / counts[nz, None]
+                C /= np.linalg.norm(C, axis=1, keepdims=True) + 1e-12
+            self.centroids = C
+            for start in range(0, n, SCORE_CHUNK):
+                stop = min(n, start + SCORE_CHUNK)
+                self._assign[start:stop] = self._nearest(self.vectors(slice(start, stop)))
+            self._trained_at = n
+
+    def search_many(self, Q: np.ndarray, k: int,
+                    within: Iterable[int] | None = None) -> List[Tuple[np.ndarray, np.ndarray]]:
+        if self._n < self.min_size or within is not None:
+            return super().search_many(Q, k, within)
+        # probed cluster sets differ per query, so approximate mode goes row by row
+        return [self.search(q, k) for q in np.atleast_2d(Q)]
+
+    def _candidates(self, q: np.ndarray) -> np.ndarray | None:
+        if self._n < self.min_size:
+            return None
+        if self.centroids is None or self._n >= 2 * self._trained_at:
+            self.train()
+        probe = topk(self.centroids @ q, self.nprobe)
+        return np.flatnonzero(np.isin(self._assign[: self._n], probe))
+
+
+def make_index(dim: int | None = None) -> VectorIndex:
+    if INDEX_MODE == "ivf":
+        return IVFIndex(dim)
+    if INDEX_MODE == "sharded":
+        from .shards import ShardedIndex  # process pool + shared memory, only when asked for
+        return ShardedIndex(dim)
+    return VectorIndex(dim)
@@ -1,17 +1,22 @@
-import os, json
-from typing import Dict, Any
-from openai import OpenAI
+import json, copy
+from typing import Any, AsyncIterator, Dict, Tuple
 from pydantic import ValidationError
 from ..schemas import StackDraft
-from dotenv import load_dotenv, find_dotenv
+from .llm_cache import AsyncSingleFlight, SingleFlight, TTLCache, prompt_key
+from .outbound import Outbound, estimate_tokens
+from .providers import make_chat_provider
+from .telemetry import count, span
 
-load_dotenv(find_dotenv())
+chat = make_chat_provider()
+CHAT_MODEL = chat.model
+# CHAT_RPM / CHAT_TPM budgets (0 = unlimited), CHAT_RETRIES, CHAT_MAX_INFLIGHT
+chat_calls = Outbound.from_env("CHAT", retries=3, max_inflight=8)
+DRAFT_MAX_TOKENS = 400  # completion budget reserved against CHAT_TPM per draft
 
-CHAT_MODEL = os.getenv("CHAT_MODEL", "gpt-4o-mini")
-OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
-if not OPENAI_API_KEY:
-    raise RuntimeError("OPENAI_API_KEY not set. Add it to your .env file.")
-client = OpenAI(api_key=OPENAI_API_KEY)
+# Only drafts that validated against StackDraft are stored
+draft_cache = TTLCache()
+_flight = SingleFlight()
+_aflight = AsyncSingleFlight()
 
 STACK_PROMPT = """You are a precise assistant. A professor described a project.
 Return STRICT JSON with keys exactly: stack (3-6 items), skills (2-4 items), evaluation (1-2 items).
@@ -20,21 +25,79 @@ No extra commentary.
 Project:
 """
 
-def draft_stack_for_project(description: str) -> Dict[str, Any]:
+def _request(description: str) -> Dict[str, Any]:
     msg = STACK_PROMPT + description
-    resp = client.chat.completions.create(
-        model=CHAT_MODEL,
+    return dict(
         messages=[
             {"role": "system", "content": "Return only strict JSON. No prose."},
             {"role": "user", "content": msg},
         ],
         temperature=0.2,
         response_format={"type": "json_object"},
+        max_tokens=DRAFT_MAX_TOKENS,
     )
-    raw = resp.choices[0].message.content
+
+def _tokens(request: Dict[str, Any]) -> int:
+    return sum(estimate_tokens(m["content"]) for m in request["messages"]) + request.get("max_tokens", 0)
+
+def _parse(raw: str) -> Dict[str, Any]:
     data = json.loads(raw)
     try:
         StackDraft(**data)  # validate shape
     except ValidationError as e:
         raise ValueError(f"LLM JSON did not validate: {e}")
     return data
+
+def _cached(key: str):
+    hit = draft_cache.get(key)
+    count("draft_cache_hits" if hit is not None else "draft_cache_misses")
+    return hit
+
+def draft_stack_for_project(description: str) -> Dict[str, Any]:
+    key = prompt_key(CHAT_MODEL, STACK_PROMPT + description)
+    hit = _cached(key)
+    if hit is not None:
+        return copy.deepcopy(hit)
+
+    def run():
+        request = _request(description)
+        data = _parse(chat_calls.call(lambda: chat.complete(request), _tokens(request)))
+        draft_cache.put(key, data)
+        return data
+
+    with span("llm"):
+        return copy.deepcopy(_flight.do(key, run))
+
+async def adraft_stack_for_project(description: str) -> Dict[str, Any]:
+    key = prompt_key(CHAT_MODEL, STACK_PROMPT + description)
+    hit = _cached(key)
+    if hit is not None:
+        return copy.deepcopy(hit)
+
+    async def run():
+        request = _request(description)
+        data = _parse(await chat_calls.acall(lambda: chat.acomplete(request), _tokens(request)))
+        draft_cache.put(key, data)
+        return data
+
+    with span("llm"):
+        return copy.deepcopy(await _aflight.do(key, run))
+
+async def astream_draft_stack(description: str) -> AsyncIterator[Tuple[str, Any]]:
+    """
+    Yields ("token", text) as the completion streams, then ("draft", dict) once
+    the full JSON validates. A cached draft is yielded straight away.
+    """
+    key = prompt_key(CHAT_MODEL, STACK_PROMPT + description)
+    hit = _cached(key)
+    if hit is not None:
+        yield "draft", copy.deepcopy(hit)
+        return
+
+    parts, request = [], _request(description)
+    async for delta in chat_calls.astream(lambda: chat.astream(request), _tokens(request)):
+        parts.append(delta)
+        yield "token", delta
+    data = _parse("".join(parts))
+    draft_cache.put(key, data)
+    yield "draft", copy.deepcopy(data)
@@ -0,0 +1,339 @@
+import asyncio
+import os
+import random
+import threading
+import time
+import weakref
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, TypeVar
+
+import numpy as np
+from openai import APIConnectionError
+
+from .telemetry import count
+
+OUTBOUND_BACKOFF = float(os.getenv("OUTBOUND_BACKOFF", "0.5"))  # seconds; base of full-jitter exponential backoff
+OUTBOUND_BACKOFF_MAX = float(os.getenv("OUTBOUND_BACKOFF_MAX", "20"))
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "5"))  # consecutive transient failures that open the circuit
+BREAKER_COOLDOWN = float(os.getenv("BREAKER_COOLDOWN", "30"))  # seconds open before one trial call
+HEDGE_QUERIES = os.getenv("HEDGE_QUERIES", "0") == "1"  # duplicate slow latency-critical calls after their p95
+HEDGE_MIN_DELAY = float(os.getenv("HEDGE_MIN_DELAY", "0.05"))  # seconds; never hedge sooner than this
+HEDGE_MIN_SAMPLES = 20  # latencies needed before the p95 is trusted
+
+T = TypeVar("T")
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 chars/token for English; cheap upper-ish bound without a tokenizer
+    return len(text) // 4 + 1
+
+
+class CircuitOpen(RuntimeError):
+    """Raised without calling upstream while the breaker is open."""
+
+
+class TokenBucket:
+    """A per-minute budget refilled continuously. reserve() may go into debt and returns the wait that repays it."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.level = per_minute
+        self.t = time.monotonic()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.t) * self.rate)
+        self.t = now
+
+    def reserve(self, n: float, now: float) -> float:
+        self._refill(now)
+        self.level -= n
+        return max(0.0, -self.level / self.rate)
+
+    def has(self, n: float, now: float) -> bool:
+        self._refill(now)
+        return self.level >= n
+
+
+class RateLimiter:
+    """
+    RPM and TPM buckets (0 = unlimited) plus a shared pause: a 429's Retry-After
+    holds every caller of this upstream, not just the one that got it.
+    """
+
+    def __init__(self, rpm: float = 0, tpm: float = 0):
+        self.requests = TokenBucket(rpm) if rpm > 0 else None
+        self.tokens = TokenBucket(tpm) if tpm > 0 else None
+        self._until = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens: int) -> float:
+        """Claim budget for one call and return how long to wait before making it."""
+        with self._lock:
+            now = time.monotonic()
+            wait = max(0.0, self._until - now)
+            if self.requests:
+                wait = max(wait, self.requests.reserve(1, now))
+            if self.tokens:
+                wait = max(wait, self.tokens.reserve(tokens, now))
+            return wait
+
+    def try_reserve(self, tokens: int) -> bool:
+        """Claim budget only if it is there right now (hedges never queue)."""
+        with self._lock:
+            now = time.monotonic()
+            if self._until > now or (self.requests and not self.requests.has(1, now)) \
+                    or (self.tokens and not self.tokens.has(tokens, now)):
+                return False
+            if self.requests:
+                self.requests.reserve(1, now)
+            if self.tokens:
+                self.tokens.reserve(tokens, now)
+            return True
+
+    def hold(self, seconds: float):
+        with self._lock:
+            self._until = max(self._until, time.monotonic() + seconds)
+
+
+class CircuitBreaker:
+    """Closed -> open after `failures` consecutive transient errors -> one trial call after `cooldown` seconds."""
+
+    def __init__(self, failures: int = BREAKER_FAILURES, cooldown: float = BREAKER_COOLDOWN):
+        self.failures = failures
+        self.cooldown = cooldown
+        self._fails = 0
+        self._opened_at: float | None = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        return "half-open" if time.monotonic() - self._opened_at >= self.cooldown else "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._trial or time.monotonic() - self._opened_at < self.cooldown:
+                return False
+            self._trial = True
+            return True
+
+    def success(self):
+        with self._lock:
+            self._fails, self._opened_at, self._trial = 0, None, False
+
+    def release(self):
+        """The attempt ended without a verdict (cancelled, interrupted): free the trial slot."""
+        with self._lock:
+            self._trial = False
+
+    def failure(self):
+        with self._lock:
+            self._fails += 1
+            self._trial = False
+            if self.failures > 0 and self._fails >= self.failures:
+                self._opened_at = time.monotonic()
+
+
+def transient(e: BaseException) -> bool:
+    """Worth retrying: rate limits, overload/5xx, timeouts, dropped connections."""
+    status = getattr(e, "status_code", None)
+    if status is not None:
+        return status in (408, 409, 429) or status >= 500
+    return isinstance(e, (TimeoutError, ConnectionError, APIConnectionError))
+
+def retry_after(e: BaseException) -> float | None:
+    headers = getattr(getattr(e, "response", None), "headers", None) or {}
+    for name, scale in (("retry-after-ms", 0.001), ("retry-after", 1.0)):
+        try:
+            if headers.get(name):
+                return float(headers[name]) * scale
+        except ValueError:
+            pass  # HTTP-date form; fall back to our own backoff
+    return None
+
+
+class Outbound:
+    """
+    Every call to one upstream (embeddings or chat) goes through here: an in-flight
+    cap, RPM/TPM token buckets, jittered retries that honour Retry-After, and a
+    circuit breaker that fails fast while the upstream is down. Latency-critical
+    async calls may be hedged: a duplicate goes out once the first has run past the
+    observed p95 (budget permitting), and whichever answers first wins.
+    """
+
+    def __init__(self, name: str, rpm: float = 0, tpm: float = 0, retries: int = 3,
+                 max_inflight: int = 16, hedge: bool = HEDGE_QUERIES):
+        self.name = name
+        self.retries = retries
+        self.max_inflight = max_inflight
+        self.hedge = hedge
+        self.limiter = RateLimiter(rpm, tpm)
+        self.breaker = CircuitBreaker()
+        self._slots = threading.BoundedSemaphore(max_inflight)
+        self._aslots: "weakref.WeakKeyDictionary[Any, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+        self._latency: deque = deque(maxlen=256)
+
+    @classmethod
+    def from_env(cls, prefix: str, **defaults) -> "Outbound":
+        """<PREFIX>_RPM, _TPM, _RETRIES, _MAX_INFLIGHT override the given defaults."""
+        def env(key: str, cast, default):
+            return cast(os.getenv(f"{prefix}_{key}", default))
+        return cls(
+            prefix.lower(),
+            rpm=env("RPM", float, defaults.get("rpm", 0)),
+            tpm=env("TPM", float, defaults.get("tpm", 0)),
+            retries=env("RETRIES", int, defaults.get("retries", 3)),
+            max_inflight=env("MAX_INFLIGHT", int, defaults.get("max_inflight", 16)),
+        )
+
+    def _admit(self):
+        if not self.breaker.allow():
+            count(f"{self.name}_circuit_rejections")
+            raise CircuitOpen(f"{self.name} upstream circuit is open")
+
+    def _succeeded(self, started: float):
+        self.breaker.success()
+        self._latency.append(time.perf_counter() - started)
+        count(f"{self.name}_calls")
+
+    def _failed(self, e: BaseException, attempt: int) -> float | None:
+        """Seconds to wait before retrying, or None to give up."""
+        if not transient(e):
+            if 400 <= (getattr(e, "status_code", None) or 0) < 500:
+                self.breaker.success()  # the upstream answered; the request itself was bad
+            else:
+                self.breaker.release()  # a local error (or CircuitOpen) says nothing about the upstream
+            return None
+        self.breaker.failure()
+        count(f"{self.name}_errors")
+        after = retry_after(e)
+        if getattr(e, "status_code", None) == 429:
+            count(f"{self.name}_rate_limited")
+            self.limiter.hold(after if after is not None else OUTBOUND_BACKOFF)
+        if attempt >= self.retries:
+            return None
+        count(f"{self.name}_retries")
+        if after is not None:
+            return after + random.uniform(0, OUTBOUND_BACKOFF)
+        return random.uniform(0, min(OUTBOUND_BACKOFF_MAX, OUTBOUND_BACKOFF * 2 ** attempt))
+
+    def hedge_delay(self) -> float | None:
+        if len(self._latency) < HEDGE_MIN_SAMPLES:
+            return None
+        return max(HEDGE_MIN_DELAY, float(np.percentile(self._latency, 95)))
+
+    def call(self, fn: Callable[[], T], tokens: int = 0) -> T:
+        for attempt in range(self.retries + 1):
+            self._admit()
+            try:
+                time.sleep(self.limiter.reserve(tokens))
+                with self._slots:
+                    started = time.perf_counter()
+                    out = fn()
+            except Exception as e:
+                delay = self._failed(e, attempt)
+                if delay is None:
+                    raise
+            except BaseException:
+                self.breaker.release()
+                raise
+            else:
+                self._succeeded(started)
+                return out
+            time.sleep(delay)
+
+    def _asem(self) -> asyncio.Semaphore:
+        # asyncio primitives bind to one loop; the app has one, tests and CLIs may have several
+        loop = asyncio.get_running_loop()
+        sem = self._aslots.get(loop)
+        if sem is None:
+            sem = self._aslots[loop] = asyncio.Semaphore(self.max_inflight)
+        return sem
+
+    async def acall(self, fn: Callable[[], Awaitable[T]], tokens: int = 0, hedge: bool = False) -> T:
+        """`hedge` marks the call latency-critical; it is only duplicated when hedging is enabled."""
+        for attempt in range(self.retries + 1):
+            self._admit()
+            try:
+                await asyncio.sleep(self.limiter.reserve(tokens))
+                async with self._asem():
+                    started = time.perf_counter()
+                    out = await (self._hedged(fn, tokens) if hedge and self.hedge else fn())
+            except Exception as e:
+                delay = self._failed(e, attempt)
+                if delay is None:
+                    raise
+            except BaseException:
+                # cancelled (wait_for timeouts, client disconnects): a half-open trial
+                # that never reports back would otherwise keep the circuit shut for good
+                self.breaker.release()
+                raise
+            else:
+                self._succeeded(started)
+                return out
+            await asyncio.sleep(delay)
+
+    async def _hedged(self, fn: Callable[[], Awaitable[T]], tokens: int) -> T:
+        delay = self.hedge_delay()
+        if delay is None:
+            return await fn()
+        first = asyncio.ensure_future(fn())
+        tasks = [first]
+        try:
+            done, _ = await asyncio.wait({first}, timeout=delay)
+            if done or not self.limiter.try_reserve(tokens):
+                return await first
+            count(f"{self.name}_hedges")
+            second = asyncio.ensure_future(fn())
+            tasks.append(second)
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is second:
+                            count(f"{self.name}_hedge_wins")
+                        return task.result()
+            second.exception()
+            return first.result()  # both failed: surface the original error
+        finally:
+            for task in tasks:  # the loser, or both if we were cancelled
+                if not task.done():
+                    task.cancel()
+
+    async def astream(self, fn: Callable[[], AsyncIterator[T]], tokens: int = 0) -> AsyncIterator[T]:
+        """Like acall for a streamed response; retried only until the first item has been yielded."""
+        for attempt in range(self.retries + 1):
+            self._admit()
+            started, streamed = time.perf_counter(), False
+            try:
+                await asyncio.sleep(self.limiter.reserve(tokens))
+                async with self._asem():
+                    async for item in fn():
+                        streamed = True
+                        yield item
+            except Exception as e:
+                delay = self._failed(e, attempt)
+                if delay is None or streamed:
+                    raise
+            except BaseException:  # cancelled, or the consumer closed the stream
+                self.breaker.release()
+                raise
+            else:
+                self._succeeded(started)
+                return
+            await asyncio.sleep(delay)
+
+    def stats(self) -> dict:
+        p95 = self.hedge_delay()
+        return {
+            "circuit": self.breaker.state,
+            "samples": len(self._latency),
+            "p95_ms": round(1000 * float(np.percentile(self._latency, 95)), 1) if self._latency else None,
+            "hedge_after_ms": round(1000 * p95, 1) if self.hedge and p95 is not None else None,
+        }
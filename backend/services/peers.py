@@ -0,0 +1,85 @@
+import os
+import threading
+from typing import Dict, Iterable, Tuple
+
+import numpy as np
+
+from .index import VectorIndex
+
+PEER_K = int(os.getenv("PEER_K", "20"))  # neighbours kept per student
+
+
+class PeerGraph:
+    """
+    Precomputed nearest-neighbour lists over the student index.
+    Lists are built lazily on first lookup and patched on vector changes:
+    a changed student is inserted into any list it now beats the tail of,
+    and lists that referenced it (or a removed student) are dropped for rebuild.
+    """
+
+    def __init__(self, k: int = PEER_K):
+        self.k = k
+        self._lists: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}  # id -> (ids, scores), best first
+        self._lock = threading.Lock()
+
+    def _build(self, index: VectorIndex, uid: int):
+        v = index.get(uid)
+        if v is None:
+            return None
+        entry = index.search(v, self.k, exclude=[uid])
+        self._lists[uid] = entry
+        return entry
+
+    def neighbours(self, index: VectorIndex, uid: int, k: int) -> np.ndarray:
+        with self._lock:
+            entry = self._lists.get(uid) or self._build(index, uid)
+        if entry is None:
+            return np.empty(0, dtype=np.int64)
+        if k > self.k:
+            return index.search(index.get(uid), k, exclude=[uid])[0]
+        return entry[0][:k]
+
+    def on_change(self, index: VectorIndex, changed: Iterable[int]):
+        changed = [int(c) for c in changed]
+        with self._lock:
+            for c in changed:
+                self._lists.pop(c, None)
+            if not self._lists:
+                return
+            dirty = set(changed)
+            owners, owner_rows = [], []
+            for uid in list(self._lists):
+                row = index.row(uid)
+                if row is None or dirty.intersection(self._lists[uid][0].tolist()):
+                    del self._lists[uid]
+                else:
+                    owners.append(uid)
+                    owner_rows.append(row)
+            live = [(c, r) for c in changed if (r := index.row(c)) is not None]
+            if not owners or not live:
+                return
+            C = np.array([c for c, _ in live], dtype=np.int64)
+            # every changed student against every cached list owner in one product
+            S = index.score_rows(index.vectors(np.array([r for _, r in live])), np.array(owner_rows))
+            for j, uid in enumerate(owners):
+                ids, scores = self._lists[uid]
+                s = S[:, j]
+                beat = s > scores[-1] if len(ids) == self.k else np.ones(len(C), dtype=bool)
+                if not beat.any():
+                    continue
+                all_ids = np.concatenate([ids, C[beat]])
+                all_scores = np.concatenate([scores, s[beat]])
+                best = np.argsort(-all_scores, kind="stable")[: self.k]
+                self._lists[uid] = (all_ids[best], all_scores[best])
+
+    def on_remove(self, removed: Iterable[int]):
+        removed = set(int(i) for i in removed)
+        if not removed:
+            return
+        with self._lock:
+            for uid in list(self._lists):
+                if uid in removed or removed.intersection(self._lists[uid][0].tolist()):
+                    del self._lists[uid]
+
+
+peer_graph = PeerGraph()
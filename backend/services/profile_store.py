@@ -0,0 +1,304 @@
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, timezone
+from typing import List, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import func, insert, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
+
+from ..matching import pack_profile
+from ..models import EmbedJob, ProfileEmbedding, User
+from .embeddings import EMBED_MODEL, aembed_texts, embed_texts
+from .bm25 import BM25Index
+from .index import VectorIndex, make_index, topk
+from .peers import peer_graph
+from .tags import TagIndex, split_tags
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def to_vector(row) -> np.ndarray:
+    return np.frombuffer(row.vector, dtype="float32")
+
+def is_fresh(row: ProfileEmbedding | None, h: str) -> bool:
+    return row is not None and row.model == EMBED_MODEL and row.text_hash == h
+
+def stale_profiles(users: Sequence[User]) -> List[Tuple[User, str, str]]:
+    """(user, packed text, hash) for profiles whose packed text or EMBED_MODEL changed."""
+    stale = []
+    for u in users:
+        text = pack_profile(u)
+        h = text_hash(text)
+        if not is_fresh(u.embedding, h):
+            stale.append((u, text, h))
+    return stale
+
+def store_profile_embeddings(stale: Sequence[Tuple[User, str, str]], X: np.ndarray):
+    now = datetime.now(timezone.utc)
+    for (u, _, h), v in zip(stale, X):
+        row = u.embedding or ProfileEmbedding(user_id=u.id)
+        row.model = EMBED_MODEL
+        row.text_hash = h
+        row.dim = int(v.shape[0])
+        row.vector = np.ascontiguousarray(v, dtype="float32").tobytes()
+        row.updated_at = now
+        u.embedding = row
+
+def upsert_profile_embeddings(db: Session, users: Sequence[User]) -> int:
+    """
+    Embed the given profiles whose packed text or EMBED_MODEL changed.
+    Adds rows to the session (caller commits); returns how many were re-embedded.
+    """
+    stale = stale_profiles(users)
+    if stale:
+        store_profile_embeddings(stale, embed_texts([text for _, text, _ in stale], remember=False))
+    return len(stale)
+
+def insert_profile_embeddings(db: Session, ids: Sequence[int], texts: Sequence[str]) -> int:
+    """Bulk path for freshly inserted users: one batched embed, one executemany insert."""
+    if not ids:
+        return 0
+    X = embed_texts(list(texts), remember=False)
+    now = datetime.now(timezone.utc)
+    db.execute(insert(ProfileEmbedding), [
+        {
+            "user_id": uid,
+            "model": EMBED_MODEL,
+            "text_hash": text_hash(text),
+            "dim": int(v.shape[0]),
+            "vector": np.ascontiguousarray(v, dtype="float32").tobytes(),
+            "updated_at": now,
+        }
+        for uid, text, v in zip(ids, texts, X)
+    ])
+    return len(ids)
+
+def students_needing_backfill(db: Session) -> List[User]:
+    """Students with no vector, or one from a different EMBED_MODEL."""
+    return db.scalars(
+        select(User)
+        .outerjoin(ProfileEmbedding)
+        .where(User.role == "student")
+        .where((ProfileEmbedding.user_id.is_(None)) | (ProfileEmbedding.model != EMBED_MODEL))
+        .options(selectinload(User.embedding))
+    ).all()
+
+def backfill_student_embeddings(db: Session) -> int:
+    changed = upsert_profile_embeddings(db, students_needing_backfill(db))
+    if changed:
+        db.commit()
+    return changed
+
+async def abackfill_student_embeddings(db: AsyncSession) -> int:
+    """Async backfill: DB work via run_sync, the embedding call awaited off the session."""
+    stale = stale_profiles(await db.run_sync(students_needing_backfill))
+    if stale:
+        X = await aembed_texts([text for _, text, _ in stale], remember=False)
+        await db.run_sync(lambda _: store_profile_embeddings(stale, X))
+        await db.commit()
+    return len(stale)
+
+# Compact corpus snapshot shared (memory-mapped) by all workers; see backend/corpus.py
+CORPUS_PATH = os.getenv("CORPUS_PATH", "")
+# >0: re-score the top k * INDEX_RERANK compact-index hits with stored float32 vectors
+INDEX_RERANK = int(os.getenv("INDEX_RERANK", "0"))
+
+_student_index = make_index()
+student_tags = TagIndex()  # skills/interests of every student, for prefiltering
+student_bm25 = BM25Index()  # pack_profile texts of every student, embedded or not
+_sync_lock = threading.Lock()
+_watermark: datetime | None = None
+_snapshot_checked = False
+_applied: dict = {}  # user_id -> updated_at of the row the index holds for it
+_text_mark: tuple | None = None  # (students, max id, newest vector, newest queued write) at the last text sync
+
+def _student_rows():
+    return (
+        select(ProfileEmbedding.user_id, ProfileEmbedding.vector, ProfileEmbedding.updated_at)
+        .join(User, User.id == ProfileEmbedding.user_id)
+        .where(User.role == "student", ProfileEmbedding.model == EMBED_MODEL)
+    )
+
+def _read_snapshot() -> dict | None:
+    """CORPUS_PATH's meta, if the snapshot matches the current model/storage config."""
+    meta_path = os.path.join(CORPUS_PATH, "meta.json")
+    if not CORPUS_PATH or not os.path.exists(meta_path):
+        return None
+    with open(meta_path) as f:
+        meta = json.load(f)
+    if (meta.get("model"), meta.get("dtype"), meta.get("truncate_dim")) != (
+        EMBED_MODEL, _student_index.dtype.name, _student_index.truncate_dim
+    ):
+        return None
+    return meta
+
+def _apply_snapshot(meta: dict) -> datetime | None:
+    """Map the snapshot into the student index (caller holds _sync_lock)."""
+    _student_index.load(CORPUS_PATH)
+    held = set(_student_index.ids.tolist())
+    watermark = datetime.fromisoformat(meta["watermark"]) if meta.get("watermark") else None
+    if watermark is not None:
+        _applied.update(dict.fromkeys(held, watermark))
+    return watermark
+
+def _newer(uid: int, t: datetime | None) -> bool:
+    """The index already holds a row for uid written after t."""
+    held = _applied.get(uid)
+    return held is not None and t is not None and held > t
+
+def save_student_snapshot(db: Session) -> dict:
+    index = sync_student_index(db)
+    with _sync_lock:
+        index.save(CORPUS_PATH, model=EMBED_MODEL, watermark=_watermark.isoformat() if _watermark else None)
+    return {"path": CORPUS_PATH, "rows": len(index), "bytes": index.nbytes}
+
+def rerank(db: Session, Q: np.ndarray, id_lists: Sequence[np.ndarray], k: int) -> List[np.ndarray]:
+    """Re-score candidate lists against full-precision stored vectors (one query for all lists)."""
+    wanted = {i for ids in id_lists for i in ids.tolist()}
+    if not wanted:
+        return [ids[:k] for ids in id_lists]
+    rows = db.execute(
+        select(ProfileEmbedding.user_id, ProfileEmbedding.vector)
+        .where(ProfileEmbedding.user_id.in_(wanted), ProfileEmbedding.model == EMBED_MODEL)
+    ).all()
+    vecs = {r.user_id: to_vector(r) for r in rows}
+    out = []
+    for q, ids in zip(np.atleast_2d(Q), id_lists):
+        keep = np.array([i for i in ids.tolist() if i in vecs], dtype=np.int64)
+        if keep.size == 0:
+            out.append(keep)
+            continue
+        scores = np.stack([vecs[i] for i in keep.tolist()]) @ q
+        out.append(keep[topk(scores, k)])
+    return out
+
+def warm_student_index(db: Session) -> int:
+    """Sync the index (snapshot + newer rows) and scan it once so a new worker's first match pays no setup."""
+    sync_student_text(db)
+    index = sync_student_index(db)
+    if len(index):
+        index.search(index.get(int(index.ids[0])), 1)  # faults mapped pages in, warms BLAS
+    return len(index)
+
+def _apply_rows(rows: list):
+    """Add/overwrite indexed students from _student_rows() rows (caller holds _sync_lock)."""
+    # an overlapping sync may already have applied a newer row for some of these
+    rows = [r for r in rows if not _newer(r.user_id, r.updated_at)]
+    if not rows:
+        return
+    ids = [r.user_id for r in rows]
+    _student_index.add(ids, np.stack([to_vector(r) for r in rows]))
+    peer_graph.on_change(_student_index, ids)
+    for r in rows:
+        _applied[r.user_id] = r.updated_at
+
+def sync_student_index(db: Session) -> VectorIndex:
+    """
+    Bring the process-wide student index up to date with profile_embeddings.
+    Steady state costs one aggregate query; changed rows are applied in place.
+    Run a backfill first so students without vectors are included.
+    Callers reach this through AsyncSession.run_sync, where every round trip yields
+    to the event loop, so _sync_lock is never held across a query: a second request
+    blocking on it would block the loop. Reads happen unlocked; only the in-memory
+    apply is locked, and rows older than what an id already holds are skipped.
+    """
+    global _watermark, _snapshot_checked
+    if not _snapshot_checked:
+        snapshot = _read_snapshot()
+        with _sync_lock:
+            if not _snapshot_checked:
+                _snapshot_checked = True
+                if snapshot is not None:
+                    _watermark = _apply_snapshot(snapshot)
+    rows = _student_rows().subquery()
+    count, latest = db.execute(select(func.count(), func.max(rows.c.updated_at))).one()
+    since = _watermark
+    if count == len(_student_index) and latest == since:
+        return _student_index
+
+    q = _student_rows()
+    if since is not None:
+        q = q.where(ProfileEmbedding.updated_at >= since)
+    changed = db.execute(q).all()
+    with _sync_lock:
+        _apply_rows(changed)
+        short = len(_student_index) != count
+    if short:
+        # deletions or role changes drop ids; rows committed late with a timestamp
+        # below the watermark were never picked up by the >= filter: load them by id
+        live = set(db.scalars(select(rows.c.user_id)).all())
+        with _sync_lock:
+            held = set(_student_index.ids.tolist())
+        missing = sorted(live - held)
+        late = db.execute(_student_rows().where(ProfileEmbedding.user_id.in_(missing))).all() if missing else []
+        with _sync_lock:
+            _apply_rows(late)
+            gone = [i for i in _student_index.ids.tolist() if i not in live and not _newer(i, latest)]
+            _student_index.remove(gone)
+            peer_graph.on_remove(gone)
+            for i in gone:
+                _applied.pop(i, None)
+    with _sync_lock:
+        if latest is not None and (_watermark is None or latest > _watermark):
+            _watermark = latest
+    return _student_index
+
+def _apply_text(rows: list):
+    """Caller holds _sync_lock."""
+    for r in rows:
+        student_tags.set(r.id, {"skill": split_tags(r.skills), "interest": split_tags(r.interests)})
+        student_bm25.add(r.id, pack_profile(r))
+
+def sync_student_text(db: Session) -> BM25Index:
+    """
+    Keep student_tags / student_bm25 over every student from users rows, so lexical
+    matches and skill prefilters see profiles that have no vector yet (queue lag,
+    --no-embed loads, no API key). Profile writes either queue an embed job or
+    store a vector inline, so new ids plus those two timestamps catch every edit;
+    a student count that still doesn't match reconciles by id. Same locking as
+    sync_student_index.
+    """
+    global _text_mark
+    newest_vector = select(func.max(ProfileEmbedding.updated_at)).scalar_subquery()
+    newest_job = select(func.max(EmbedJob.updated_at)).where(EmbedJob.kind == "profile").scalar_subquery()
+    mark = tuple(db.execute(
+        select(func.count(User.id), func.max(User.id), newest_vector, newest_job).where(User.role == "student")
+    ).one())
+    last = _text_mark
+    if mark == last:
+        return student_bm25
+
+    q = select(User.id, User.name, User.summary, User.skills, User.interests).where(User.role == "student")
+    if last is not None:
+        _, top, vector_at, job_at = last
+        edited = [User.id > (top or 0)]
+        if vector_at is not None:
+            edited.append(User.id.in_(select(ProfileEmbedding.user_id).where(ProfileEmbedding.updated_at >= vector_at)))
+        if job_at is not None:
+            edited.append(User.id.in_(
+                select(EmbedJob.entity_id).where(EmbedJob.kind == "profile", EmbedJob.updated_at >= job_at)
+            ))
+        q = q.where(or_(*edited))
+    rows = db.execute(q).all()
+    with _sync_lock:
+        _apply_text(rows)
+    if len(student_bm25) != mark[0]:
+        # deletions and role changes
+        live = set(db.scalars(select(User.id).where(User.role == "student")).all())
+        missing = sorted(live - set(student_bm25.ids()))
+        late = db.execute(
+            select(User.id, User.name, User.summary, User.skills, User.interests).where(User.id.in_(missing))
+        ).all() if missing else []
+        with _sync_lock:
+            _apply_text(late)
+            gone = [i for i in student_bm25.ids() if i not in live]
+            student_tags.remove(gone)
+            student_bm25.remove(gone)
+    with _sync_lock:
+        _text_mark = mark
+    return student_bm25
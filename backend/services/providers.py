@@ -0,0 +1,224 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+from functools import lru_cache
+from typing import Any, AsyncIterator, Dict, List
+
+import numpy as np
+from dotenv import load_dotenv, find_dotenv
+from .telemetry import count
+
+load_dotenv(find_dotenv())
+
+EMBED_PROVIDER = os.getenv("EMBED_PROVIDER", "openai")  # "openai" | "local"
+CHAT_PROVIDER = os.getenv("CHAT_PROVIDER", "openai")    # "openai" | "local"
+LOCAL_EMBED_DIM = int(os.getenv("LOCAL_EMBED_DIM", "3072"))  # same shape as text-embedding-3-large
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "30"))  # seconds per attempt; OPENAI_BASE_URL points at a stub
+
+
+class EmbeddingProvider:
+    """Turns a batch of texts into raw vectors (normalization/batching/caching live in embeddings.py)."""
+    model: str
+
+    def embed(self, texts: List[str]) -> List[List[float]] | np.ndarray:
+        raise NotImplementedError
+
+    async def aembed(self, texts: List[str]) -> List[List[float]] | np.ndarray:
+        raise NotImplementedError
+
+
+class ChatProvider:
+    """Runs an OpenAI-style chat request dict and returns the message text."""
+    model: str
+
+    def complete(self, request: Dict[str, Any]) -> str:
+        raise NotImplementedError
+
+    async def acomplete(self, request: Dict[str, Any]) -> str:
+        raise NotImplementedError
+
+    async def astream(self, request: Dict[str, Any]) -> AsyncIterator[str]:
+        raise NotImplementedError
+        yield  # pragma: no cover
+
+
+class OpenAIClients:
+    """
+    Sync + async OpenAI clients, created on first use so importing never needs a key.
+    SDK retries are off: services/outbound.py owns retries, backoff and rate limits.
+    """
+
+    def __init__(self):
+        self._client = self._aclient = None
+
+    def _key(self) -> str:
+        key = os.environ.get("OPENAI_API_KEY")
+        if not key:
+            raise RuntimeError("OPENAI_API_KEY not set. Add it to your .env file.")
+        return key
+
+    @property
+    def client(self):
+        if self._client is None:
+            from openai import OpenAI
+            self._client = OpenAI(api_key=self._key(), max_retries=0, timeout=OPENAI_TIMEOUT)
+        return self._client
+
+    @property
+    def aclient(self):
+        if self._aclient is None:
+            from openai import AsyncOpenAI
+            self._aclient = AsyncOpenAI(api_key=self._key(), max_retries=0, timeout=OPENAI_TIMEOUT)
+        return self._aclient
+
+
+openai_clients = OpenAIClients()
+
+
+def _count_usage(usage, prefix: str):
+    if usage is not None:
+        count(f"{prefix}_prompt_tokens", usage.prompt_tokens)
+        count(f"{prefix}_completion_tokens", getattr(usage, "completion_tokens", 0) or 0)
+
+
+class OpenAIEmbeddingProvider(EmbeddingProvider):
+    def __init__(self, model: str):
+        self.model = model
+
+    def embed(self, texts):
+        resp = openai_clients.client.embeddings.create(model=self.model, input=texts)
+        _count_usage(resp.usage, "embed")
+        return [d.embedding for d in sorted(resp.data, key=lambda d: d.index)]
+
+    async def aembed(self, texts):
+        resp = await openai_clients.aclient.embeddings.create(model=self.model, input=texts)
+        _count_usage(resp.usage, "embed")
+        return [d.embedding for d in sorted(resp.data, key=lambda d: d.index)]
+
+
+class OpenAIChatProvider(ChatProvider):
+    def __init__(self, model: str):
+        self.model = model
+
+    def complete(self, request):
+        resp = openai_clients.client.chat.completions.create(model=self.model, **request)
+        _count_usage(resp.usage, "chat")
+        return resp.choices[0].message.content
+
+    async def acomplete(self, request):
+        resp = await openai_clients.aclient.chat.completions.create(model=self.model, **request)
+        _count_usage(resp.usage, "chat")
+        return resp.choices[0].message.content
+
+    async def astream(self, request):
+        stream = await openai_clients.aclient.chat.completions.create(
+            model=self.model, stream=True, stream_options={"include_usage": True}, **request
+        )
+        async for chunk in stream:
+            _count_usage(getattr(chunk, "usage", None), "chat")
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                yield delta
+
+
+_WORD_RE = re.compile(r"[a-z0-9][a-z0-9+#.]*")
+
+
+class LocalEmbeddingProvider(EmbeddingProvider):
+    """
+    Offline, deterministic embedder: word unigrams/bigrams and character trigrams,
+    sublinear-tf weighted, feature-hashed with signs into `dim` buckets (a sparse
+    random projection). Same shape as the API vectors; no network, microseconds per text.
+    """
+
+    def __init__(self, dim: int = LOCAL_EMBED_DIM, probes: int = 4):
+        self.dim = dim
+        self.probes = probes
+        self.model = f"local-hash-v1-{dim}"
+
+    @staticmethod
+    @lru_cache(maxsize=200_000)
+    def _slots(feature: str, dim: int, probes: int):
+        h = hashlib.blake2b(feature.encode("utf-8"), digest_size=4 * probes).digest()
+        out = []
+        for i in range(probes):
+            x = int.from_bytes(h[4 * i: 4 * i + 4], "little")
+            out.append((x % dim, 1.0 if x & 0x80000000 else -1.0))
+        return tuple(out)
+
+    def _features(self, text: str) -> Dict[str, float]:
+        words = _WORD_RE.findall(text.lower())
+        feats: Dict[str, float] = {}
+        for w in words:
+            feats["w:" + w] = feats.get("w:" + w, 0.0) + 1.0
+            padded = f" {w} "
+            for i in range(len(padded) - 2):
+                f = "c:" + padded[i:i + 3]
+                feats[f] = feats.get(f, 0.0) + 0.25
+        for a, b in zip(words, words[1:]):
+            feats[f"b:{a} {b}"] = feats.get(f"b:{a} {b}", 0.0) + 0.5
+        return feats
+
+    def _embed_one(self, text: str) -> np.ndarray:
+        v = np.zeros(self.dim, dtype="float32")
+        for f, tf in self._features(text).items():
+            w = 1.0 + np.log(tf) if tf >= 1.0 else tf
+            for slot, sign in self._slots(f, self.dim, self.probes):
+                v[slot] += sign * w
+        return v
+
+    def embed(self, texts):
+        return np.stack([self._embed_one(t) for t in texts]) if texts else np.zeros((0, self.dim), "float32")
+
+    async def aembed(self, texts):
+        return self.embed(texts)
+
+
+_TECH_TERMS = [
+    "python", "pytorch", "tensorflow", "opencv", "ros", "slam", "c++", "cuda", "react", "typescript",
+    "node", "sql", "postgresql", "fastapi", "docker", "kubernetes", "langchain", "rag", "llm", "nlp",
+    "computer vision", "reinforcement learning", "embedded", "rust", "java", "spark", "aws",
+]
+
+
+class LocalChatProvider(ChatProvider):
+    """Deterministic StackDraft JSON from keyword hits in the prompt; for degraded mode and load tests."""
+    model = "local-stack-v1"
+
+    def _draft(self, request: Dict[str, Any]) -> str:
+        text = request["messages"][-1]["content"].rsplit("Project:", 1)[-1].lower()
+        hits = [t for t in _TECH_TERMS if t in text]
+        return json.dumps({
+            "stack": list(dict.fromkeys(hits + ["python", "postgresql", "docker"]))[:6],
+            "skills": list(dict.fromkeys(hits[:4] + ["python", "software engineering"]))[:4],
+            "evaluation": ["working prototype demo"],
+        })
+
+    def complete(self, request):
+        return self._draft(request)
+
+    async def acomplete(self, request):
+        return self._draft(request)
+
+    async def astream(self, request):
+        raw = self._draft(request)
+        for i in range(0, len(raw), 16):
+            yield raw[i:i + 16]
+            await asyncio.sleep(0)
+
+
+def make_embedding_provider(name: str = EMBED_PROVIDER) -> EmbeddingProvider:
+    if name == "local":
+        return LocalEmbeddingProvider()
+    if name == "openai":
+        return OpenAIEmbeddingProvider(os.getenv("EMBED_MODEL", "text-embedding-3-large"))
+    raise ValueError(f"Unknown EMBED_PROVIDER {name!r}")
+
+def make_chat_provider(name: str = CHAT_PROVIDER) -> ChatProvider:
+    if name == "local":
+        return LocalChatProvider()
+    if name == "openai":
+        return OpenAIChatProvider(os.getenv("CHAT_MODEL", "gpt-4o-mini"))
+    raise ValueError(f"Unknown CHAT_PROVIDER {name!r}")
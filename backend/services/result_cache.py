@@ -0,0 +1,145 @@
+import json
+import os
+import threading
+from typing import Any, Dict, Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+from .llm_cache import TTLCache
+
+MATCH_CACHE = os.getenv("MATCH_CACHE", "memory")  # "memory" | "redis" | "off"
+MATCH_CACHE_SIZE = int(os.getenv("MATCH_CACHE_SIZE", "2048"))  # entries (memory backend)
+MATCH_CACHE_TTL = float(os.getenv("MATCH_CACHE_TTL", "3600"))  # seconds; backstop only, versions invalidate
+MATCH_CACHE_URL = os.getenv("MATCH_CACHE_URL", "redis://localhost:6379/0")
+
+VERSION_KEY = "sangam:corpus_version"
+
+
+class MemoryBackend:
+    """Per-process LRU; the version counter is per-process too, so use redis with several workers."""
+    blocking = False
+
+    def __init__(self, max_items: int = MATCH_CACHE_SIZE, ttl: float = MATCH_CACHE_TTL):
+        self._lru = TTLCache(max_items, ttl)
+        self._version = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        return self._lru.get(key)
+
+    def set(self, key: str, value: Any):
+        self._lru.put(key, value)
+
+    def version(self) -> int:
+        return self._version
+
+    def bump(self) -> int:
+        with self._lock:
+            self._version += 1
+            return self._version
+
+    def stats(self) -> Dict[str, int]:
+        return {**self._lru.stats(), "version": self._version}
+
+
+class RedisBackend:
+    """
+    Shared by every worker through any Redis-protocol server (Redis, Valkey, KeyDB, a
+    local stand-in). Entries carry MATCH_CACHE_TTL; bound memory with the server's
+    maxmemory + allkeys-lru. The version is one INCR'd key.
+    """
+    blocking = True
+
+    def __init__(self, url: str = MATCH_CACHE_URL, ttl: float = MATCH_CACHE_TTL):
+        import redis  # optional dependency, only needed for MATCH_CACHE=redis
+        self.r = redis.Redis.from_url(url, socket_timeout=0.25, socket_connect_timeout=0.25)
+        self.ttl = int(ttl) or None
+        self.hits = self.misses = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        raw = self.r.get(key)
+        if raw is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(raw)
+
+    def set(self, key: str, value: Any):
+        self.r.set(key, json.dumps(value), ex=self.ttl)
+
+    def version(self) -> int:
+        return int(self.r.get(VERSION_KEY) or 0)
+
+    def bump(self) -> int:
+        return int(self.r.incr(VERSION_KEY))
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "version": self.version()}
+
+
+class ResultCache:
+    """
+    Ranked /match results keyed by (request params, corpus version). Writes that can
+    change a ranking bump the version, so older entries are simply never read again
+    (and age out by LRU/TTL). Backend errors count as misses; they never fail a request.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.errors = 0
+
+    async def _call(self, fn):
+        if self.backend is None:
+            return None
+        try:
+            return await run_in_threadpool(fn) if self.backend.blocking else fn()
+        except Exception:
+            self.errors += 1
+            return None
+
+    async def key(self, *parts: Any) -> Optional[str]:
+        """Read the corpus version before ranking, so a racing write only orphans this entry."""
+        version = await self._call(lambda: self.backend.version())
+        if version is None:
+            return None
+        return "sangam:match:" + ":".join(map(str, (version, *parts)))
+
+    async def get(self, key: Optional[str]) -> Optional[Any]:
+        return await self._call(lambda: self.backend.get(key)) if key else None
+
+    async def set(self, key: Optional[str], value: Any):
+        if key:
+            await self._call(lambda: self.backend.set(key, value))
+
+    def bump(self):
+        """Invalidate every cached ranking; call after committing a profile or project change."""
+        if self.backend is None:
+            return
+        try:
+            self.backend.bump()
+        except Exception:
+            self.errors += 1
+
+    async def abump(self):
+        await self._call(self.bump)
+
+    def stats(self) -> Dict[str, Any]:
+        if self.backend is None:
+            return {"backend": "off"}
+        try:
+            return {"backend": MATCH_CACHE, "errors": self.errors, **self.backend.stats()}
+        except Exception:
+            return {"backend": MATCH_CACHE, "errors": self.errors + 1}
+
+
+def make_backend(name: str = MATCH_CACHE):
+    if name == "off":
+        return None
+    if name == "memory":
+        return MemoryBackend()
+    if name == "redis":
+        return RedisBackend()
+    raise ValueError(f"Unknown MATCH_CACHE {name!r}")
+
+
+match_cache = ResultCache(make_backend())
@@ -0,0 +1,340 @@
+import atexit
+import fcntl
+import json
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from multiprocessing import get_context, resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+from .index import SCORE_CHUNK, VectorIndex, topk_rows
+
+# Every API worker on the host maps this one named segment ("" = a private segment per process).
+# Segments outlive workers: a restart re-attaches and the first sync reconciles. Remove with
+# `rm /dev/shm/<name>*` after changing INDEX_DIM / INDEX_DTYPE.
+SHARD_SEGMENT = os.getenv("SHARD_SEGMENT", "sangam-students")
+# Shard processes per API worker; by default the workers split the cores between them
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+SHARD_WORKERS = int(os.getenv("SHARD_WORKERS", str(max(1, (os.cpu_count() or 1) // max(1, WEB_CONCURRENCY)))))
+SHARD_MIN_ROWS = int(os.getenv("SHARD_MIN_ROWS", "100000"))  # below this, in-process scoring is cheaper
+ALIGN = 64
+
+
+def _layout(cap: int, dim: int, dtype: np.dtype, scaled: bool) -> Tuple[int, int, int, int]:
+    """Byte offsets of ids | scale | matrix inside one segment, plus its total size."""
+    def up(x: int) -> int:
+        return (x + ALIGN - 1) // ALIGN * ALIGN
+    ids_off = 0
+    scale_off = up(cap * 8)
+    m_off = up(scale_off + (cap * 4 if scaled else 0))
+    return ids_off, scale_off, m_off, max(1, m_off + cap * dim * dtype.itemsize)
+
+
+def _open(name: str, tracked: bool, size: int = 0) -> SharedMemory:
+    """Attach to (size=0) or create a segment; untracked ones survive this process's exit."""
+    shm = SharedMemory(name=name, create=size > 0, size=size)
+    if not tracked:
+        resource_tracker.unregister(shm._name, "shared_memory")
+    return shm
+
+
+# ---------- shard worker side ----------
+_attached: Dict[str, SharedMemory] = {}
+
+def _attach(name: str, tracked: bool) -> SharedMemory:
+    shm = _attached.get(name)
+    if shm is None:
+        # the coordinator replaced its segment (growth): drop the old mapping
+        for old in list(_attached):
+            _attached.pop(old).close()
+        # pool processes share the coordinator's resource tracker, which only
+        # cleans up private segments the coordinator failed to unlink
+        shm = _attached[name] = _open(name, tracked)
+    return shm
+
+def shard_topk(M: np.ndarray, scale: np.ndarray | None, Q: np.ndarray,
+               lo: int, hi: int, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Top-k (global row positions, scores) per query over rows [lo, hi), chunk by chunk."""
+    parts_pos, parts_score = [], []
+    for start in range(lo, hi, SCORE_CHUNK):
+        stop = min(hi, start + SCORE_CHUNK)
+        B = M[start:stop]
+        if B.dtype != np.float32:
+            B = B.astype("float32")
+            if scale is not None:
+                B *= scale[start:stop, None]
+        S = Q @ B.T
+        pos = topk_rows(S, k)
+        parts_pos.append(pos + start)
+        parts_score.append(np.take_along_axis(S, pos, axis=1))
+    pos, S = np.concatenate(parts_pos, axis=1), np.concatenate(parts_score, axis=1)
+    best = topk_rows(S, k)
+    return np.take_along_axis(pos, best, axis=1), np.take_along_axis(S, best, axis=1)
+
+def _score_shard(name: str, tracked: bool, cap: int, dim: int, dtype: str, scaled: bool,
+                 Q: np.ndarray, lo: int, hi: int, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    dt = np.dtype(dtype)
+    _, scale_off, m_off, _ = _layout(cap, dim, dt, scaled)
+    buf = _attach(name, tracked).buf
+    M = np.ndarray((cap, dim), dtype=dt, buffer=buf, offset=m_off)
+    scale = np.ndarray((cap,), dtype="float32", buffer=buf, offset=scale_off) if scaled else None
+    return shard_topk(M, scale, Q, lo, hi, k)
+
+
+# ---------- coordinator side ----------
+def _release(shm: SharedMemory | None, unlink: bool = True):
+    if shm is None:
+        return
+    try:
+        shm.close()
+    except BufferError:
+        pass  # a caller still holds a view; the mapping goes when it does
+    if unlink:
+        shm.unlink()  # shard processes still attached keep their mapping until they re-attach
+
+# Control segment of a named index: int64 fields every worker reads before touching rows
+VERSION, GEN, N, CAP, DIM, DTYPE = range(6)
+DTYPES = ("float32", "float16", "int8")
+
+def _control(name: str) -> SharedMemory:
+    """Create the control segment, or attach if another worker (or a loader) got there first."""
+    try:
+        return _open(name, tracked=False, size=8 * 8)  # a new segment is zero-filled: generation 0, no rows
+    except FileExistsError:
+        return _open(name, tracked=False)
+
+class ShardedIndex(VectorIndex):
+    """
+    Exact index whose rows live in one multiprocessing.shared_memory segment.
+    Full scans are split into contiguous row ranges scored by a process pool
+    (each shard returns its local top-k, the coordinator merges), so latency
+    scales with cores. Shard processes map the segment instead of copying it;
+    in-place adds/removes are visible to them immediately, and growth swaps in a
+    new segment they re-attach to. Prefiltered (`within`) searches and corpora
+    under min_rows stay in-process.
+
+    With a `segment` name every API worker on the host maps the same rows: the
+    first one to start (or `python -m backend.corpus`) creates it, the rest attach.
+    A small control segment holds the row count and data-segment generation;
+    writes take a host-wide file lock and bump its version, and each worker
+    re-reads its id -> row map when the version moved. Workers still sync from the
+    database themselves; applying a row another worker already wrote is a no-op.
+    """
+
+    def __init__(self, dim: int | None = None, workers: int = SHARD_WORKERS,
+                 min_rows: int = SHARD_MIN_ROWS, capacity: int = 1024,
+                 segment: str | None = SHARD_SEGMENT, **storage):
+        super().__init__(dim, capacity, **storage)
+        self.workers = max(1, workers)
+        self.min_rows = min_rows
+        self.segment = segment or None
+        self._shm: SharedMemory | None = None
+        self._pool: ProcessPoolExecutor | None = None
+        self._pool_lock = threading.Lock()
+        self._ctl: SharedMemory | None = None
+        self._gen, self._seen, self._held = 0, -1, 0
+        if self.segment:
+            self._ctl = _control(self.segment)
+            self._header = np.ndarray((8,), dtype=np.int64, buffer=self._ctl.buf)
+            self._lockfile = open(os.path.join(tempfile.gettempdir(), f"{self.segment}.lock"), "a")
+        atexit.register(self.close)
+
+    # ----- host-wide view of a named segment -----
+    @contextmanager
+    def _shared(self, write: bool = False):
+        """Thread lock, plus (named segment) the file lock and a refreshed view; writes publish on exit."""
+        with self._lock:
+            if self._ctl is None or self._held:
+                yield
+                return
+            fcntl.flock(self._lockfile, fcntl.LOCK_EX if write else fcntl.LOCK_SH)
+            self._held += 1
+            try:
+                self._refresh()
+                yield
+                if write:
+                    self._publish()
+            finally:
+                self._held -= 1
+                fcntl.flock(self._lockfile, fcntl.LOCK_UN)
+
+    def _refresh(self):
+        h = self._header
+        if h[VERSION] == self._seen:
+            return
+        gen = int(h[GEN])
+        if gen and gen != self._gen:
+            if DTYPES[h[DTYPE]] != self.dtype.name or (self.dim and self.dim != h[DIM]):
+                raise ValueError(f"shared segment {self.segment!r} holds {h[DIM]}-dim {DTYPES[h[DTYPE]]} rows; "
+                                 f"this worker stores {self.dim}-dim {self.dtype.name}")
+            old, self._shm = self._shm, _open(f"{self.segment}-{gen}", tracked=False)
+            self.dim, self._gen = int(h[DIM]), gen
+            self._map(int(h[CAP]))
+            _release(old, unlink=False)
+        self._n = int(h[N])
+        self._pos = {int(i): r for r, i in enumerate(self._ids[: self._n].tolist())}
+        self._seen = int(h[VERSION])
+
+    def _publish(self):
+        h = self._header
+        h[N], h[DIM] = self._n, self.dim or 0
+        h[VERSION] += 1
+        self._seen = int(h[VERSION])
+
+    def _map(self, cap: int):
+        scaled = self.dtype == np.int8
+        ids_off, scale_off, m_off, _ = _layout(cap, self.dim, self.dtype, scaled)
+        buf = self._shm.buf
+        self._ids = np.ndarray((cap,), dtype=np.int64, buffer=buf, offset=ids_off)
+        self._M = np.ndarray((cap, self.dim), dtype=self.dtype, buffer=buf, offset=m_off)
+        self._scale = np.ndarray((cap,), dtype="float32", buffer=buf, offset=scale_off) if scaled else None
+
+    def _share(self, cap: int):
+        """Move storage into a fresh segment of `cap` rows (copying live rows) and release the old one."""
+        size = _layout(cap, self.dim, self.dtype, self.dtype == np.int8)[3]
+        if self._ctl is None:
+            shm = SharedMemory(create=True, size=size)
+        else:
+            gen = int(self._header[GEN]) + 1
+            name = f"{self.segment}-{gen}"
+            try:
+                shm = _open(name, tracked=False, size=size)
+            except FileExistsError:  # left over from a run that died mid-growth
+                SharedMemory(name=name).unlink()
+                shm = _open(name, tracked=False, size=size)
+        M, ids, scale, n = self._M, self._ids, self._scale, self._n
+        old, self._shm = self._shm, shm
+        self._map(cap)
+        if M is not None:
+            self._M[:n] = M[:n]
+            self._ids[:n] = ids[:n]
+            if scale is not None:
+                self._scale[:n] = scale[:n]
+        if self._ctl is not None:
+            self._header[GEN], self._header[CAP], self._gen = gen, cap, gen
+            self._header[DTYPE] = DTYPES.index(self.dtype.name)
+        _release(old)
+
+    def _reserve(self, extra: int):
+        need = self._n + extra
+        if self._M is not None and need <= self._M.shape[0]:
+            return
+        cap = max(self._capacity, self._M.shape[0] if self._M is not None else 0)
+        while cap < need:
+            cap *= 2
+        self._share(cap)
+
+    def _on_load(self):
+        # snapshot arrays come back as file mappings; shard processes need them in the segment
+        old, self._shm = self._shm, None
+        self._share(self._M.shape[0])
+        _release(old)
+
+    # ----- VectorIndex API, each call against the current shared view -----
+    def __len__(self) -> int:
+        with self._shared():
+            return self._n
+
+    def __contains__(self, id_: int) -> bool:
+        with self._shared():
+            return id_ in self._pos
+
+    @property
+    def ids(self) -> np.ndarray:
+        with self._shared():
+            return self._ids[: self._n].copy()
+
+    def row(self, id_: int) -> int | None:
+        with self._shared():
+            return super().row(id_)
+
+    def get(self, id_: int) -> np.ndarray | None:
+        with self._shared():
+            return super().get(id_)
+
+    def score_rows(self, Q: np.ndarray, rows: np.ndarray | None = None) -> np.ndarray:
+        with self._shared():
+            return super().score_rows(Q, rows)
+
+    def add(self, ids: Iterable[int], X: np.ndarray):
+        with self._shared(write=True):
+            super().add(ids, X)
+
+    def remove(self, ids: Iterable[int]):
+        with self._shared(write=True):
+            super().remove(ids)
+
+    def save(self, path: str, **meta):
+        with self._shared():
+            super().save(path, **meta)
+
+    def load(self, path: str, mmap: bool = True) -> dict:
+        with self._shared(write=True):
+            if self._ctl is not None and self._n:
+                # another worker (or the loader) already filled the segment; the caller's sync catches up
+                with open(os.path.join(path, "meta.json")) as f:
+                    return json.load(f)
+            return super().load(path, mmap)
+
+    def close(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(cancel_futures=True)
+                self._pool = None
+            if self._shm is not None:
+                self._M = self._scale = None
+                self._ids, self._pos, self._n = np.empty(0, dtype=np.int64), {}, 0
+                shm, self._shm = self._shm, None
+                _release(shm, unlink=self._ctl is None)  # a named segment stays for the other workers
+            self._gen, self._seen = 0, -1
+
+    def _executor(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                # spawn: never fork a process that may hold locks from uvicorn/SQLAlchemy threads
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=get_context("spawn"))
+            return self._pool
+
+    def _sharded(self, within) -> bool:
+        return within is None and self._n >= self.min_rows and self._shm is not None and self.workers > 1
+
+    def _fan_out(self, Q: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """(P, k) global rows and scores, merged from one local top-k per shard."""
+        n, bounds = self._n, np.linspace(0, self._n, self.workers + 1).astype(int)
+        args = (self._shm.name, self._ctl is None, self._M.shape[0], self.dim, self.dtype.name,
+                self._scale is not None, Q)
+        futures = [
+            self._executor().submit(_score_shard, *args, int(lo), int(hi), k)
+            for lo, hi in zip(bounds[:-1], bounds[1:]) if hi > lo
+        ]
+        parts = [f.result() for f in futures]
+        pos = np.concatenate([p for p, _ in parts], axis=1)
+        S = np.concatenate([s for _, s in parts], axis=1)
+        best = topk_rows(S, min(k, n))
+        return np.take_along_axis(pos, best, axis=1), np.take_along_axis(S, best, axis=1)
+
+    def search(self, q: np.ndarray, k: int, exclude: Iterable[int] = (),
+               within: Iterable[int] | None = None) -> Tuple[np.ndarray, np.ndarray]:
+        exclude = {int(i) for i in exclude}
+        with self._shared():
+            if not self._sharded(within):
+                return super().search(q, k, exclude, within)
+            pos, S = self._fan_out(self.prepare(q), k + len(exclude))
+            ids, scores = self._ids[pos[0]].copy(), S[0]
+        keep = np.array([i not in exclude for i in ids.tolist()], dtype=bool) & np.isfinite(scores)
+        return ids[keep][:k], scores[keep][:k]
+
+    def search_many(self, Q: np.ndarray, k: int,
+                    within: Iterable[int] | None = None) -> List[Tuple[np.ndarray, np.ndarray]]:
+        with self._shared():
+            if not self._sharded(within):
+                return super().search_many(Q, k, within)
+            Q = self.prepare(Q)
+            pos, S = self._fan_out(Q, k)
+            ids = self._ids[pos]
+        return [(ids[i], S[i]) for i in range(Q.shape[0])]
@@ -0,0 +1,122 @@
+import threading
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Set, Tuple
+
+import numpy as np
+from sqlalchemy import delete, false, func, insert, select
+from sqlalchemy.orm import Session
+
+from ..models import ProjectTag, Tag, UserTag
+
+USER_TAG_FIELDS = {"skill": "skills", "interest": "interests"}
+PROJECT_TAG_FIELDS = {"tag": "tags", "stack": "stack"}
+
+
+def split_tags(text: Optional[str]) -> List[str]:
+    """'PyTorch, OpenCV ,pytorch' -> ['pytorch', 'opencv'] (order kept, deduped)."""
+    if not text:
+        return []
+    return list(dict.fromkeys(t.strip().lower()[:100] for t in text.split(",") if t.strip()))
+
+def _insert_ignore(db: Session):
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        raise NotImplementedError(f"tag get-or-create needs ON CONFLICT support, not {dialect}")
+    return dialect_insert(Tag).on_conflict_do_nothing(index_elements=["name"])
+
+def tag_ids(db: Session, names: Iterable[str]) -> Dict[str, int]:
+    """Get-or-create tag ids; concurrent writers adding the same new tag both succeed."""
+    names = list(dict.fromkeys(names))
+    if not names:
+        return {}
+    found = dict(db.execute(select(Tag.name, Tag.id).where(Tag.name.in_(names))).tuples().all())
+    missing = [n for n in names if n not in found]
+    if missing:
+        # a racing insert of the same name is skipped rather than raised; re-select picks up its id
+        db.execute(_insert_ignore(db), [{"name": n} for n in missing])
+        found.update(db.execute(select(Tag.name, Tag.id).where(Tag.name.in_(missing))).tuples().all())
+    return found
+
+def _sync(db: Session, link, owner_col: str, fields: Mapping[str, str], entities: Sequence) -> None:
+    if not entities:
+        return
+    terms = [(e.id, kind, name) for e in entities for kind, attr in fields.items()
+             for name in split_tags(getattr(e, attr))]
+    ids = tag_ids(db, [name for _, _, name in terms])
+    db.execute(delete(link).where(getattr(link, owner_col).in_([e.id for e in entities])))
+    if terms:
+        db.execute(insert(link), [{owner_col: eid, "tag_id": ids[name], "kind": kind} for eid, kind, name in terms])
+
+def sync_user_tags(db: Session, users: Sequence) -> None:
+    """Rewrite user_tags for these users from their skills/interests (caller commits)."""
+    _sync(db, UserTag, "user_id", USER_TAG_FIELDS, users)
+
+def sync_project_tags(db: Session, projects: Sequence) -> None:
+    """Rewrite project_tags for these projects from their tags/stack (caller commits)."""
+    _sync(db, ProjectTag, "project_id", PROJECT_TAG_FIELDS, projects)
+
+def users_with_tags(names: Iterable[str], kind: str = "skill"):
+    """SQL prefilter: select of user ids linked to every one of the given tags (none for no tags)."""
+    names = split_tags(",".join(names))
+    q = select(UserTag.user_id).join(Tag, Tag.id == UserTag.tag_id).where(UserTag.kind == kind)
+    if not names:
+        return q.where(false())
+    return q.where(Tag.name.in_(names)).group_by(UserTag.user_id).having(
+        func.count(func.distinct(Tag.id)) == len(names)
+    )
+
+
+class TagIndex:
+    """
+    In-memory inverted index (kind, tag) -> sorted int64 id array.
+    Postings are kept as sets and materialized to sorted arrays lazily, so
+    updates are O(tags changed) and AND queries are intersect1d over arrays.
+    """
+
+    def __init__(self):
+        self._postings: Dict[Tuple[str, str], Set[int]] = {}
+        self._arrays: Dict[Tuple[str, str], np.ndarray] = {}
+        self._by_id: Dict[int, Set[Tuple[str, str]]] = {}
+        self._lock = threading.Lock()
+
+    def set(self, id_: int, terms: Mapping[str, Iterable[str]]):
+        """Replace an id's terms, e.g. set(7, {"skill": ["pytorch"], "interest": ["robotics"]})."""
+        new = {(kind, t) for kind, names in terms.items() for t in names}
+        with self._lock:
+            old = self._by_id.get(id_, set())
+            for key in old - new:
+                self._postings[key].discard(id_)
+                self._arrays.pop(key, None)
+            for key in new - old:
+                self._postings.setdefault(key, set()).add(id_)
+                self._arrays.pop(key, None)
+            self._by_id[id_] = new
+
+    def remove(self, ids: Iterable[int]):
+        for id_ in ids:
+            self.set(id_, {})
+            self._by_id.pop(id_, None)
+
+    def _array(self, key: Tuple[str, str]) -> np.ndarray:
+        arr = self._arrays.get(key)
+        if arr is None:
+            arr = np.fromiter(sorted(self._postings.get(key, ())), dtype=np.int64)
+            self._arrays[key] = arr
+        return arr
+
+    def match_all(self, names: Iterable[str], kind: str = "skill") -> np.ndarray:
+        """Sorted ids carrying every tag (AND)."""
+        keys = [(kind, t) for t in split_tags(",".join(names))]
+        with self._lock:
+            arrays = sorted((self._array(k) for k in keys), key=len)
+        if not arrays:
+            return np.empty(0, dtype=np.int64)
+        out = arrays[0]
+        for arr in arrays[1:]:
+            if out.size == 0:
+                break
+            out = np.intersect1d(out, arr, assume_unique=True)
+        return out
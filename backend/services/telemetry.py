@@ -0,0 +1,157 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+
+TELEMETRY = os.getenv("TELEMETRY", "1") == "1"  # "0": no middleware, no /metrics, spans are no-ops
+SERVER_TIMING = os.getenv("SERVER_TIMING", "1") == "1"  # per-request breakdown in a response header
+
+# seconds; request and stage histograms share them
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    __slots__ = ("counts", "sum")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)  # last slot is +Inf
+        self.sum = 0.0
+
+    def observe(self, v: float):
+        self.counts[bisect_left(BUCKETS, v)] += 1
+        self.sum += v
+
+
+class Registry:
+    """Process-local Prometheus-style counters and histograms, rendered in the text format."""
+
+    def __init__(self):
+        self._hist: Dict[str, Dict[Labels, Histogram]] = defaultdict(dict)
+        self._counters: Dict[str, Dict[Labels, float]] = defaultdict(lambda: defaultdict(float))
+        self._help: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def describe(self, name: str, help_: str):
+        self._help[name] = help_
+
+    def observe(self, name: str, value: float, **labels: str):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            h = self._hist[name].get(key)
+            if h is None:
+                h = self._hist[name][key] = Histogram()
+            h.observe(value)
+
+    def inc(self, name: str, value: float = 1, **labels: str):
+        with self._lock:
+            self._counters[name][tuple(sorted(labels.items()))] += value
+
+    def render(self) -> str:
+        def fmt(labels: Labels, extra: str = "") -> str:
+            parts = [f'{k}="{v}"' for k, v in labels] + ([extra] if extra else [])
+            return "{" + ",".join(parts) + "}" if parts else ""
+
+        out = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                out += [f"# HELP {name} {self._help.get(name, name)}", f"# TYPE {name} counter"]
+                out += [f"{name}{fmt(k)} {v:g}" for k, v in sorted(series.items())]
+            for name, series in sorted(self._hist.items()):
+                out += [f"# HELP {name} {self._help.get(name, name)}", f"# TYPE {name} histogram"]
+                for k, h in sorted(series.items()):
+                    acc = 0
+                    for le, c in zip([*map(str, BUCKETS), "+Inf"], h.counts):
+                        acc += c
+                        bucket = 'le="%s"' % le
+                        out.append(f"{name}_bucket{fmt(k, bucket)} {acc}")
+                    out.append(f"{name}_sum{fmt(k)} {h.sum:.6f}")
+                    out.append(f"{name}_count{fmt(k)} {acc}")
+        return "\n".join(out) + "\n"
+
+
+registry = Registry()
+registry.describe("sangam_request_seconds", "HTTP request latency by route")
+registry.describe("sangam_stage_seconds", "Time spent per pipeline stage within a request")
+
+
+class Trace:
+    """Stage totals and counters for one request."""
+    __slots__ = ("spans", "counts")
+
+    def __init__(self):
+        self.spans: Dict[str, float] = defaultdict(float)
+        self.counts: Dict[str, int] = defaultdict(int)
+
+    def server_timing(self, total: float) -> str:
+        parts = [f"{name};dur={1000 * s:.2f}" for name, s in self.spans.items()]
+        parts += [f'{name};desc="{n}"' for name, n in self.counts.items()]
+        parts.append(f"total;dur={1000 * total:.2f}")
+        return ", ".join(parts)
+
+
+_trace: ContextVar[Optional[Trace]] = ContextVar("trace", default=None)
+
+
+@contextmanager
+def span(name: str):
+    """Add the block's wall time to stage `name` of the current request (no-op outside one)."""
+    trace = _trace.get()
+    if trace is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.spans[name] += time.perf_counter() - start
+
+
+def count(name: str, n: int = 1):
+    """Bump sangam_<name>_total, and the current request's Server-Timing counter."""
+    if not TELEMETRY or not n:
+        return
+    registry.inc(f"sangam_{name}_total", n)
+    trace = _trace.get()
+    if trace is not None:
+        trace.counts[name] += n
+
+
+class TelemetryMiddleware:
+    """Pure ASGI, so streaming responses pass through untouched; spans recorded after headers are sent only reach /metrics."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        trace = Trace()
+        token = _trace.set(trace)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if SERVER_TIMING:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", trace.server_timing(time.perf_counter() - start).encode()))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _trace.reset(token)
+            route = getattr(scope.get("route"), "path", "unmatched")
+            registry.observe("sangam_request_seconds", time.perf_counter() - start,
+                             method=scope["method"], route=route, status=str(status))
+            for name, s in trace.spans.items():
+                registry.observe("sangam_stage_seconds", s, stage=name, route=route)
@@ -0,0 +1,154 @@
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import func, insert, or_, select
+from sqlalchemy.orm import Session
+
+from ..matching import pack_project
+from ..models import Notification, Project, ProjectEmbedding, StudentWatchlist
+from .embeddings import EMBED_MODEL, embed_texts
+from .index import topk_rows
+from .profile_store import text_hash, to_vector
+
+WATCHLIST_MIN_SCORE = float(os.getenv("WATCHLIST_MIN_SCORE", "0.3"))  # cosine floor for a notification
+WATCHLIST_TOPK = int(os.getenv("WATCHLIST_TOPK", "5"))  # notifications per watchlist per run
+WATCHLIST_SCAN_INTERVAL = int(os.getenv("WATCHLIST_SCAN_INTERVAL", "0"))  # seconds; >0 runs the scanner in the API
+# project ids below a watchlist's mark re-checked each run: ids are assigned at insert,
+# not commit, so a lower id can become visible after a higher one was scanned
+WATCHLIST_ID_SLACK = int(os.getenv("WATCHLIST_ID_SLACK", "100"))
+
+CADENCE = {"hourly": timedelta(hours=1), "daily": timedelta(days=1), "weekly": timedelta(weeks=1)}
+DEFAULT_CADENCE = "daily"
+
+
+def due_clause(now: datetime):
+    """Watchlists never scanned, or whose cadence has elapsed since the last scan."""
+    W = StudentWatchlist
+    known = list(CADENCE)
+    return or_(
+        W.last_run_at.is_(None),
+        *((W.cadence == name) & (W.last_run_at <= now - every) for name, every in CADENCE.items()),
+        (W.cadence.is_(None) | W.cadence.not_in(known)) & (W.last_run_at <= now - CADENCE[DEFAULT_CADENCE]),
+    )
+
+def upsert_project_embeddings(db: Session, projects: Sequence) -> int:
+    """Embed projects whose pack_project text or EMBED_MODEL changed (caller commits); returns how many."""
+    texts = {p.id: pack_project(p.title, p.description, p.tags, p.stack) for p in projects}
+    rows = {r.project_id: r for r in db.scalars(
+        select(ProjectEmbedding).where(ProjectEmbedding.project_id.in_(list(texts)))
+    )} if texts else {}
+    stale = [
+        pid for pid, text in texts.items()
+        if pid not in rows or rows[pid].model != EMBED_MODEL or rows[pid].text_hash != text_hash(text)
+    ]
+    if not stale:
+        return 0
+    X = embed_texts([texts[pid] for pid in stale], remember=False)
+    now = datetime.now(timezone.utc)
+    for pid, v in zip(stale, X):
+        row = rows.get(pid) or ProjectEmbedding(project_id=pid)
+        row.model, row.text_hash, row.dim = EMBED_MODEL, text_hash(texts[pid]), int(v.shape[0])
+        row.vector = np.ascontiguousarray(v, dtype="float32").tobytes()
+        row.updated_at = now
+        db.add(row)
+    return len(stale)
+
+def embed_projects(db: Session, lo: int, hi: int) -> int:
+    """Store vectors for projects in (lo, hi] that have none under EMBED_MODEL (the write-behind queue usually got there first)."""
+    projects = db.execute(
+        select(Project.id, Project.title, Project.description, Project.tags, Project.stack)
+        .outerjoin(ProjectEmbedding, ProjectEmbedding.project_id == Project.id)
+        .where(Project.id > lo, Project.id <= hi)
+        .where(ProjectEmbedding.project_id.is_(None) | (ProjectEmbedding.model != EMBED_MODEL))
+        .order_by(Project.id)
+    ).all()
+    return upsert_project_embeddings(db, projects)
+
+def embed_topics(watchlists: Sequence[StudentWatchlist]) -> int:
+    """Re-embed watchlists whose topics string (or EMBED_MODEL) changed since it was last embedded."""
+    stale = [w for w in watchlists if w.model != EMBED_MODEL or w.topics_hash != text_hash(w.topics)]
+    if stale:
+        X = embed_texts([w.topics for w in stale], remember=False)
+        for w, v in zip(stale, X):
+            w.model, w.topics_hash = EMBED_MODEL, text_hash(w.topics)
+            w.vector = np.ascontiguousarray(v, dtype="float32").tobytes()
+    return len(stale)
+
+def project_block(db: Session, lo: int, hi: int) -> Tuple[np.ndarray, np.ndarray]:
+    rows = db.execute(
+        select(ProjectEmbedding.project_id, ProjectEmbedding.vector)
+        .where(ProjectEmbedding.project_id > lo, ProjectEmbedding.project_id <= hi,
+               ProjectEmbedding.model == EMBED_MODEL)
+        .order_by(ProjectEmbedding.project_id)
+    ).all()
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.zeros((0, 1), dtype="float32")
+    return np.array([r.project_id for r in rows], dtype=np.int64), np.stack([to_vector(r) for r in rows])
+
+def match_block(watchlists: Sequence[StudentWatchlist], pids: np.ndarray, P: np.ndarray,
+                floors: Sequence[int], seen: set = frozenset()) -> List[dict]:
+    """
+    Score due watchlists x new projects in one product; each watchlist only sees
+    projects past its floor that it hasn't been notified of (`seen` (watchlist, project) pairs).
+    """
+    W = np.stack([np.frombuffer(w.vector, dtype="float32") for w in watchlists])
+    S = W @ P.T
+    S[pids[None, :] <= np.array(floors, dtype=np.int64)[:, None]] = -np.inf
+    row = {w.id: i for i, w in enumerate(watchlists)}
+    col = {pid: j for j, pid in enumerate(pids.tolist())}
+    for wid, pid in seen:
+        if wid in row and pid in col:
+            S[row[wid], col[pid]] = -np.inf
+    out = []
+    for w, scores, cols in zip(watchlists, S, topk_rows(S, WATCHLIST_TOPK)):
+        for c in cols.tolist():
+            if scores[c] < WATCHLIST_MIN_SCORE:
+                break
+            out.append({"user_id": w.user_id, "watchlist_id": w.id,
+                        "project_id": int(pids[c]), "score": float(scores[c])})
+    return out
+
+def scan_watchlists(db: Session, now: datetime | None = None) -> Dict[str, int]:
+    """
+    One scanner pass: due watchlists are matched against projects created since
+    their own high-water mark, then the marks move to the newest project id.
+    New watchlists start at the current mark (they are notified of future projects).
+    The last WATCHLIST_ID_SLACK ids under a mark are re-checked so late commits
+    aren't skipped; the notifications table keeps that from notifying twice.
+    """
+    now = now or datetime.now(timezone.utc)
+    due = db.scalars(select(StudentWatchlist).where(due_clause(now)).order_by(StudentWatchlist.id)).all()
+    report = {"due": len(due), "projects_embedded": 0, "topics_embedded": 0, "notifications": 0}
+    if not due:
+        return report
+
+    hi = db.scalar(select(func.max(Project.id))) or 0
+    floors = {}
+    for w in due:
+        if w.last_project_id is None:
+            w.start_project_id = w.last_project_id = floors[w.id] = hi
+        else:  # the slack never reaches back past the projects that predate the watchlist
+            floors[w.id] = max(w.start_project_id or 0, w.last_project_id - WATCHLIST_ID_SLACK)
+    active = [w for w in due if floors[w.id] < hi and (w.topics or "").strip()]
+    if active:
+        lo = min(floors[w.id] for w in active)
+        report["projects_embedded"] = embed_projects(db, lo, hi)
+        report["topics_embedded"] = embed_topics(active)
+        db.flush()  # sessions don't autoflush: project_block must see the vectors just stored
+        pids, P = project_block(db, lo, hi)
+        if pids.size:
+            seen = set(db.execute(
+                select(Notification.watchlist_id, Notification.project_id)
+                .where(Notification.watchlist_id.in_([w.id for w in active]), Notification.project_id > lo)
+            ).tuples().all())
+            rows = match_block(active, pids, P, [floors[w.id] for w in active], seen)
+            if rows:
+                db.execute(insert(Notification), [{**r, "created_at": now} for r in rows])
+            report["notifications"] = len(rows)
+
+    for w in due:
+        w.last_project_id, w.last_run_at = hi, now
+    db.commit()
+    return report
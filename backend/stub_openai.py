@@ -0,0 +1,124 @@
+# backend/stub_openai.py
+"""
+OpenAI-compatible stub upstream for exercising services/outbound.py: embeddings and
+chat completions (streamed or not) answered by the local providers after injected
+latency, with random 429s/500s and an optional RPM budget enforced like the real API.
+Run from the project root:
+    python -m backend.stub_openai --port 8900 --latency-ms 80 --tail-ms 400 --p429 0.1
+then point the API (or backend.bench with EMBED_PROVIDER=openai) at it:
+    OPENAI_BASE_URL=http://127.0.0.1:8900/v1 OPENAI_API_KEY=stub uvicorn backend.main:app
+"""
+import argparse
+import asyncio
+import base64
+import json
+import random
+import time
+from collections import deque
+
+import numpy as np
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from backend.services.providers import LocalChatProvider, LocalEmbeddingProvider
+
+app = FastAPI(title="OpenAI stub")
+config = argparse.Namespace(latency_ms=50.0, tail_ms=0.0, p429=0.0, p500=0.0, retry_after=1.0, rpm=0, dim=3072)
+stats = {"requests": 0, "429": 0, "500": 0}
+_recent: deque = deque()
+_embedder: LocalEmbeddingProvider | None = None
+_chat = LocalChatProvider()
+
+
+def _error(status: int, message: str, headers: dict | None = None) -> JSONResponse:
+    stats[str(status)] += 1
+    return JSONResponse({"error": {"message": message, "type": "stub", "code": status}}, status, headers=headers)
+
+async def _inject() -> JSONResponse | None:
+    """Latency (base + exponential tail), then a 429/500 if the dice or the RPM budget say so."""
+    stats["requests"] += 1
+    now = time.monotonic()
+    while _recent and now - _recent[0] > 60:
+        _recent.popleft()
+    if config.rpm and len(_recent) >= config.rpm:
+        wait = 60 - (now - _recent[0])
+        return _error(429, "Rate limit reached (rpm)", {"retry-after-ms": str(int(wait * 1000))})
+    _recent.append(now)
+    delay = config.latency_ms + (random.expovariate(1 / config.tail_ms) if config.tail_ms else 0)
+    await asyncio.sleep(delay / 1000)
+    roll = random.random()
+    if roll < config.p429:
+        return _error(429, "Rate limit reached", {"retry-after": str(config.retry_after)})
+    if roll < config.p429 + config.p500:
+        return _error(500, "Injected server error")
+    return None
+
+def _usage(prompt: int, completion: int = 0) -> dict:
+    return {"prompt_tokens": prompt, "completion_tokens": completion, "total_tokens": prompt + completion}
+
+@app.post("/v1/embeddings")
+async def embeddings(request: Request):
+    if (err := await _inject()) is not None:
+        return err
+    body = await request.json()
+    texts = [body["input"]] if isinstance(body["input"], str) else body["input"]
+    X = _embedder.embed(texts)
+    b64 = body.get("encoding_format") == "base64"
+    data = [
+        {"object": "embedding", "index": i,
+         "embedding": base64.b64encode(np.asarray(v, dtype="float32").tobytes()).decode() if b64 else v.tolist()}
+        for i, v in enumerate(X)
+    ]
+    tokens = sum(len(t) // 4 + 1 for t in texts)
+    return {"object": "list", "data": data, "model": body["model"], "usage": _usage(tokens)}
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    if (err := await _inject()) is not None:
+        return err
+    body = await request.json()
+    text = _chat.complete(body)
+    prompt = sum(len(m["content"]) // 4 + 1 for m in body["messages"])
+    base = {"id": "chatcmpl-stub", "created": int(time.time()), "model": body["model"]}
+    if not body.get("stream"):
+        return {**base, "object": "chat.completion", "usage": _usage(prompt, len(text) // 4 + 1),
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": text}}]}
+
+    async def events():
+        for i in range(0, len(text), 16):
+            chunk = {**base, "object": "chat.completion.chunk",
+                     "choices": [{"index": 0, "delta": {"content": text[i:i + 16]}, "finish_reason": None}]}
+            yield f"data: {json.dumps(chunk)}\n\n"
+            await asyncio.sleep(0.005)
+        done = {**base, "object": "chat.completion.chunk", "choices": [], "usage": _usage(prompt, len(text) // 4 + 1)}
+        yield f"data: {json.dumps(done)}\n\ndata: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+@app.get("/stats")
+def get_stats():
+    return stats
+
+def main():
+    import uvicorn
+
+    global _embedder
+    ap = argparse.ArgumentParser(description="OpenAI-compatible stub with injected latency and errors")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8900)
+    ap.add_argument("--latency-ms", type=float, default=config.latency_ms, help="base latency per request")
+    ap.add_argument("--tail-ms", type=float, default=config.tail_ms, help="mean of an extra exponential delay")
+    ap.add_argument("--p429", type=float, default=config.p429, help="probability of a 429")
+    ap.add_argument("--p500", type=float, default=config.p500, help="probability of a 500")
+    ap.add_argument("--retry-after", type=float, default=config.retry_after, help="Retry-After seconds on random 429s")
+    ap.add_argument("--rpm", type=int, default=config.rpm, help="requests per minute before 429s (0 = no limit)")
+    ap.add_argument("--dim", type=int, default=config.dim)
+    args = ap.parse_args()
+
+    vars(config).update({k: v for k, v in vars(args).items() if k in vars(config)})
+    _embedder = LocalEmbeddingProvider(config.dim)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
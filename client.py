@@ -0,0 +1,81 @@
+# client.py
+"""
+Backend client for the Streamlit app. Streamlit reruns app.py on every
+interaction, so everything here outlives a rerun:
+- one keep-alive requests.Session (connection pool) per process, via st.cache_resource
+- TTL-cached match reads via st.cache_data; call them from the script thread
+  (worker threads have no ScriptRunContext)
+"""
+import json
+import os
+from typing import Any, Dict, List
+
+import requests
+import streamlit as st
+from requests.adapters import HTTPAdapter
+
+CACHE_TTL = int(os.getenv("FRONTEND_CACHE_TTL", "60"))  # seconds a cached read may be stale
+POOL_SIZE = int(os.getenv("FRONTEND_POOL_SIZE", "8"))  # keep-alive connections to the backend
+
+
+# -----------------------------
+# Shared resources
+# -----------------------------
+@st.cache_resource
+def session() -> requests.Session:
+    s = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+    s.mount("http://", adapter)
+    s.mount("https://", adapter)
+    return s
+
+
+# -----------------------------
+# HTTP helpers (strict: no fallbacks)
+# -----------------------------
+def api_get(base: str, path: str, params: Dict[str, Any] | None = None) -> Any:
+    r = session().get(f"{base}{path}", params=params, timeout=15)
+    r.raise_for_status()
+    return r.json()
+
+def api_post(base: str, path: str, payload: Dict[str, Any] | None = None) -> Any:
+    r = session().post(f"{base}{path}", json=payload or {}, timeout=20)
+    r.raise_for_status()
+    return r.json()
+
+def api_stream(base: str, path: str, payload: Dict[str, Any] | None = None):
+    """POST and yield (event, data) pairs from a Server-Sent Events response."""
+    with session().post(f"{base}{path}", json=payload or {}, stream=True, timeout=60) as r:
+        r.raise_for_status()
+        event = "message"
+        for line in r.iter_lines(decode_unicode=True):
+            if line.startswith("event:"):
+                event = line[len("event:"):].strip()
+            elif line.startswith("data:"):
+                yield event, json.loads(line[len("data:"):].strip())
+                event = "message"
+
+
+# -----------------------------
+# Cached reads (args are the cache key; writes below clear what they invalidate)
+# -----------------------------
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def match_project(base: str, pid: int, topk: int = 5) -> List[Dict[str, Any]]:
+    return api_get(base, f"/match/project/{pid}", {"topk": topk})
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def match_peers(base: str, uid: int, interests: str, skills: str, topk: int = 5) -> List[Dict[str, Any]]:
+    # a read despite the POST: same inputs, same answer until the corpus changes
+    return api_post(base, f"/match/peers?topk={topk}", {"user_id": uid, "interests": interests, "skills": skills})
+
+
+# -----------------------------
+# Writes
+# -----------------------------
+def create_project(base: str, owner_id: int, title: str, description: str) -> Dict[str, Any]:
+    return api_post(base, "/projects", {"owner_id": owner_id, "title": title, "description": description})
+
+def approve_stack(base: str, pid: int, stack: List[str]) -> Dict[str, Any]:
+    out = api_post(base, "/projects/approve_stack", {"project_id": pid, "stack": stack})
+    match_project.clear()  # the stack is part of the match query
+    return out
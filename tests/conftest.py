@@ -0,0 +1,53 @@
+"""
+Shared setup: a scratch SQLite database, local (offline) embedding/chat providers,
+and the app with its lifespan running. Env must be set before backend modules import.
+"""
+import itertools
+import os
+import tempfile
+
+_db = os.path.join(tempfile.mkdtemp(), "sangam.db")
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{_db}", "ASYNC_DATABASE_URL": f"sqlite+aiosqlite:///{_db}",
+    "EMBED_PROVIDER": "local", "CHAT_PROVIDER": "local", "EMBED_QUEUE": "0",
+    "EMBED_WORKER_INTERVAL": "0", "MATCH_CACHE": "off", "WARM_START": "0", "FIELD_VECTORS": "1",
+})
+
+import pytest
+from fastapi.testclient import TestClient
+
+import backend.models  # noqa: F401  (registers tables)
+from backend.db import Base, engine
+from backend.main import app
+
+_seq = itertools.count()
+
+
+@pytest.fixture(scope="session")
+def client():
+    Base.metadata.create_all(engine)
+    with TestClient(app) as c:
+        yield c
+
+
+@pytest.fixture
+def student(client):
+    def make(**fields) -> dict:
+        n = next(_seq)
+        body = {"name": f"s{n}", "role": "student", "email": f"s{n}@x", **fields}
+        r = client.post("/profiles", json=body)
+        assert r.status_code == 200, r.text
+        return r.json()
+    return make
+
+
+@pytest.fixture
+def project(client):
+    def make(**fields) -> dict:
+        n = next(_seq)
+        owner = client.post("/profiles", json={"name": f"p{n}", "role": "professor", "email": f"p{n}@x"}).json()
+        r = client.post("/projects", json={"owner_id": owner["id"], "title": f"project {n}",
+                                           "description": "python ml", **fields})
+        assert r.status_code == 200, r.text
+        return r.json()
+    return make
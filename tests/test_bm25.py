@@ -0,0 +1,57 @@
+import numpy as np
+
+from backend.services.bm25 import BM25Index, rrf_fuse
+from backend.services.tags import TagIndex
+
+
+def corpus() -> BM25Index:
+    index = BM25Index()
+    index.add(1, "python robotics drones")
+    index.add(2, "python web react")
+    index.add(3, "robotics robotics slam ros")
+    index.add(4, "poetry")
+    return index
+
+
+def test_bm25_ranks_by_term_overlap():
+    ids, scores = corpus().search("robotics slam", 10)
+    assert ids.tolist() == [3, 1]
+    assert scores[0] > scores[1] > 0
+    assert corpus().search("nothing here", 5)[0].size == 0
+    assert BM25Index().search("python", 5)[0].size == 0
+
+
+def test_bm25_within_and_updates():
+    index = corpus()
+    ids, _ = index.search("python", 10, within=np.array([2, 4]))
+    assert ids.tolist() == [2]
+
+    index.add(2, "gardening")  # re-adding replaces the document
+    assert index.search("python", 10)[0].tolist() == [1]
+    index.remove([1])
+    assert index.search("python", 10)[0].size == 0
+    assert len(index) == 3
+
+
+def test_rrf_fuse_rewards_agreement():
+    vector = np.array([1, 2, 3])
+    lexical = np.array([3, 4, 1])
+    assert rrf_fuse([vector, lexical], 4).tolist() == [1, 3, 2, 4]
+    assert rrf_fuse([vector, lexical], 2).tolist() == [1, 3]
+    assert rrf_fuse([np.array([], dtype=np.int64)], 3).size == 0
+
+
+def test_tag_index_match_all():
+    tags = TagIndex()
+    tags.set(1, {"skill": ["python", "ros"], "interest": ["drones"]})
+    tags.set(2, {"skill": ["python"]})
+    tags.set(3, {"skill": ["ros"]})
+    assert tags.match_all(["Python"]).tolist() == [1, 2]
+    assert tags.match_all(["python", "ros"]).tolist() == [1]
+    assert tags.match_all(["drones"], kind="interest").tolist() == [1]
+    assert tags.match_all(["rust"]).size == 0
+
+    tags.set(1, {"skill": ["rust"]})
+    tags.remove([2])
+    assert tags.match_all(["python"]).size == 0
+    assert tags.match_all(["rust"]).tolist() == [1]
@@ -0,0 +1,33 @@
+"""
+Concurrent /match requests on one event loop. The student index syncs through
+AsyncSession.run_sync, which yields to the loop on every query; a thread lock held
+across those queries used to hang the whole worker.
+"""
+import asyncio
+import threading
+
+import httpx
+
+from backend.main import app
+
+
+def test_concurrent_matches_do_not_deadlock(student, project):
+    for i in range(30):
+        student(skills=f"python, skill{i % 5}", interests="ml")
+    pid = project(title="ML")["id"]
+
+    async def burst():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            plain = [{"topk": 3}] * 8
+            weighted = [{"topk": 3, "weights": "skills:2"}] * 8  # per-field index syncs the same way
+            return await asyncio.gather(*(client.get(f"/match/project/{pid}", params=p) for p in plain + weighted))
+
+    # a blocked loop never fires asyncio timeouts: watch it from another thread
+    responses = []
+    t = threading.Thread(target=lambda: responses.extend(asyncio.run(burst())), daemon=True)
+    t.start()
+    t.join(60)
+    assert not t.is_alive(), "concurrent matches deadlocked the event loop"
+    assert all(r.status_code == 200 for r in responses)
+    assert all(len(r.json()) == 3 for r in responses)
@@ -0,0 +1,34 @@
+import numpy as np
+
+from backend.services.embed_cache import EmbeddingCache
+
+
+def vecs(n: int, dim: int = 8) -> np.ndarray:
+    return np.arange(n * dim, dtype="float32").reshape(n, dim)
+
+
+def test_memory_tier_is_bounded_in_bytes():
+    cache = EmbeddingCache(max_bytes=3 * 8 * 4, directory="")  # three 8-dim float32 vectors
+    cache.put_many("m", ["a", "b", "c", "d"], vecs(4))
+    assert cache.stats()["size"] == 3 and cache.stats()["bytes"] == 96 and cache.evictions == 1
+    a, d = cache.get_many("m", ["a", "d"])
+    assert a is None and np.array_equal(d, vecs(4)[3])
+    cache.put_many("m", ["d"], vecs(1))  # overwriting doesn't double-count
+    assert cache.stats()["bytes"] == 96
+
+
+def test_disk_tier_only_for_stored_vectors(tmp_path):
+    cache = EmbeddingCache(max_bytes=1 << 20, directory=str(tmp_path))
+    cache.put_many("m", ["a", "b"], vecs(2), memory=False)
+    assert cache.stats()["size"] == 0
+    # another worker's cache reads the same disk tier
+    other = EmbeddingCache(max_bytes=1 << 20, directory=str(tmp_path))
+    assert np.array_equal(other.get_many("m", ["b"])[0], vecs(2)[1])
+    assert other.disk_hits == 1
+
+
+def test_profile_writes_skip_the_memory_tier(client, student):
+    before = client.get("/match/cache_stats").json()["size"]
+    for i in range(3):
+        student(skills=f"rust {i}", interests="compilers")
+    assert client.get("/match/cache_stats").json()["size"] == before
@@ -0,0 +1,85 @@
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import delete, select
+
+from backend.db import SessionLocal
+from backend.models import EmbedJob
+from backend.services import embed_queue
+
+
+@pytest.fixture
+def db(client):
+    s = SessionLocal()
+    s.execute(delete(EmbedJob))
+    s.commit()
+    yield s
+    s.rollback()
+    s.execute(delete(EmbedJob))
+    s.commit()
+    s.close()
+
+
+def jobs(db) -> dict:
+    db.expire_all()
+    return {j.entity_id: j for j in db.scalars(select(EmbedJob))}
+
+
+def test_enqueue_coalesces_repeated_writes(db):
+    assert embed_queue.enqueue(db, "profile", [1, 2, 3, 3]) == 3
+    db.commit()
+    before = jobs(db)[1].updated_at
+    assert embed_queue.enqueue(db, "profile", [1, 2, 3], touch=False) == 0
+    assert embed_queue.enqueue(db, "profile", [1, 2, 3]) == 3
+    db.commit()
+    after = jobs(db)
+    assert len(after) == 3 and after[1].updated_at >= before
+    assert embed_queue.queue_stats(db)["by_kind"] == {"profile": 3}
+
+
+@pytest.fixture
+def embedder(monkeypatch):
+    """Stand-in profile embedder: any batch holding the poison id fails with `error`."""
+    fake = SimpleNamespace(poison=None, error=ValueError("input too long"), calls=[])
+
+    def embed(db, ids):
+        fake.calls.append(sorted(ids))
+        if fake.poison in ids:
+            raise fake.error
+        return len(ids)
+    monkeypatch.setitem(embed_queue.EMBEDDERS, "profile", embed)
+    return fake
+
+
+def test_rejected_batch_is_bisected_down_to_the_bad_entity(db, embedder):
+    embedder.poison = 5
+    embed_queue.enqueue(db, "profile", range(1, 9))
+    db.commit()
+    report = embed_queue.drain_all(db)
+    assert report == {"claimed": 8, "embedded": 7, "failed": 1}
+    left = jobs(db)
+    assert list(left) == [5]
+    assert left[5].attempts == 1 and "too long" in left[5].last_error
+    assert left[5].claimed_until is not None  # backing off, not claimed again by this drain
+
+
+def test_transient_failure_backs_off_the_whole_batch(db, embedder):
+    embedder.poison, embedder.error = 2, TimeoutError("upstream slow")
+    embed_queue.enqueue(db, "profile", [1, 2, 3, 4])
+    db.commit()
+    report = embed_queue.drain_all(db)
+    assert report == {"claimed": 4, "embedded": 0, "failed": 4}
+    assert embedder.calls == [[1, 2, 3, 4]]  # no bisect: splitting wouldn't help an outage
+    assert {i: j.attempts for i, j in jobs(db).items()} == {1: 1, 2: 1, 3: 1, 4: 1}
+
+
+def test_rewrite_during_embed_keeps_the_job(db, monkeypatch):
+    def rewritten(s, ids):
+        embed_queue.enqueue(s, "profile", ids)  # a profile write lands mid-embed
+        return len(ids)
+    monkeypatch.setitem(embed_queue.EMBEDDERS, "profile", rewritten)
+    embed_queue.enqueue(db, "profile", [7])
+    db.commit()
+    embed_queue.drain(db)
+    left = jobs(db)
+    assert list(left) == [7] and left[7].claimed_until is None
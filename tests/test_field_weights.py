@@ -0,0 +1,33 @@
+import pytest
+
+from backend.services.fields import parse_weights
+
+
+def test_parse_weights_defaults_and_overrides():
+    w = parse_weights("skills:2, interests:0")
+    assert w["skills"] == 2 and w["interests"] == 0 and w["summary"] == 1
+
+
+@pytest.mark.parametrize("weights", ["skills:nan", "skills:inf", "skills:-1", "skills:two", {"skills": None}])
+def test_parse_weights_rejects_bad_values(weights):
+    with pytest.raises(ValueError):
+        parse_weights(weights)
+
+
+def test_bad_weights_are_a_400(client, project):
+    pid = project()["id"]
+    for w in ("skills:nan", "skills:-2", "nope:1"):
+        assert client.get(f"/match/project/{pid}", params={"weights": w}).status_code == 400
+    r = client.post("/match/projects", json={"project_ids": [pid], "weights": {"skills": -1}})
+    assert r.status_code == 400
+
+
+@pytest.mark.parametrize("fields, weights", [
+    ({"title": "", "description": ""}, "skills:2"),  # no non-empty project field
+    ({}, "description:0,stack:0,tags:0"),  # every project field zero-weighted
+])
+def test_weighted_match_falls_back_to_packed_query(client, student, project, fields, weights):
+    student(skills="python", interests="ml")
+    pid = project(**fields)["id"]
+    r = client.get(f"/match/project/{pid}", params={"weights": weights, "mode": "vector"})
+    assert r.status_code == 200 and r.json()
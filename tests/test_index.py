@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+
+from backend.services.index import IVFIndex, VectorIndex
+
+
+def unit(n: int, dim: int = 64, seed: int = 0) -> np.ndarray:
+    X = np.random.default_rng(seed).normal(size=(n, dim)).astype("float32")
+    return X / np.linalg.norm(X, axis=1, keepdims=True)
+
+
+def test_exact_add_overwrite_remove():
+    index = VectorIndex(capacity=2)
+    X = unit(5)
+    index.add([10, 11, 12, 13, 14], X)
+    assert len(index) == 5
+    ids, scores = index.search(X[2], 3)
+    assert ids[0] == 12 and np.isclose(scores[0], 1.0)
+
+    index.add([12], X[4:5])  # overwrite keeps one row per id
+    assert len(index) == 5
+    assert np.allclose(index.get(12), X[4])
+
+    index.remove([10, 99])
+    assert 10 not in index and len(index) == 4
+    assert np.allclose(index.get(14), X[4])  # the swapped-in row still resolves
+    ids, _ = index.search(X[1], 4, exclude=[11])
+    assert set(ids.tolist()) == {12, 13, 14}
+
+
+def test_search_within_and_many():
+    index = VectorIndex()
+    X = unit(20)
+    index.add(range(20), X)
+    ids, _ = index.search(X[3], 5, within=[3, 7, 8])
+    assert ids[0] == 3 and set(ids.tolist()) <= {3, 7, 8}
+    hits = index.search_many(X[[0, 5]], 1)
+    assert [h[0][0] for h in hits] == [0, 5]
+    assert all(ids.size == 0 for ids, _ in index.search_many(X[:2], 3, within=[]))
+
+
+def test_dimension_mismatch_is_rejected():
+    index = VectorIndex()
+    index.add([1], unit(1, 16))
+    with pytest.raises(ValueError):
+        index.add([2], unit(1, 8))
+
+
+@pytest.mark.parametrize("dtype,truncate_dim", [("float16", 0), ("int8", 0), ("float32", 32), ("int8", 32)])
+def test_compact_storage_keeps_nearest_neighbour(dtype, truncate_dim):
+    X = unit(200, 128)
+    index = VectorIndex(dtype=dtype, truncate_dim=truncate_dim)
+    index.add(range(200), X)
+    assert index.dim == (truncate_dim or 128)
+    assert index.get(0).dtype == np.float32
+    assert [ids[0] for ids, _ in index.search_many(X[:20], 1)] == list(range(20))
+    if dtype != "float32":
+        assert index.nbytes < 200 * index.dim * 4
+
+
+@pytest.mark.parametrize("dtype", ["float32", "int8"])
+def test_save_load_round_trip(tmp_path, dtype):
+    X = unit(30)
+    index = VectorIndex(dtype=dtype, truncate_dim=32)
+    index.add(range(30), X)
+    path = str(tmp_path / "students")
+    index.save(path, model="m")
+
+    loaded = VectorIndex()
+    assert loaded.load(path)["model"] == "m"
+    assert (loaded.dtype, loaded.truncate_dim, len(loaded)) == (np.dtype(dtype), 32, 30)
+    assert np.allclose(loaded.vectors(), index.vectors())
+    loaded.add([100], unit(1, seed=1))  # mapped copy-on-write: writable after load
+    loaded.remove([0])
+    assert 100 in loaded and 0 not in loaded and len(loaded) == 30
+
+
+def test_ivf_is_exact_below_min_size():
+    X = unit(50)
+    ivf, exact = IVFIndex(min_size=1000), VectorIndex()
+    for index in (ivf, exact):
+        index.add(range(50), X)
+    q = unit(1, seed=3)[0]
+    assert np.array_equal(ivf.search(q, 5)[0], exact.search(q, 5)[0])
+    assert ivf.centroids is None
+
+
+def test_ivf_probes_clusters_above_min_size():
+    X = unit(400)
+    index = IVFIndex(nlist=16, nprobe=2, min_size=100)
+    index.add(range(400), X)
+    assert [ids[0] for ids, _ in index.search_many(X[:10], 1)] == list(range(10))
+    assert index.centroids is not None and index.centroids.shape[0] == 16
+
+    index.remove(range(0, 400, 2))  # moved rows keep their cluster assignment
+    ids, _ = index.search(X[1], 1)
+    assert ids[0] == 1
+    ids, _ = index.search(X[3], 5, within=[3, 5])
+    assert set(ids.tolist()) == {3, 5}
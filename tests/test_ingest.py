@@ -0,0 +1,52 @@
+import json
+
+import pytest
+from sqlalchemy import text
+
+from backend.db import engine
+
+
+def ndjson(*rows) -> str:
+    return "".join(json.dumps(r) + "\n" for r in rows)
+
+
+def test_over_long_values_are_row_errors(client):
+    rows = [
+        {"name": "ok", "role": "student", "email": "ok@x"},
+        {"name": "x" * 121, "role": "student", "email": "long@x"},
+        {"name": "ok2", "role": "student", "email": "e" * 201},
+    ]
+    report = client.post("/profiles/bulk", content=ndjson(*rows), params={"embed": "false"}).json()
+    assert report["inserted"] == 1
+    assert [e["row"] for e in report["errors"]] == [2, 3]
+
+
+def test_profile_write_rejects_over_long_name(client):
+    r = client.post("/profiles", json={"name": "x" * 121, "role": "student", "email": "a@x"})
+    assert r.status_code == 422
+
+
+@pytest.fixture
+def reject_boom():
+    # a database-side rejection that validation can't see (stands in for e.g. a Postgres DataError)
+    with engine.begin() as c:
+        c.execute(text("CREATE TRIGGER reject_boom BEFORE INSERT ON users WHEN NEW.name = 'boom' "
+                       "BEGIN SELECT RAISE(ABORT, 'boom rejected'); END"))
+    yield
+    with engine.begin() as c:
+        c.execute(text("DROP TRIGGER reject_boom"))
+
+
+def test_batch_the_database_rejects_falls_back_to_rows(client, reject_boom):
+    rows = [{"name": n, "role": "student", "email": f"{n}@x", "skills": "go"} for n in ("a1", "boom", "a3")]
+    report = client.post("/profiles/bulk", content=ndjson(*rows)).json()
+    assert report["inserted"] == 2 and report["embedded"] == 2
+    assert [e["row"] for e in report["errors"]] == [2]
+    names = {u["name"] for u in client.get("/profiles", params={"fields": "name", "limit": 1000}).json()}
+    assert {"a1", "a3"} <= names and "boom" not in names
+
+
+def test_csv_quoted_newlines(client):
+    body = 'name,role,email,summary\nc1,student,c1@x,"line one\n\nline two"\nc2,student,c2@x,plain\n'
+    r = client.post("/profiles/bulk", content=body, headers={"content-type": "text/csv"}, params={"embed": "false"})
+    assert r.json() == {"inserted": 2, "embedded": 0, "errors": []}
@@ -0,0 +1,19 @@
+def test_batch_match(client, student, project):
+    student(skills="python", interests="ml")
+    pids = [project()["id"], project()["id"]]
+    r = client.post("/match/projects", json={"project_ids": pids, "topk": 3})
+    assert r.status_code == 200
+    assert [row["project_id"] for row in r.json()] == pids
+
+
+def test_empty_batch_is_rejected(client):
+    assert client.post("/match/projects", json={"project_ids": []}).status_code == 422
+
+
+def test_topk_is_bounded(client, student, project):
+    me = student(skills="python")
+    pid = project()["id"]
+    for topk in (0, -1, 10_000):
+        assert client.get(f"/match/project/{pid}", params={"topk": topk}).status_code == 422
+        assert client.post("/match/projects", json={"project_ids": [pid], "topk": topk}).status_code == 422
+        assert client.post(f"/match/peers?topk={topk}", json={"user_id": me["id"]}).status_code == 422
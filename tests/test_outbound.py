@@ -0,0 +1,135 @@
+"""Retries, the circuit breaker and hedging against backend/stub_openai.py over real HTTP."""
+import asyncio
+import socket
+import threading
+import time
+
+import openai
+import pytest
+import uvicorn
+
+from backend import stub_openai as stub
+from backend.services import outbound, providers
+from backend.services.outbound import CircuitBreaker, CircuitOpen, Outbound
+from backend.services.providers import LocalEmbeddingProvider, OpenAIClients, OpenAIEmbeddingProvider
+
+
+@pytest.fixture(scope="module")
+def stub_url():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    stub._embedder = LocalEmbeddingProvider(8)
+    server = uvicorn.Server(uvicorn.Config(stub.app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    yield f"http://127.0.0.1:{port}/v1"
+    server.should_exit = True
+    thread.join(5)
+
+
+@pytest.fixture
+def upstream(stub_url, monkeypatch):
+    """A provider talking to the stub, with the stub reset to fast and error-free."""
+    monkeypatch.setenv("OPENAI_BASE_URL", stub_url)
+    monkeypatch.setenv("OPENAI_API_KEY", "stub")
+    monkeypatch.setattr(providers, "openai_clients", OpenAIClients())
+    monkeypatch.setattr(outbound, "OUTBOUND_BACKOFF", 0.01)
+    monkeypatch.setattr(stub, "config", type(stub.config)(**{**vars(stub.config), "latency_ms": 5, "dim": 8}))
+    stub.stats.update({"requests": 0, "429": 0, "500": 0})
+    return OpenAIEmbeddingProvider("stub-embed")
+
+
+def failing_once(provider, field):
+    """An embed call whose first attempt hits the injected error, later ones don't."""
+    def fn():
+        try:
+            return provider.embed(["hello"])
+        finally:
+            setattr(stub.config, field, 0.0)
+    setattr(stub.config, field, 1.0)
+    return fn
+
+
+def test_retries_a_500(upstream):
+    calls = Outbound("t", retries=2)
+    assert len(calls.call(failing_once(upstream, "p500"))[0]) == 8
+    assert stub.stats == {"requests": 2, "429": 0, "500": 1}
+    assert calls.breaker.state == "closed"
+
+
+def test_429_honours_retry_after_for_every_caller(upstream):
+    stub.config.retry_after = 0.3
+    calls = Outbound("t", retries=2)
+    started = time.monotonic()
+    calls.call(failing_once(upstream, "p429"))
+    assert time.monotonic() - started >= 0.3
+    assert stub.stats["429"] == 1 and stub.stats["requests"] == 2
+
+
+def test_gives_up_after_retries(upstream):
+    stub.config.p500 = 1.0
+    with pytest.raises(openai.InternalServerError):
+        Outbound("t", retries=2).call(lambda: upstream.embed(["x"]))
+    assert stub.stats["requests"] == 3
+
+
+def test_breaker_opens_half_opens_and_closes(upstream):
+    calls = Outbound("t", retries=0)
+    calls.breaker = CircuitBreaker(failures=2, cooldown=0.2)
+    stub.config.p500 = 1.0
+    for _ in range(2):
+        with pytest.raises(openai.InternalServerError):
+            calls.call(lambda: upstream.embed(["x"]))
+    assert calls.breaker.state == "open"
+    with pytest.raises(CircuitOpen):
+        calls.call(lambda: upstream.embed(["x"]))
+    assert stub.stats["requests"] == 2  # rejected without a request
+
+    time.sleep(0.25)
+    assert calls.breaker.state == "half-open"
+    stub.config.p500 = 0.0
+    calls.call(lambda: upstream.embed(["x"]))
+    assert calls.breaker.state == "closed"
+
+
+def test_local_errors_leave_the_breaker_alone(upstream):
+    calls = Outbound("t", retries=0)
+    calls.breaker = CircuitBreaker(failures=1, cooldown=0.05)
+    stub.config.p500 = 1.0
+    with pytest.raises(openai.InternalServerError):
+        calls.call(lambda: upstream.embed(["x"]))
+    time.sleep(0.1)
+
+    def bad_input():
+        raise ValueError("not an upstream verdict")
+    with pytest.raises(ValueError):
+        calls.call(bad_input)  # takes the half-open trial, then frees it
+    assert calls.breaker.state == "half-open"
+
+    with pytest.raises(openai.NotFoundError):  # a genuine upstream 4xx: the upstream is up
+        calls.call(lambda: providers.openai_clients.client.models.list())
+    assert calls.breaker.state == "closed"
+
+
+def test_hedge_beats_a_slow_first_attempt(upstream):
+    calls = Outbound("t", hedge=True)
+    calls._latency.extend([0.01] * 20)  # p95 10 ms -> hedge after HEDGE_MIN_DELAY
+    attempts = 0
+
+    async def fn():
+        nonlocal attempts
+        attempts += 1
+        stub.config.latency_ms = 2000 if attempts == 1 else 5
+        return await upstream.aembed(["slow"])
+
+    async def run():
+        started = time.monotonic()
+        out = await calls.acall(fn, hedge=True)
+        return out, time.monotonic() - started
+
+    out, elapsed = asyncio.run(run())
+    assert len(out[0]) == 8 and attempts == 2
+    assert elapsed < 1.0
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from backend.services import profile_store
+from backend.services.index import VectorIndex
+
+
+@pytest.fixture
+def compact_index(monkeypatch):
+    """Swap in an INDEX_DIM/INDEX_DTYPE-style student index and let the next sync refill it."""
+    monkeypatch.setattr(profile_store, "_student_index", VectorIndex(truncate_dim=32, dtype="int8"))
+    monkeypatch.setattr(profile_store, "_applied", {})
+    monkeypatch.setattr(profile_store, "_watermark", None)
+    return profile_store._student_index
+
+
+def test_prepare_query_matches_stored_space():
+    index = VectorIndex(truncate_dim=8)
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(3, 64)).astype("float32")
+    index.add([1, 2, 3], X / np.linalg.norm(X, axis=1, keepdims=True))
+    q = index.prepare_query(rng.normal(size=64))
+    assert q.shape == index.get(1).shape == (8,)
+    assert np.isclose(np.linalg.norm(q), 1.0)
+
+
+def test_peers_with_text_on_truncated_index(client, student, compact_index):
+    me = student(skills="python, robotics", interests="drones")
+    for _ in range(5):
+        student(skills="python, vision", interests="robotics")
+    r = client.post("/match/peers", json={"user_id": me["id"], "interests": "robotics", "skills": "python"})
+    assert r.status_code == 200, r.text
+    assert len(compact_index) >= 6
+    ids = [p["id"] for p in r.json()]
+    assert ids and me["id"] not in ids
+
+
+@pytest.fixture
+def embed_calls(monkeypatch):
+    """Record query texts /match/peers embeds (the peer graph path embeds none)."""
+    from backend.routers import match
+
+    seen = []
+    real = match.aembed_texts
+
+    async def spy(texts, **kw):
+        seen.extend(texts)
+        return await real(texts, **kw)
+    monkeypatch.setattr(match, "aembed_texts", spy)
+    return seen
+
+
+def test_peers_restating_the_profile_use_the_graph(client, student, embed_calls):
+    me = student(skills="Python, ROS", interests="drones")
+    student(skills="python", interests="drones")
+    body = {"user_id": me["id"], "interests": " drones ", "skills": "ros, python"}
+    r = client.post("/match/peers", json=body)
+    assert r.status_code == 200 and r.json()
+    assert embed_calls == []
+
+    r = client.post("/match/peers", json={**body, "interests": "underwater robots"})
+    assert r.status_code == 200
+    assert len(embed_calls) == 1
@@ -0,0 +1,50 @@
+import asyncio
+
+import pytest
+
+from backend.services.result_cache import MemoryBackend, ResultCache, match_cache
+
+
+def test_bump_orphans_older_keys():
+    cache = ResultCache(MemoryBackend())
+
+    async def run():
+        key = await cache.key("project", 1, 5)
+        await cache.set(key, ["a"])
+        assert await cache.get(key) == ["a"]
+        cache.bump()
+        fresh = await cache.key("project", 1, 5)
+        assert fresh != key and await cache.get(fresh) is None
+    asyncio.run(run())
+    assert cache.stats()["version"] == 1
+
+
+def test_backend_errors_are_misses():
+    class Down(MemoryBackend):
+        def version(self):
+            raise ConnectionError("cache down")
+
+    cache = ResultCache(Down())
+    assert asyncio.run(cache.key("project", 1)) is None
+    assert asyncio.run(cache.get(None)) is None
+    assert cache.errors == 1
+
+
+@pytest.fixture
+def memory_cache(monkeypatch):
+    monkeypatch.setattr(match_cache, "backend", MemoryBackend())
+    return match_cache
+
+
+def test_profile_write_invalidates_cached_match(client, student, project, memory_cache):
+    student(skills="python", interests="ml")
+    pid = project(title="ML")["id"]
+    first = client.get(f"/match/project/{pid}", params={"mode": "lexical"}).json()
+    assert client.get(f"/match/project/{pid}", params={"mode": "lexical"}).json() == first
+    assert memory_cache.stats()["hits"] == 1
+
+    version = memory_cache.stats()["version"]
+    student(skills="python", interests="ml")
+    assert memory_cache.stats()["version"] > version
+    client.get(f"/match/project/{pid}", params={"mode": "lexical"})
+    assert memory_cache.stats()["hits"] == 1
@@ -0,0 +1,73 @@
+import glob
+import os
+import tempfile
+import uuid
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+import pytest
+
+from backend.services.index import VectorIndex
+from backend.services.shards import ShardedIndex
+
+
+@pytest.fixture
+def segment():
+    name = f"sangam-test-{uuid.uuid4().hex[:8]}"
+    yield name
+    for path in glob.glob(f"/dev/shm/{name}*"):
+        SharedMemory(name=os.path.basename(path)).unlink()
+    os.remove(os.path.join(tempfile.gettempdir(), f"{name}.lock"))
+
+
+def unit(n: int, dim: int = 16, seed: int = 0) -> np.ndarray:
+    X = np.random.default_rng(seed).normal(size=(n, dim)).astype("float32")
+    return X / np.linalg.norm(X, axis=1, keepdims=True)
+
+
+def test_workers_share_one_segment(segment):
+    # two coordinators on one named segment stand in for two API workers
+    a = ShardedIndex(workers=1, segment=segment, capacity=4)
+    b = ShardedIndex(workers=1, segment=segment)
+    try:
+        X = unit(50)
+        a.add(range(1, 51), X)  # grows past capacity several times
+        assert len(b) == 50 and np.allclose(b.get(7), X[6], atol=1e-6)
+        b.remove([7])
+        assert len(a) == 49 and 7 not in a
+        a.add([51], unit(1, seed=1))
+        assert b.search(X[10], 1)[0].tolist() == [11]
+        assert sorted(b.ids.tolist()) == sorted(set(range(1, 52)) - {7})
+    finally:
+        a.close()
+        b.close()
+    # the rows stay for workers that start later
+    c = ShardedIndex(workers=1, segment=segment)
+    try:
+        assert len(c) == 50
+    finally:
+        c.close()
+
+
+def test_fan_out_matches_exact_scan(segment):
+    X = unit(300)
+    exact = VectorIndex()
+    exact.add(range(300), X)
+    sharded = ShardedIndex(workers=2, min_rows=1, segment=segment)
+    try:
+        sharded.add(range(300), X)
+        Q = unit(3, seed=2)
+        for (ids, _), (want, _) in zip(sharded.search_many(Q, 5), exact.search_many(Q, 5)):
+            assert ids.tolist() == want.tolist()
+        assert sharded.search(X[0], 3, exclude=[0])[0].tolist() == exact.search(X[0], 3, exclude=[0])[0].tolist()
+    finally:
+        sharded.close()
+
+
+def test_private_segment_is_released():
+    index = ShardedIndex(workers=1, segment="")
+    index.add([1, 2], unit(2))
+    name = index._shm.name
+    index.close()
+    with pytest.raises(FileNotFoundError):
+        SharedMemory(name=name)
@@ -0,0 +1,25 @@
+import logging
+
+import pytest
+
+from backend import main
+
+
+@pytest.mark.parametrize("queue, cache, interval, outcome", [
+    (False, "memory", 0, None),
+    (True, "redis", 0, None),
+    (True, "off", 0, None),
+    (True, "memory", 1, "warning"),
+    (True, "memory", 0, "error"),
+])
+def test_queue_needs_a_shared_match_cache(monkeypatch, caplog, queue, cache, interval, outcome):
+    monkeypatch.setattr(main, "EMBED_QUEUE", queue)
+    monkeypatch.setattr(main, "MATCH_CACHE", cache)
+    monkeypatch.setattr(main, "EMBED_WORKER_INTERVAL", interval)
+    if outcome == "error":
+        with pytest.raises(RuntimeError, match="MATCH_CACHE=redis"):
+            main.check_cache_invalidation()
+        return
+    with caplog.at_level(logging.WARNING, logger=main.log.name):
+        main.check_cache_invalidation()
+    assert bool(caplog.records) == (outcome == "warning")
@@ -0,0 +1,56 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import delete, select
+
+from backend.db import SessionLocal
+from backend.models import Notification, StudentWatchlist
+from backend.services.watchlist import scan_watchlists
+
+T0 = datetime(2030, 1, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def db(client):
+    s = SessionLocal()
+    yield s
+    s.rollback()
+    s.execute(delete(Notification))
+    s.execute(delete(StudentWatchlist))
+    s.commit()
+    s.close()
+
+
+def notified(db, wid: int) -> list:
+    return db.scalars(select(Notification.project_id).where(Notification.watchlist_id == wid)
+                      .order_by(Notification.project_id)).all()
+
+
+def test_scanner_notifies_new_matching_projects_once(db, student, project):
+    project(title="Underwater robotics", description="sonar mapping for underwater robotics")  # predates the watchlist
+    w = StudentWatchlist(user_id=student()["id"], topics="underwater robotics, sonar mapping", cadence="hourly")
+    db.add(w)
+    db.commit()
+    assert scan_watchlists(db, T0)["notifications"] == 0  # a new watchlist only sees future projects
+
+    hit = project(title="Underwater robotics", description="sonar mapping for underwater robotics")["id"]
+    project(title="Medieval poetry", description="sonnets", tags="literature")
+    assert scan_watchlists(db, T0 + timedelta(minutes=30))["due"] == 0  # hourly: not due yet
+
+    report = scan_watchlists(db, T0 + timedelta(hours=1))
+    assert report["due"] == 1 and report["notifications"] == 1
+    assert notified(db, w.id) == [hit]
+
+    # the re-checked slack below the mark doesn't notify the same project twice
+    assert scan_watchlists(db, T0 + timedelta(hours=2))["notifications"] == 0
+    assert notified(db, w.id) == [hit]
+
+
+def test_scanner_skips_watchlists_without_topics(db, student, project):
+    w = StudentWatchlist(user_id=student()["id"], topics="  ", cadence="hourly")
+    db.add(w)
+    db.commit()
+    scan_watchlists(db, T0)
+    project(title="Anything")
+    report = scan_watchlists(db, T0 + timedelta(hours=1))
+    assert report["due"] == 1 and report["topics_embedded"] == 0 and notified(db, w.id) == []